@@ -0,0 +1,416 @@
+"""Benchmarks for loading, saving, redrawing and changing large lists.
+
+    python bench.py                          every case at 1k, 10k, 100k and 1M tasks
+    python bench.py --sizes 1000 10000 --backend json
+    python bench.py --save-baseline bench.json
+    python bench.py --compare bench.json     exit status 1 on a regression
+
+Each case runs against a synthetic list written to a scratch directory
+(or ``--data``, where generated lists are kept between runs).  Wall time
+is the best of ``--repeat`` runs; a separate run under tracemalloc
+records the peak memory and the number of blocks it left allocated.
+
+Cases marked (tk) drive a real TodoApp.  Without a display they start a
+virtual one with Xvfb when it is installed, and are skipped otherwise.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from search import SearchIndex
+from storage import open_storage
+from store import TodoStore, search_index_path
+from tasks import ListCounts, fill_due
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BACKENDS = {'json': 'lists', 'sqlite': 'lists.db'}
+LIST_NAME = 'bench'
+OPS = 1000              # changes timed by the mutation cases
+REGRESSION = 1.25       # slower than this ratio of the baseline is reported
+WORDS = ('buy', 'call', 'email', 'fix', 'plan', 'review', 'write', 'book', 'clean', 'pay',
+         'report', 'groceries', 'dentist', 'taxes', 'garden', 'invoice', 'meeting', 'car')
+PRIORITIES = ('', 'High', 'Medium', 'Low')
+
+CASES = {}      # name -> (generator function, needs Tk)
+
+
+def case(name, tk=False):
+    """Register a benchmark.
+
+    The function gets the storage location and list size, does its setup,
+    yields the callable to time and cleans up when resumed.
+    """
+    def register(func):
+        CASES[name] = (func, tk)
+        return func
+    return register
+
+
+def synthetic_tasks(size, seed=0):
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(1, size + 1):
+        deadline = f"2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" if rng.random() < 0.3 else ''
+        tasks.append({
+            'id': i,
+            'text': ' '.join(rng.choices(WORDS, k=rng.randint(2, 5))),
+            'done': rng.random() < 0.4,
+            'priority': rng.choice(PRIORITIES),
+            'deadline': deadline,
+            'subtasks': rng.choice(WORDS) if rng.random() < 0.1 else ''
+        })
+    return tasks
+
+
+def generate(location, size):
+    """Write a list of `size` tasks, and its search index, to `location`."""
+    tasks = synthetic_tasks(size)
+    fill_due(tasks)
+    storage = open_storage(location)
+    index = SearchIndex(search_index_path(location))
+    try:
+        for target in (storage, index):
+            target.write_snapshot(LIST_NAME, tasks)
+        storage.update_counts(LIST_NAME, ListCounts(tasks).to_dict())
+        for target in (storage, index):
+            target.commit([LIST_NAME])
+    finally:
+        storage.close()
+        index.close()
+
+
+def sample_ids(size, count=OPS, seed=1):
+    return random.Random(seed).sample(range(1, size + 1), min(count, size))
+
+
+def opened_store(location):
+    store = TodoStore(location, delay=0)
+    store.open()
+    return store
+
+
+# Headless cases
+
+@case('load_lists')
+def bench_load_lists(location, size):
+    store = TodoStore(location, delay=0)
+    yield store.open
+    store.close()
+
+
+@case('load')
+def bench_load(location, size):
+    store = opened_store(location)
+    yield lambda: store.load(LIST_NAME)
+    store.close()
+
+
+@case('save_snapshot')
+def bench_save_snapshot(location, size):
+    store = opened_store(location)
+    store.load(LIST_NAME)
+
+    def save():
+        store.save(LIST_NAME)
+        store.flush()
+    yield save
+    store.close()
+
+
+@case('save_journal')
+def bench_save_journal(location, size):
+    store = opened_store(location)
+    store.load(LIST_NAME)
+    store.save(LIST_NAME)   # start the journal so the timed run appends
+    store.flush()
+
+    def save():
+        store.add_task(LIST_NAME, 'one more task')
+        store.flush()
+    yield save
+    store.close()
+
+
+@case('toggle')
+def bench_toggle(location, size):
+    store = opened_store(location)
+    store.load(LIST_NAME)
+    ids = sample_ids(size)
+
+    def toggle():
+        for task_id in ids:
+            store.toggle_task(LIST_NAME, store.task(LIST_NAME, task_id))
+    yield toggle
+    store.close()
+
+
+@case('remove')
+def bench_remove(location, size):
+    store = opened_store(location)
+    store.load(LIST_NAME)
+    ids = sample_ids(size)
+
+    def remove():
+        for task_id in ids:
+            store.remove_task(LIST_NAME, store.task(LIST_NAME, task_id))
+    yield remove
+    store.close()
+
+
+# Tk cases
+
+def open_app(location):
+    import tkinter as tk
+    from main import TodoApp
+    root = tk.Tk()
+    app = TodoApp(root, store=TodoStore(location, delay=0))
+    root.update()
+    return root, app
+
+
+def close_app(root, app):
+    app.store.close()
+    root.destroy()
+
+
+@case('tk_startup', tk=True)
+def bench_tk_startup(location, size):
+    apps = []
+
+    def start():
+        apps.append(open_app(location))
+    yield start
+    for root, app in apps:
+        close_app(root, app)
+
+
+@case('tk_refresh', tk=True)
+def bench_tk_refresh(location, size):
+    root, app = open_app(location)
+    app.select_list(LIST_NAME)
+
+    def refresh():
+        app.refresh_task_view(reset=True)
+        root.update_idletasks()
+    yield refresh
+    close_app(root, app)
+
+
+@case('tk_toggle', tk=True)
+def bench_tk_toggle(location, size):
+    root, app = open_app(location)
+    app.select_list(LIST_NAME)
+    app.view.select(size // 2)
+
+    def toggle():
+        for _ in range(OPS):
+            app.toggle_task_done()
+        root.update_idletasks()
+    yield toggle
+    close_app(root, app)
+
+
+@case('tk_remove', tk=True)
+def bench_tk_remove(location, size):
+    root, app = open_app(location)
+    app.select_list(LIST_NAME)
+    count = min(OPS, size)
+
+    def remove():
+        for _ in range(count):
+            app.view.select(0)
+            app.remove_task()
+        root.update_idletasks()
+    yield remove
+    close_app(root, app)
+
+
+# Running
+
+def measure(func, location, size, trace=False):
+    """Run one case; return seconds, or (peak bytes, blocks) when tracing."""
+    steps = func(location, size)
+    run = next(steps)
+    try:
+        if not trace:
+            start = time.perf_counter()
+            run()
+            return time.perf_counter() - start
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        finally:
+            tracemalloc.stop()
+        return peak, blocks
+    finally:
+        next(steps, None)
+
+
+def run_case(func, data, size, repeat):
+    """Measure `func` on fresh copies of `data`, so changes do not accumulate."""
+    result = {}
+    times = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for trace in [False] * repeat + [True]:
+            location = Path(scratch) / data.name
+            copy_data(data, location)
+            value = measure(func, location, size, trace)
+            if trace:
+                result['peak'], result['blocks'] = value
+            else:
+                times.append(value)
+            remove_data(location)
+    result['seconds'] = min(times)
+    return result
+
+
+def data_paths(location):
+    return [location, search_index_path(location)] + \
+        [Path(f"{location}{suffix}") for suffix in ('-wal', '-shm')]
+
+
+def copy_data(source, target):
+    for src, dst in zip(data_paths(source), data_paths(target)):
+        if src.is_dir():
+            shutil.copytree(src, dst)
+        elif src.exists():
+            shutil.copyfile(src, dst)
+
+
+def remove_data(location):
+    for path in data_paths(location):
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+
+
+def start_display():
+    """Make sure Tk can open a window; return an Xvfb process to stop, or False."""
+    import tkinter as tk
+    try:
+        tk.Tk().destroy()
+        return None
+    except tk.TclError:
+        pass
+    if shutil.which('Xvfb') is None:
+        return False
+    display = f":{90 + os.getpid() % 100}"
+    server = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = display
+    for _ in range(50):
+        try:
+            tk.Tk().destroy()
+            return server
+        except tk.TclError:
+            time.sleep(0.1)
+    server.terminate()
+    return False
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=Path(__file__).parent).stdout.strip()
+    except Exception:
+        return ''
+
+
+def format_bytes(n):
+    for unit in ('B', 'KiB', 'MiB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def compare(results, baseline, threshold=REGRESSION):
+    """Print the change from `baseline` for every result; return the regressions."""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else 1.0
+        memory = result['peak'] / before['peak'] if before['peak'] else 1.0
+        slower = ratio > threshold
+        print(f"{key:<32} time x{ratio:5.2f}  peak x{memory:5.2f}{'  REGRESSION' if slower else ''}")
+        if slower:
+            regressions.append(key)
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the task list at scale.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--backend', choices=sorted(BACKENDS), action='append',
+                        help='storage backend to measure (default: all)')
+    parser.add_argument('--case', choices=sorted(CASES), action='append',
+                        help='case to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (best is kept)')
+    parser.add_argument('--data', type=Path, help='keep generated lists in this directory')
+    parser.add_argument('--save-baseline', type=Path, metavar='FILE')
+    parser.add_argument('--compare', type=Path, metavar='FILE')
+    parser.add_argument('--threshold', type=float, default=REGRESSION,
+                        help='time ratio reported as a regression (default: %(default)s)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    backends = args.backend or sorted(BACKENDS)
+    cases = args.case or list(CASES)
+    display = None
+    if any(CASES[name][1] for name in cases):
+        display = start_display()
+        if display is False:
+            print("No display and no Xvfb: skipping the Tk cases")
+            cases = [name for name in cases if not CASES[name][1]]
+
+    data_root = args.data or Path(tempfile.mkdtemp(prefix='todo-bench-'))
+    results = {}
+    try:
+        for backend in backends:
+            for size in args.sizes:
+                data = data_root / str(size) / BACKENDS[backend]
+                if not data.exists():
+                    data.parent.mkdir(parents=True, exist_ok=True)
+                    start = time.perf_counter()
+                    generate(data, size)
+                    print(f"generated {backend} list of {size} tasks in {time.perf_counter() - start:.1f}s")
+                for name in cases:
+                    key = f"{backend}/{name}/{size}"
+                    results[key] = result = run_case(CASES[name][0], data, size, args.repeat)
+                    print(f"{key:<32} {result['seconds'] * 1000:10.2f} ms"
+                          f"  peak {format_bytes(result['peak']):>10}  blocks {result['blocks']:>8}")
+    finally:
+        if args.data is None:
+            shutil.rmtree(data_root, ignore_errors=True)
+        if display:
+            display.terminate()
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps({'revision': git_revision(), 'results': results},
+                                                 indent=2), encoding='utf-8')
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        print(f"Compared with {args.compare} ({baseline.get('revision') or 'unknown revision'}):")
+        if compare(results, baseline['results'], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Compact binary encoding of list snapshots.
+
+A binary snapshot starts with MAGIC, so readers can tell it from JSON
+by its first bytes, followed by a flags byte.  The rest, zlib-compressed
+when FLAG_ZLIB is set, is:
+
+    name        string
+    table       uint32 count, then that many strings
+    tasks       uint32 count, then that many records
+    generation  string, optional
+
+Strings are a uint32 byte length and UTF-8.  Each record is a RECORD
+header (its own total length first, so a reader can step over it) and
+the task text.  Priority, deadline and subtasks values repeat a lot, so
+they are stored once in the table and referenced by index; subtasks go
+there as their JSON text, and each distinct one is decoded once per read
+and shared, which is safe because subtasks are never changed in place.  Absent
+fields are flag bits, and any keys or values the layout has no room for
+are kept as JSON after the text, so converting loses nothing.  The
+generation, if given, identifies this snapshot to its journal (see
+storage.py); files written without one simply end after the records.
+"""
+import json
+import struct
+import zlib
+
+from tasks import Task, FIELDS, Subtasks, dump_subtasks, encode_task, to_subtasks
+
+MAGIC = b'TDLB\x01'
+FLAG_ZLIB = 1
+
+# Presence and value bits of a record
+HAS_TEXT, HAS_DONE, DONE, HAS_PRIORITY, HAS_DEADLINE, HAS_DUE, DUE_SET, HAS_SUBTASKS, \
+    HAS_EXTRA, RAW = (1 << bit for bit in range(10))
+
+# length, id, flags, priority, deadline, subtasks, due, text length
+RECORD = struct.Struct('<IqHIIIdI')
+COUNT = struct.Struct('<I')
+ID_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def is_binary(head):
+    return head.startswith(MAGIC)
+
+
+def _string(data, pos):
+    size, = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    return data[pos:pos + size].decode('utf-8'), pos + size
+
+
+def _pack_string(text):
+    data = text.encode('utf-8')
+    return COUNT.pack(len(data)) + data
+
+
+def _fits(task):
+    """True if every value of `task` has a slot in the record layout."""
+    return (type(task.get('id')) is int and task['id'] in ID_RANGE
+            and all(type(task.get(key, '')) is str for key in ('text', 'priority', 'deadline'))
+            and type(task.get('subtasks', '')) in (str, Subtasks)
+            and type(task.get('done', False)) is bool
+            and type(task.get('due')) in (float, type(None)))
+
+
+class _Table:
+    def __init__(self):
+        self.index = {}
+
+    def ref(self, value):
+        ref = self.index.get(value)
+        if ref is None:
+            ref = self.index[value] = len(self.index)
+        return ref
+
+    def pack(self):
+        return COUNT.pack(len(self.index)) + b''.join(_pack_string(value) for value in self.index)
+
+
+def _pack_task(task, table):
+    if not _fits(task):
+        extra = json.dumps(task, default=encode_task).encode('utf-8')
+        return RECORD.pack(RECORD.size + len(extra), 0, RAW, 0, 0, 0, 0.0, 0) + extra
+    flags = 0
+    if 'text' in task:
+        flags |= HAS_TEXT
+    if 'done' in task:
+        flags |= HAS_DONE | (DONE if task['done'] else 0)
+    refs = []
+    for key, bit in (('priority', HAS_PRIORITY), ('deadline', HAS_DEADLINE),
+                     ('subtasks', HAS_SUBTASKS)):
+        if key in task:
+            flags |= bit
+            refs.append(table.ref(task[key] if bit != HAS_SUBTASKS else dump_subtasks(task[key])))
+        else:
+            refs.append(0)
+    due = task.get('due')
+    if 'due' in task:
+        flags |= HAS_DUE | (DUE_SET if due is not None else 0)
+    text = task.get('text', '').encode('utf-8')
+    others = {key: task[key] for key in task if key not in FIELDS}
+    extra = json.dumps(others).encode('utf-8') if others else b''
+    if extra:
+        flags |= HAS_EXTRA
+    size = RECORD.size + len(text) + len(extra)
+    return RECORD.pack(size, task['id'], flags, *refs, float(due or 0.0), len(text)) + text + extra
+
+
+def write_binary_list(f, name, tasks, compress=False, generation=None):
+    """Write `name`, `tasks` and an optional `generation` to the binary file `f`."""
+    table = _Table()
+    records = b''.join(_pack_task(task, table) for task in tasks)
+    body = b''.join((_pack_string(name), table.pack(), COUNT.pack(len(tasks)), records,
+                     b'' if generation is None else _pack_string(generation)))
+    f.write(MAGIC + bytes([FLAG_ZLIB if compress else 0]))
+    f.write(zlib.compress(body) if compress else body)
+
+
+def read_binary_list(f):
+    """Return ``(name, tasks, compressed, generation)`` from the binary file `f`."""
+    data = f.read()
+    if not is_binary(data):
+        raise ValueError('not a binary list file')
+    flags = data[len(MAGIC)]
+    data = data[len(MAGIC) + 1:]
+    if flags & FLAG_ZLIB:
+        data = zlib.decompress(data)
+    name, pos = _string(data, 0)
+    count, = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    table = []
+    for _ in range(count):
+        value, pos = _string(data, pos)
+        table.append(value)
+    count, = COUNT.unpack_from(data, pos)
+    pos += COUNT.size
+    tasks = []
+    trees = {}      # table index -> Subtasks decoded from it
+    unpack = RECORD.unpack_from
+    for _ in range(count):
+        size, task_id, bits, priority, deadline, subtasks, due, text_size = unpack(data, pos)
+        start, end = pos + RECORD.size, pos + size
+        pos = end
+        if bits & RAW:
+            tasks.append(Task(json.loads(data[start:end])))
+            continue
+        # Attributes are set directly: this loop builds every task of the list
+        task = Task()
+        task.id = task_id
+        if bits & HAS_TEXT:
+            task.text = data[start:start + text_size].decode('utf-8')
+        if bits & HAS_DONE:
+            task.done = bool(bits & DONE)
+        if bits & HAS_PRIORITY:
+            task.priority = table[priority]
+        if bits & HAS_DEADLINE:
+            task.deadline = table[deadline]
+        if bits & HAS_DUE:
+            task.due = due if bits & DUE_SET else None
+        if bits & HAS_SUBTASKS:
+            tree = trees.get(subtasks)
+            if tree is None:
+                tree = trees[subtasks] = to_subtasks(table[subtasks])
+            task.subtasks = tree
+        if bits & HAS_EXTRA:
+            task.update(json.loads(data[start + text_size:end]))
+        tasks.append(task)
+    generation = _string(data, pos)[0] if pos < len(data) else None
+    return name, tasks, bool(flags & FLAG_ZLIB), generation
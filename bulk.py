@@ -0,0 +1,145 @@
+"""Streaming import and export of tasks as CSV, newline-delimited JSON or text.
+
+    python cli.py import LIST FILE [--format csv|ndjson|text]
+    python cli.py export LIST FILE [--format csv|ndjson|text]
+
+read_tasks() reads a file a line at a time and yields each record as
+new_task arguments, checked against the task schema; records that do
+not fit are passed to an error callback with their line number and
+skipped.  import_tasks() adds them to a list BATCH_SIZE at a time, each
+batch one add_tasks() call and one write, so memory stays bounded by the
+batch however long the file is.  write_tasks() streams a list out in the
+same formats, one line per task.
+"""
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from tasks import dump_subtasks, encode_task, to_subtasks
+
+FORMATS = ('text', 'csv', 'ndjson')
+SUFFIXES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+COLUMNS = ('text', 'done', 'priority', 'deadline', 'subtasks')
+BATCH_SIZE = 10_000
+PRIORITIES = {'': '', 'high': 'High', 'medium': 'Medium', 'low': 'Low'}
+TRUE = frozenset({'1', 'true', 'yes', 'y', 'x', 'done', '✓'})
+FALSE = frozenset({'', '0', 'false', 'no', 'n'})
+FLAGS = TRUE | FALSE
+
+
+def guess_format(path):
+    """Return the format named by the suffix of `path`; plain text otherwise."""
+    return SUFFIXES.get(Path(path).suffix.lower(), 'text')
+
+
+def validate(record):
+    """Return `record` as new_task arguments, or raise ValueError saying what is wrong."""
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    text = record.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("missing text")
+    item = {'text': text.strip()}
+
+    done = record.get('done') or False
+    if isinstance(done, str):
+        flag = done.strip().lower()
+        if flag not in FLAGS:
+            raise ValueError(f"done must be true or false, not {done!r}")
+        done = flag in TRUE
+    elif done not in (True, False):     # also accepts 0 and 1
+        raise ValueError(f"done must be true or false, not {done!r}")
+    item['done'] = bool(done)
+
+    priority = record.get('priority') or ''
+    if not isinstance(priority, str) or priority.strip().lower() not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}")
+    item['priority'] = PRIORITIES[priority.strip().lower()]
+
+    deadline = record.get('deadline') or ''
+    if not isinstance(deadline, str):
+        raise ValueError("deadline must be text")
+    item['deadline'] = deadline.strip()
+
+    # A list of subtasks as saved, its JSON text, or the old free-text field
+    try:
+        item['subtasks'] = to_subtasks(record.get('subtasks') or '')
+    except TypeError as e:
+        raise ValueError(str(e)) from None
+    return item
+
+
+def _records(f, fmt):
+    """Yield ``(line number, record)`` for every record in `f`."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or 'text' not in reader.fieldnames:
+            raise ValueError("CSV needs a header row with a 'text' column")
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+    elif fmt == 'text':
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield number, {'text': line}
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+
+
+def read_tasks(f, fmt, on_error):
+    """Yield the valid records of `f`; call ``on_error(line, message)`` for the rest."""
+    for number, record in _records(f, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            yield validate(record)
+        except ValueError as e:
+            on_error(number, str(e))
+
+
+def import_tasks(store, name, items, batch_size=BATCH_SIZE):
+    """Add `items` to list `name` a batch at a time; return how many were added."""
+    items = iter(items)
+    count = 0
+    while True:
+        # The next batch is read while the writer saves the last one; waiting
+        # for it then keeps at most two batches in flight
+        batch = list(islice(items, batch_size))
+        store.flush()
+        if not batch:
+            return count
+        store.add_tasks(name, batch)
+        count += len(batch)
+
+
+def write_tasks(f, tasks, fmt):
+    """Write `tasks` to `f` one line each; return how many were written."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(COLUMNS)
+        for task in tasks:
+            writer.writerow([task.get('text', ''), 'true' if task.get('done') else 'false',
+                             task.get('priority') or '', task.get('deadline') or '',
+                             dump_subtasks(task.get('subtasks') or '')])
+            count += 1
+    elif fmt == 'ndjson':
+        for task in tasks:
+            record = {key: task.get(key) or '' for key in COLUMNS}
+            record['done'] = bool(task.get('done'))
+            f.write(json.dumps(record, ensure_ascii=False, default=encode_task) + '\n')
+            count += 1
+    elif fmt == 'text':
+        for task in tasks:
+            f.write(task.get('text', '') + '\n')
+            count += 1
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+    return count
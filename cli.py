@@ -0,0 +1,204 @@
+"""Command line access to the task lists, without Tk.
+
+    python cli.py lists
+    python cli.py add LIST TEXT [--deadline D] [--priority P] [--subtasks S]
+    python cli.py show LIST [--sort COLUMN] [--reverse] [--open | --done]
+    python cli.py toggle LIST ID [ID ...]
+    python cli.py import LIST FILE [--format csv|ndjson|text]   (- for stdin)
+    python cli.py export LIST FILE [--format csv|ndjson|text]   (- for stdout)
+    python cli.py search QUERY
+    python cli.py due [--limit N]
+
+``--storage`` (or ``TODO_STORAGE``) picks the lists directory or .db file.
+Changes go through the same journal and search index as the app.
+"""
+import argparse
+import sys
+import time
+
+from bulk import FORMATS, BATCH_SIZE, guess_format, read_tasks, import_tasks, write_tasks
+from ordering import SORT_COLUMNS
+from store import TodoStore, STORAGE, DUE_SOON_LIMIT
+from tasks import NO_SUBTASKS, is_overdue
+
+MAX_ERRORS = 10     # invalid records reported one by one; the rest are only counted
+
+
+def format_task(task):
+    done, total = task.get('subtasks', NO_SUBTASKS).progress
+    subtasks = f"{done}/{total} subtasks done" if total else ''
+    details = [value for value in (task.get('priority'), task['deadline'], subtasks) if value]
+    line = f"{task['id']:>5} [{'x' if task['done'] else ' '}] {task['text']}"
+    return f"{line}  ({', '.join(details)})" if details else line
+
+
+def open_input(path):
+    # utf-8-sig also reads files saved with a byte order mark, as spreadsheets do
+    return sys.stdin if path == '-' else open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def open_output(path):
+    return sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+
+
+def rate(count, seconds):
+    return f"{count} task(s) in {seconds:.2f}s ({count / seconds if seconds else 0:,.0f} tasks/s)"
+
+
+def cmd_lists(store, args):
+    for name, counts, overdue in store.overview():
+        print(f"{name}\t{counts.done}/{counts.total} done\t{overdue} overdue")
+
+
+def cmd_add(store, args):
+    if args.list not in store.lists:
+        store.create_list(args.list)
+    task = store.add_task(args.list, args.text, deadline=args.deadline,
+                          subtasks=args.subtasks, priority=args.priority)
+    print(format_task(task))
+
+
+def cmd_show(store, args):
+    store.sort_by(args.sort, args.reverse)
+    if args.state is None:
+        tasks = store.ordered(args.list)
+    else:
+        tasks = store.query(args.list, done=args.state == 'done')
+    for task in tasks:
+        print(format_task(task))
+
+
+def cmd_toggle(store, args):
+    for task_id in args.ids:
+        task = store.task(args.list, task_id)
+        if task is None:
+            print(f"No task {task_id} in {args.list}", file=sys.stderr)
+            return 1
+        store.toggle_task(args.list, task)
+        print(format_task(task))
+
+
+def cmd_import(store, args):
+    if args.list not in store.lists:
+        store.create_list(args.list)
+    fmt = args.format or guess_format(args.file)
+    skipped = []
+
+    def on_error(line, message):
+        if len(skipped) < MAX_ERRORS:
+            print(f"{args.file}:{line}: {message}", file=sys.stderr)
+        skipped.append(line)
+
+    start = time.perf_counter()
+    f = open_input(args.file)
+    try:
+        count = import_tasks(store, args.list, read_tasks(f, fmt, on_error), args.batch_size)
+    except ValueError as e:
+        print(f"Cannot import {args.file}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    print(f"Imported {rate(count, time.perf_counter() - start)} into {args.list}"
+          + (f", skipped {len(skipped)} invalid record(s)" if skipped else ''))
+
+
+def cmd_export(store, args):
+    fmt = args.format or guess_format(args.file)
+    start = time.perf_counter()
+    f = open_output(args.file)
+    try:
+        # The saved manual order, so exporting and importing again keeps it
+        count = write_tasks(f, store.load(args.list)['tasks'], fmt)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    print(f"Exported {rate(count, time.perf_counter() - start)} from {args.list}",
+          file=sys.stderr if f is sys.stdout else sys.stdout)
+
+
+def cmd_search(store, args):
+    store.flush()   # lists reindexed at startup must be searchable
+    for name, task_id, text, done in store.search(args.query):
+        print(f"{name}\t{task_id}\t[{'x' if done else ' '}] {text}")
+
+
+def cmd_due(store, args):
+    store.flush()
+    for due, name, task_id, text, deadline in store.due_soon(args.limit):
+        flag = 'overdue' if is_overdue(due) else ''
+        print(f"{deadline}\t{flag}\t{name}\t{task_id}\t{text}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Manage task lists from the command line.')
+    parser.add_argument('--storage', default=STORAGE,
+                        help='lists directory or .db file (default: $TODO_STORAGE or lists/)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('lists', help='show every list with its counts').set_defaults(run=cmd_lists)
+
+    add = sub.add_parser('add', help='add a task, creating the list if needed')
+    add.add_argument('list')
+    add.add_argument('text')
+    add.add_argument('--deadline', default='')
+    add.add_argument('--priority', default='')
+    add.add_argument('--subtasks', default='', help='subtasks, separated by commas')
+    add.set_defaults(run=cmd_add)
+
+    show = sub.add_parser('show', help='print the tasks of a list')
+    show.add_argument('list')
+    show.add_argument('--sort', choices=SORT_COLUMNS, default='done')
+    show.add_argument('--reverse', action='store_true')
+    state = show.add_mutually_exclusive_group()
+    state.add_argument('--open', dest='state', action='store_const', const='open')
+    state.add_argument('--done', dest='state', action='store_const', const='done')
+    show.set_defaults(run=cmd_show)
+
+    toggle = sub.add_parser('toggle', help='mark tasks done or not done')
+    toggle.add_argument('list')
+    toggle.add_argument('ids', nargs='+', type=int)
+    toggle.set_defaults(run=cmd_toggle)
+
+    imp = sub.add_parser('import', help='add tasks from a CSV, NDJSON or text file')
+    imp.add_argument('list')
+    imp.add_argument('file', help='file to read, or - for stdin')
+    imp.add_argument('--format', choices=FORMATS,
+                     help='default: from the file suffix (.csv, .ndjson, .jsonl), else text')
+    imp.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                     help='tasks added and saved at a time (default: %(default)s)')
+    imp.set_defaults(run=cmd_import)
+
+    exp = sub.add_parser('export', help='write the tasks of a list as CSV, NDJSON or text')
+    exp.add_argument('list')
+    exp.add_argument('file', help='file to write, or - for stdout')
+    exp.add_argument('--format', choices=FORMATS,
+                     help='default: from the file suffix (.csv, .ndjson, .jsonl), else text')
+    exp.set_defaults(run=cmd_export)
+
+    search = sub.add_parser('search', help='find tasks in every list')
+    search.add_argument('query')
+    search.set_defaults(run=cmd_search)
+
+    due = sub.add_parser('due', help='show overdue and upcoming tasks')
+    due.add_argument('--limit', type=int, default=DUE_SOON_LIMIT)
+    due.set_defaults(run=cmd_due)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = TodoStore(args.storage, delay=0)
+    try:
+        store.open()
+        if getattr(args, 'list', None) is not None and args.run not in (cmd_add, cmd_import) \
+                and args.list not in store.lists:
+            print(f"No list named {args.list!r}", file=sys.stderr)
+            return 1
+        return args.run(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import pytest
+
+from store import TodoStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An opened store on an empty lists directory under `tmp_path`."""
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    return store
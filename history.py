@@ -0,0 +1,86 @@
+"""Undo and redo, recorded as small inverse operations.
+
+Each change the store makes is kept as a Step holding the two actions
+that undo and redo it.  An action is the name of a TodoStore method and
+its arguments, and refers to the tasks it touches rather than copying
+the list, so a step on a 100k task list is as small as one on an empty
+one and replaying it costs the same as the original change.
+
+Steps are charged an estimate of the memory they keep alive: a fixed
+amount each, plus the tasks that only the history still refers to (a
+removed task, the old text of an edit, a deleted list).  When the total
+passes the budget the oldest steps are dropped first.
+"""
+from collections import deque
+
+HISTORY_BUDGET = 8 << 20    # bytes of undo history kept
+STEP_COST = 256             # a step, its actions and their argument tuples
+TASK_COST = 256             # a Task kept alive by the history, besides its text
+
+
+def task_cost(task):
+    return TASK_COST + len(task.get('text', ''))
+
+
+class Step:
+    """One undoable change.
+
+    `undo` and `redo` are ``(method name, *args)`` tuples; `names` are the
+    list to show after undoing and after redoing, and `tasks` the tasks
+    to select.
+    """
+
+    __slots__ = ('undo', 'redo', 'names', 'tasks', 'cost')
+
+    def __init__(self, undo, redo, names, tasks=(), cost=STEP_COST):
+        self.undo = undo
+        self.redo = redo
+        self.names = names
+        self.tasks = tasks
+        self.cost = cost
+
+
+class History:
+    def __init__(self, budget=HISTORY_BUDGET):
+        self.budget = budget
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.size = 0       # estimated bytes held by both stacks
+
+    def record(self, step):
+        """Add a new change; it replaces anything that could be redone."""
+        for old in self.redo_steps:
+            self.size -= old.cost
+        self.redo_steps.clear()
+        self.undo_steps.append(step)
+        self.size += step.cost
+        # The newest step is kept even if it alone is over the budget
+        while self.size > self.budget and len(self.undo_steps) > 1:
+            self.size -= self.undo_steps.popleft().cost
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo(self):
+        """Move the latest step to the redo stack and return it, or None."""
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self):
+        """Move the latest undone step back and return it, or None."""
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.size = 0
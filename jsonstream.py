@@ -0,0 +1,199 @@
+"""Incremental reading and writing of list files.
+
+A list file is ``{"name": ..., "tasks": [...]}`` as written by
+``json.dump(data, f, indent=2)``.  read_list_file() parses it a chunk at
+a time and hands each element of the ``tasks`` array to the caller as
+soon as it is complete; write_list_file() produces the same bytes as
+json.dump would, buffering at most one chunk.  Neither ever holds the
+whole document, so memory stays bounded by CHUNK_SIZE plus the tasks
+the caller keeps.
+"""
+import json
+import re
+
+CHUNK_SIZE = 1 << 16    # characters read or written at a time
+NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
+ELEMENT_END = '\n    }'     # closes a task object in the indent=2 layout
+SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+# Between the members of a task written at the indent=2 nesting of a list file
+MEMBER_SEPARATORS = (',\n      ', ': ')
+CONTAINERS = (dict, list, tuple)
+
+_decoder = json.JSONDecoder()
+
+
+class _Scanner:
+    """A window over a text file that refills itself as parsing advances."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.batching = True
+        self.batched_chunk = False
+
+    def fill(self):
+        """Read another chunk; return False at the end of the file."""
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        self.eof = not data
+        self.batched_chunk = False
+        return not self.eof
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end."""
+        while True:
+            match = NON_WHITESPACE.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of the current chunk")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number or literal that ends the buffer may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def array(self, on_item):
+        """Decode the array at the current position, calling `on_item` per element.
+
+        This is the loop every task goes through, so it scans directly
+        rather than through peek() and value().
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        scan_once = _decoder.scan_once
+        while True:
+            buf, pos = self.buf, self.pos
+            items, end = self._batch(buf, pos)
+            if items is None:
+                try:
+                    item, end = scan_once(buf, pos)
+                    items = (item,)
+                except (StopIteration, json.JSONDecodeError):
+                    pass
+            # The separator must be in view too: an item that ends the
+            # buffer may be a number that continues in the next chunk
+            match = SEPARATOR.match(buf, end) if items is not None else None
+            if match is None:
+                if not self.fill():
+                    raise ValueError("unterminated or malformed tasks array")
+                self.peek()
+                continue
+            for item in items:
+                on_item(item)
+            self.pos = match.end()
+            if match.group(1) == ']':
+                return
+
+    def _batch(self, buf, pos):
+        """Decode every complete task in view at once, if the file is indented as we write it.
+
+        In that layout a line of exactly four spaces and ``}`` can only
+        close an element of the tasks array, so everything up to the last
+        such line is whole elements.  One decode call for the lot is much
+        cheaper than one per task.
+        """
+        if not self.batching or self.batched_chunk:
+            return None, pos
+        # Nothing after the last cut can be batched until more is read
+        self.batched_chunk = True
+        cut = buf.rfind(ELEMENT_END, pos)
+        if cut == -1:
+            return None, pos
+        end = cut + len(ELEMENT_END)
+        try:
+            return json.loads(f"[{buf[pos:end]}]"), end
+        except ValueError:
+            self.batching = False   # some other layout; go element by element
+            return None, pos
+
+
+def read_list_file(f, on_task, chunk_size=CHUNK_SIZE):
+    """Parse a list file, calling `on_task` with each element of its tasks.
+
+    Returns the other top-level members, such as ``name``, as a dict.
+    A ``tasks`` value that is not an array is returned there unparsed
+    into tasks, for the caller to treat as it sees fit.
+    """
+    scan = _Scanner(f, chunk_size)
+    members = {}
+    scan.expect('{')
+    if scan.peek() == '}':
+        return members
+    while True:
+        key = scan.value()
+        scan.expect(':')
+        if key == 'tasks' and scan.peek() == '[':
+            scan.array(on_task)
+        else:
+            members[key] = scan.value()
+        if scan.peek() != ',':
+            break
+        scan.expect(',')
+    scan.expect('}')
+    return members
+
+
+def _task_writer(default):
+    """Return a function that encodes one task as write_list_file lays it out.
+
+    json only uses its C encoder without `indent`.  A task whose values
+    are all scalars or empty containers is one line per member, so the C
+    encoder with the right separators gives the same text; anything
+    nested goes through the indenting encoder.
+    """
+    flat = json.JSONEncoder(separators=MEMBER_SEPARATORS, default=default).encode
+
+    def encode(task):
+        item = task if type(task) is dict or default is None else default(task)
+        if type(item) is dict and item and not any(v and isinstance(v, CONTAINERS) for v in item.values()):
+            return '{\n      ' + flat(item)[1:-1] + '\n    }'
+        return json.dumps(task, indent=2, default=default).replace('\n', '\n    ')
+    return encode
+
+
+def write_list_file(f, name, tasks, default=None, chunk_size=CHUNK_SIZE, generation=None):
+    """Write `name`, `generation` if given, and `tasks` exactly as ``json.dump(..., indent=2)`` would."""
+    f.write(f'{{\n  "name": {json.dumps(name)},\n')
+    if generation is not None:
+        f.write(f'  "generation": {json.dumps(generation)},\n')
+    f.write('  "tasks": [')
+    encode = _task_writer(default)
+    parts, size, count = [], 0, 0
+    for task in tasks:
+        text = encode(task)
+        parts.append(f"{',' if count else ''}\n    {text}")
+        size += len(text)
+        count += 1
+        if size >= chunk_size:
+            f.write(''.join(parts))
+            parts, size = [], 0
+    if count:
+        parts.append('\n  ')
+    f.write(''.join(parts) + ']\n}')
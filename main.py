@@ -1,17 +1,73 @@
+import time
+STARTED = time.perf_counter()   # before the imports, for --profile-startup
+
+import argparse
+import base64
+import logging
+import sys
+import tempfile
 import tkinter as tk
-from tkinter import simpledialog, messagebox, ttk, PhotoImage
+from tkinter import simpledialog, messagebox, filedialog, ttk
 import tkinter.font as tkfont
-import json
-import os
+from bisect import bisect_left
 from pathlib import Path
-import base64
 
-APP_DIR = Path(__file__).parent
-LISTS_DIR = APP_DIR / "lists"
+import perf
+from taskview import FrameScheduler, TaskView
+from tasks import NO_SUBTASKS, is_overdue, to_subtasks
+from store import TodoStore, APP_DIR
+from watcher import open_watcher
+
+log = logging.getLogger(__name__)
+
+PRIORITIES = ('', 'High', 'Medium', 'Low')
+KEEP = '(unchanged)'    # batch edit value that leaves a field alone
+STARTUP_POLL_MS = 20    # how often startup checks for lists opened in the background
+PERF_REFRESH_MS = 1000  # how often an open performance panel updates
+WRITE_ERROR_POLL_MS = 1000  # how often the app checks for failed background saves
+WRITE_ERRORS_SHOWN = 5  # failed saves listed in one message
+
+def progress_label(subtasks):
+    """Text for the Subtasks column, from the roll-up cached on `subtasks`."""
+    done, total = subtasks.progress
+    return f"{done}/{total} done" if total else ""
+
+
+class SubtaskRow:
+    """A subtask shown in the task view, under the row of its parent."""
+
+    __slots__ = ('task', 'subtask', 'parent', 'depth')
+
+    def __init__(self, task, subtask, parent, depth):
+        self.task = task
+        self.subtask = subtask
+        self.parent = parent    # the row above it: its task or parent subtask
+        self.depth = depth
+
+
+class StartupTimer:
+    """Times the phases of startup for --profile-startup."""
+
+    def __init__(self, start=STARTED):
+        self.start = self.last = start
+        self.phases = []
+
+    def mark(self, phase):
+        """End `phase`, which began where the previous one ended."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last, now - self.start))
+        self.last = now
+
+    def report(self, file=None):
+        print(f"{'startup phase':<28}{'ms':>10}{'since start':>14}", file=file)
+        for phase, took, since in self.phases:
+            print(f"{phase:<28}{took * 1000:>10.1f}{since * 1000:>14.1f}", file=file)
+
 
 class TodoApp:
-    def __init__(self, root):
+    def __init__(self, root, store=None, timer=None):
         self.root = root
+        self.timer = timer      # a StartupTimer under --profile-startup
         root.title("TO DO LIST")
         root.geometry('720x520')  # Slightly larger to accommodate padding
         root.minsize(620, 480)
@@ -20,10 +76,9 @@ class TodoApp:
         main_container = ttk.Frame(root, style='Main.TFrame')
         main_container.pack(fill=tk.BOTH, expand=True, padx=12, pady=12)
 
-        LISTS_DIR.mkdir(exist_ok=True)
-
         # Setup cotton candy theme
         self.setup_style()
+        self.mark('style')
 
         # Top frame: list selector and New List button (with shadow)
         top_shadow = ttk.Frame(main_container, style='Shadow.TFrame')
@@ -35,41 +90,90 @@ class TodoApp:
         ttk.Label(top_frame, text="Select list:", style='Cotton.TLabel').pack(side=tk.LEFT)
         self.list_var = tk.StringVar()
         self.list_selector = ttk.Combobox(top_frame, textvariable=self.list_var, state='readonly',
-                                         style='Cotton.TCombobox', width=30)
+                                         style='Cotton.TCombobox', width=36)
         self.list_selector.pack(side=tk.LEFT, padx=6)
-        self.list_selector.bind('<<ComboboxSelected>>', lambda e: self.select_list(self.list_var.get()))
+        # Entries show each list's counts; list_names holds the names in the same order
+        self.list_names = []
+        self.list_labels = []
+        self.list_selector.bind('<<ComboboxSelected>>',
+                                lambda e: self.select_list(self.list_names[self.list_selector.current()]))
 
         ttk.Button(top_frame, text="New List", command=self.new_list,
                   style='Accent.TButton').pack(side=tk.LEFT, padx=6)
 
+        # Search across all lists; results narrow as you type
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(top_frame, textvariable=self.search_var,
+                                      style='Cotton.TEntry', width=24)
+        self.search_entry.pack(side=tk.RIGHT, padx=6)
+        ttk.Label(top_frame, text="Search:", style='Cotton.TLabel').pack(side=tk.RIGHT)
+        self.search_var.trace_add('write', lambda *args: self.filter_tasks())
+
+        self.results_frame = ttk.Frame(main_container, style='Card.TFrame')
+        self.results_box = tk.Listbox(self.results_frame, height=6, activestyle='none',
+                                      bg=self.colors['bg_mid'], fg=self.colors['text'],
+                                      selectbackground=self.colors['accent'],
+                                      highlightthickness=0, borderwidth=0)
+        self.results_box.pack(fill=tk.X, padx=2, pady=2)
+        self.search_results = []
+
+        # Keys used while searching stop at these tags instead of reaching
+        # the window's task shortcuts
+        for widget, tag in ((self.search_entry, 'SearchEntry'), (self.results_box, 'SearchResults')):
+            tags = list(widget.bindtags())
+            tags.insert(tags.index(str(root)), tag)
+            widget.bindtags(tags)
+            for key in ('<space>', '<Delete>', '<Up>', '<Down>'):
+                root.bind_class(tag, key, lambda e: 'break')
+            root.bind_class(tag, '<Escape>', lambda e: self.search_var.set(''))
+        root.bind_class('SearchEntry', '<Down>', lambda e: self.focus_search_results() or 'break')
+        root.bind_class('SearchEntry', '<Return>', lambda e: self.open_search_result(0) or 'break')
+        self.results_box.bind('<Double-Button-1>', lambda e: self.open_search_result())
+        self.results_box.bind('<Return>', lambda e: self.open_search_result())
+
         # Middle: tree view for tasks with more details (with shadow)
         middle_shadow = ttk.Frame(main_container, style='Shadow.TFrame')
         middle_shadow.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+        self.middle_shadow = middle_shadow
         
         middle = ttk.Frame(middle_shadow, style='Card.TFrame')
         middle.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
 
         # Tree view for tasks
-        self.tree = ttk.Treeview(middle, columns=("Done", "Task", "Deadline", "Subtasks"),
-                                show="headings", style="Cotton.Treeview")
+        self.tree = ttk.Treeview(middle, columns=("Done", "Task", "Priority", "Deadline", "Subtasks"),
+                                show="tree headings", selectmode='extended', style="Cotton.Treeview")
         
-        self.tree.heading("Done", text="✓")
-        self.tree.heading("Task", text="Task")
-        self.tree.heading("Deadline", text="Deadline")
-        self.tree.heading("Subtasks", text="Subtasks")
-
+        # Clicking a heading sorts by that column; clicking again reverses
+        self.headings = {'Done': ("✓", 'done'), 'Task': ("Task", 'text'),
+                         'Priority': ("Priority", 'priority'), 'Deadline': ("Deadline", 'deadline'),
+                         'Subtasks': ("Subtasks", None)}
+        for heading, (text, column) in self.headings.items():
+            command = (lambda c=column: self.sort_by(c)) if column else ''
+            self.tree.heading(heading, text=text, command=command)
+
+        # The tree column only holds the expanders of tasks with subtasks
+        self.tree.column("#0", width=36, stretch=False)
         self.tree.column("Done", width=30, anchor="center")
-        self.tree.column("Task", width=300)
+        self.tree.column("Task", width=260)
+        self.tree.column("Priority", width=70, anchor="center")
         self.tree.column("Deadline", width=100, anchor="center")
-        self.tree.column("Subtasks", width=170)
+        self.tree.column("Subtasks", width=150)
 
         self.tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         self.tree.bind("<Double-1>", self.edit_task)
         self.tree.bind("<space>", lambda e: self.toggle_task_done())
 
-        scrollbar = ttk.Scrollbar(middle, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar = ttk.Scrollbar(middle, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Only the rows around the viewport live in the tree, and subtask
+        # rows only once their task is expanded.  Redrawing waits for the
+        # next frame, so key repeat does not queue up a redraw per key.
+        self.frames = FrameScheduler(root)
+        self.view = TaskView(self.tree, scrollbar, self.format_row, key=self.row_key,
+                             children=self.subtask_rows,
+                             has_children=lambda row: bool(self.row_subtasks(row)),
+                             parent=lambda row: row.parent if type(row) is SubtaskRow else None,
+                             locate=self.locate_task, scheduler=self.frames)
 
         # Bottom: task entry and controls
         bottom = ttk.Frame(main_container, style='Card.TFrame')
@@ -90,6 +194,11 @@ class TodoApp:
         self.entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=4)
         self.entry.bind('<Return>', lambda e: self.add_task())
 
+        ttk.Label(row1, text="Priority:", style='Cotton.TLabel').pack(side=tk.LEFT, padx=4)
+        self.priority_var = tk.StringVar()
+        ttk.Combobox(row1, textvariable=self.priority_var, values=PRIORITIES, state='readonly',
+                     style='Cotton.TCombobox', width=8).pack(side=tk.LEFT, padx=4)
+
         # Second row: deadline and subtasks
         row2 = ttk.Frame(input_frame)
         row2.pack(fill=tk.X, pady=2)
@@ -126,18 +235,48 @@ class TodoApp:
                   style='Cotton.TButton').pack(side=tk.LEFT, padx=6)
         ttk.Button(ctrl, text="Delete List", command=self.delete_list,
                   style='Cotton.TButton').pack(side=tk.LEFT, padx=6)
+        ttk.Button(ctrl, text="Due Soon", command=self.show_due_soon,
+                  style='Cotton.TButton').pack(side=tk.RIGHT, padx=6)
 
-        # load lists and select default
-        self.lists = {} # type: ignore
         self.current_list = None
+        # Lists, tasks and saving live in the store; this class is the view
+        self.store = store or TodoStore()
+        self.lists = self.store.lists
+        self.watcher = None
+        root.protocol('WM_DELETE_WINDOW', self.quit)
+        self.mark('widgets and store')
+
+        # Only what the first frame shows is built so far; menus, shortcuts,
+        # the icon and the lists follow once Tk is idle after drawing it
+        root.after_idle(self.finish_startup)
+
+    def mark(self, phase):
+        if self.timer is not None:
+            self.timer.mark(phase)
+
+    def finish_startup(self):
+        """Set up what the first frame does not need, then start loading lists."""
+        self.mark('first frame')
+        self.bind_shortcuts()
+        self.build_menu()
+        self.setup_style_maps()
+        self.load_icon()
+        self.mark('menus, shortcuts and icon')
+
+        # The window is already up; lists fill in as they are read
         self.load_lists()
-        if self.list_selector['values']:
-            self.list_selector.current(0)
-            self.select_list(self.list_selector.get())
 
-        # Bindings: double-click to edit task, keyboard shortcuts
+        # Pick up edits other programs (such as a sync tool) make to the lists folder
+        directory = getattr(self.store.storage, 'directory', None)
+        self.watcher = open_watcher(directory) if directory is not None else None
+        if self.watcher is not None:
+            self.root.after(self.watcher.interval, self.check_for_changes)
+        self.root.after(WRITE_ERROR_POLL_MS, self.check_write_errors)
+
+    def bind_shortcuts(self):
+        root = self.root
+        # Double-click to edit a task
         self.tree.bind('<Double-Button-1>', lambda e: self.edit_task())
-        # Keyboard shortcuts
         # List management
         root.bind('<Control-n>', lambda e: self.new_list())
         root.bind('<Control-N>', lambda e: self.new_list())
@@ -145,14 +284,24 @@ class TodoApp:
         root.bind('<Control-R>', lambda e: self.rename_list())
         root.bind('<Control-d>', lambda e: self.delete_list())
         root.bind('<Control-D>', lambda e: self.delete_list())
+        root.bind('<Control-l>', lambda e: self.show_overview())
+        root.bind('<Control-L>', lambda e: self.show_overview())
         
         # Task management
         root.bind('<Control-a>', lambda e: self.focus_add_task())
         root.bind('<Control-A>', lambda e: self.focus_add_task())
         root.bind('<Delete>', lambda e: self.remove_task())
+        root.bind('<Control-k>', lambda e: self.add_subtask())
+        root.bind('<Control-K>', lambda e: self.add_subtask())
         root.bind('<Control-e>', lambda e: self.edit_task())
         root.bind('<Control-E>', lambda e: self.edit_task())
         root.bind('<space>', lambda e: self.toggle_task_done())
+        root.bind('<Control-u>', lambda e: self.show_due_soon())
+        root.bind('<Control-U>', lambda e: self.show_due_soon())
+        root.bind('<Control-z>', lambda e: self.undo())
+        root.bind('<Control-Z>', lambda e: self.redo())     # Ctrl+Shift+Z
+        root.bind('<Control-y>', lambda e: self.redo())
+        root.bind('<Control-Y>', lambda e: self.redo())
         
         # Navigation
         root.bind('<Control-Up>', lambda e: self.move_task_up())
@@ -164,7 +313,8 @@ class TodoApp:
         root.bind('<Up>', lambda e: self.select_previous_task())
         root.bind('<Down>', lambda e: self.select_next_task())
 
-        # Menu
+    def build_menu(self):
+        root = self.root
         menubar = tk.Menu(root)
         
         # File menu
@@ -172,16 +322,26 @@ class TodoApp:
         filemenu.add_command(label='New List (Ctrl+N)', command=self.new_list)
         filemenu.add_command(label='Rename List (Ctrl+R)', command=self.rename_list)
         filemenu.add_command(label='Delete List (Ctrl+D)', command=self.delete_list)
+        filemenu.add_command(label='Lists Overview (Ctrl+L)', command=self.show_overview)
         filemenu.add_separator()
-        filemenu.add_command(label='Exit (Alt+F4)', command=root.quit)
+        filemenu.add_command(label='Exit (Alt+F4)', command=self.quit)
         menubar.add_cascade(label='File', menu=filemenu)
 
+        # Edit menu
+        editmenu = tk.Menu(menubar, tearoff=0)
+        editmenu.add_command(label='Undo (Ctrl+Z)', command=self.undo)
+        editmenu.add_command(label='Redo (Ctrl+Y)', command=self.redo)
+        menubar.add_cascade(label='Edit', menu=editmenu)
+
         # Task menu
         taskmenu = tk.Menu(menubar, tearoff=0)
         taskmenu.add_command(label='Add Task (Ctrl+A)', command=self.focus_add_task)
+        taskmenu.add_command(label='Add Subtask (Ctrl+K)', command=self.add_subtask)
         taskmenu.add_command(label='Edit Task (Ctrl+E)', command=self.edit_task)
         taskmenu.add_command(label='Remove Task (Delete)', command=self.remove_task)
         taskmenu.add_command(label='Toggle Done (Space)', command=self.toggle_task_done)
+        taskmenu.add_command(label='Select All Tasks', command=self.select_all_tasks)
+        taskmenu.add_command(label='Due Soon (Ctrl+U)', command=self.show_due_soon)
         taskmenu.add_separator()
         taskmenu.add_command(label='Move Up (Ctrl+↑)', command=lambda: self.move_task_up())
         taskmenu.add_command(label='Move Down (Ctrl+↓)', command=lambda: self.move_task_down())
@@ -190,180 +350,264 @@ class TodoApp:
         # Help menu
         helpmenu = tk.Menu(menubar, tearoff=0)
         helpmenu.add_command(label='Keyboard Shortcuts', command=self.show_shortcuts)
+        helpmenu.add_command(label='Performance', command=self.show_performance)
         helpmenu.add_command(label='About', command=lambda: messagebox.showinfo('About', 'Simple TO DO LIST - Tkinter\\n\\nUse keyboard shortcuts for quick access!'))
         menubar.add_cascade(label='Help', menu=helpmenu)
 
         root.config(menu=menubar)
 
-    def setup_style(self):
-        """Configure cotton candy theme with pastels."""
-        self.colors = {
-            'bg_light': '#FFF0F5',    # Light pink background
-            'bg_mid': '#FFE4F3',      # Mid pink
-            'accent': '#FF9ECD',      # Cotton candy pink
-            'button': '#E0B1FF',      # Soft purple
-            'button_hover': '#D094FF', # Darker purple
-            'text': '#6B4E71',        # Muted purple text
-            'highlight': '#B6D0FF',    # Soft blue highlight
-            'shadow': '#FFD6E5',      # Soft pink shadow
-            'border': '#FFB6E1'       # Border pink
-        }
-
-        # Setup fonts
-        base_font = tkfont.nametofont('TkDefaultFont')
-        self.fonts = {
-            'regular': (base_font.actual('family'), 10),
-            'bold': (base_font.actual('family'), 10, 'bold')
-        }
+    def quit(self):
+        """Write out pending changes and leave the main loop."""
+        if self.watcher is not None:
+            self.watcher.close()
+        self.store.close()
+        if perf.EXPORT_PATH:
+            try:
+                perf.STATS.export(perf.EXPORT_PATH)
+            except Exception:
+                log.exception("Error exporting performance stats")
+        self.root.quit()
 
-        # Configure ttk styles
-        style = ttk.Style()
+    @perf.timed
+    def load_lists(self):
+        """Show the lists known so far; the rest stream in as workers parse them."""
+        self.store.open_in_background()
+        self.update_list_selector()
+        self.collect_lists()
+
+    @perf.timed
+    def collect_lists(self):
+        """Add lists opened in the background, until all of them are in."""
         try:
-            style.theme_use('clam')  # Use clam as base
-        except:
-            pass  # Fallback to default if clam isn't available
-
-        # Frame styling with shadow effect
-        style.configure('Card.TFrame', 
-                       background=self.colors['bg_light'],
-                       borderwidth=1,
-                       relief='solid',
-                       bordercolor=self.colors['border'])
-        
-        # Add shadow effect class
-        style.configure('Shadow.TFrame',
-                       background=self.colors['shadow'],
-                       borderwidth=2,
-                       relief='solid',
-                       bordercolor=self.colors['border'])
-        
-        # Label styling
-        style.configure('Cotton.TLabel',
-                       background=self.colors['bg_light'],
-                       foreground=self.colors['text'],
-                       font=self.fonts['regular'])
-
-        # Button styling with enhanced hover effects
-        style.configure('Cotton.TButton',
-                       background=self.colors['button'],
-                       foreground=self.colors['text'],
-                       font=self.fonts['regular'],
-                       padding=6,
-                       relief='raised',
-                       borderwidth=2)
-        style.map('Cotton.TButton',
-                 background=[('active', self.colors['button_hover']),
-                           ('pressed', self.colors['accent'])],
-                 relief=[('pressed', 'sunken'),
-                        ('active', 'ridge')],
-                 borderwidth=[('pressed', 1),
-                            ('active', 3)],
-                 foreground=[('pressed', 'white'),
-                           ('active', self.colors['text'])])
+            names, done = self.store.poll_opened()
+        except Exception:
+            log.exception("Error loading lists")
+            names, done = [], True
+        if names:
+            self.update_list_selector()
+        # Show a list as soon as one is ready, unless the user already picked one
+        if self.current_list is None and (names or done):
+            if not self.lists and done:
+                # create default list
+                self.store.create_list('default')
+                self.update_list_selector()
+            ready = [name for name in names if name in self.lists]
+            if ready or self.lists:
+                first = min(ready) if ready else self.store.names()[0]
+                self.show_list_label(first)
+                self.select_list(first)
+                self.mark('first list shown')
+        if not done:
+            self.root.after(STARTUP_POLL_MS, self.collect_lists)
+        elif self.timer is not None:
+            self.mark('all lists loaded')
+            self.timer.report()
+            self.quit()
+
+    def check_write_errors(self):
+        """Tell the user about saves that failed in the background, then check again later."""
+        errors = self.store.write_errors()
+        if errors:
+            shown = errors[:WRITE_ERRORS_SHOWN]
+            if len(errors) > len(shown):
+                shown.append(f'... and {len(errors) - len(shown)} more')
+            messagebox.showerror('Error', 'Some changes could not be saved:\n\n' + '\n'.join(shown))
+        self.root.after(WRITE_ERROR_POLL_MS, self.check_write_errors)
+
+    @perf.timed
+    def check_for_changes(self):
+        """Reload lists changed outside the app, then check again later."""
+        try:
+            changed = self.store.refresh_changed(self.watcher.changes())
+        except Exception:
+            log.exception("Error checking for changed lists")
+            changed = set()
+        if changed:
+            self.update_list_selector()
+            if self.current_list in changed:
+                if self.current_list in self.lists:
+                    self.refresh_task_view()
+                else:
+                    self.show_first_list()
+        self.root.after(self.watcher.interval, self.check_for_changes)
+
+    def show_first_list(self):
+        """Select the first list, or clear the view if there are none."""
+        if self.list_names:
+            self.show_list_label(self.list_names[0])
+            self.select_list(self.list_names[0])
+        else:
+            self.current_list = None
+            self.list_selector.set('')
+            self.view.set_rows([], reset=True)
 
-        # Accent button (New List) with enhanced hover effects
-        style.configure('Accent.TButton',
-                       background=self.colors['accent'],
-                       foreground='white',
-                       font=self.fonts['bold'],
-                       padding=6,
-                       relief='raised',
-                       borderwidth=2)
-        style.map('Accent.TButton',
-                 background=[('pressed', '#FF5AA8'),
-                           ('active', '#FF7AB8')],
-                 relief=[('pressed', 'sunken'),
-                        ('active', 'ridge')],
-                 borderwidth=[('pressed', 1),
-                            ('active', 3)],
-                 foreground=[('pressed', 'white'),
-                           ('active', 'white')])
+    def update_list_selector(self):
+        self.list_names = self.store.names()
+        self.list_labels = [self.list_label(name) for name in self.list_names]
+        self.list_selector['values'] = self.list_labels
 
-        # Entry styling
-        style.configure('Cotton.TEntry',
-                       fieldbackground=self.colors['bg_mid'],
-                       foreground=self.colors['text'],
-                       padding=6)
-
-        # Combobox styling
-        style.configure('Cotton.TCombobox',
-                       background=self.colors['bg_mid'],
-                       fieldbackground=self.colors['bg_mid'],
-                       foreground=self.colors['text'],
-                       arrowcolor=self.colors['text'],
-                       padding=6)
+    def list_label(self, name):
+        """Return the selector entry of list `name`: its name and counts."""
+        counts = self.lists[name]['counts']
+        overdue = counts.overdue()
+        return f"{name}  ({counts.done}/{counts.total} done{f', {overdue} overdue' if overdue else ''})"
 
-        # Configure root background
-        self.root.configure(bg=self.colors['bg_light'])
-        
-        # Load the application logo
-        ico_path = APP_DIR / 'assets' / 'logo.ico'
-        try:
-            if ico_path.exists():
-                print(f"Loading logo from: {ico_path}")
-                self.root.iconbitmap(str(ico_path))
-            else:
-                print(f"Logo file not found at: {ico_path}")
-        except Exception as e:
-            print(f"Error loading logo: {e}")
+    def show_list_label(self, name):
+        self.list_selector.set(self.list_label(name))
 
-    def load_lists(self):
-        self.lists = {}
-        files = sorted(LISTS_DIR.glob('*.json'))
-        names = []
-        for p in files:
-            try:
-                with open(p, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    name = data.get('name', p.stem)
-                    # Convert old format to new format if needed
-                    tasks = data.get('tasks', [])
-                    if isinstance(tasks, list) and tasks and isinstance(tasks[0], str):
-                        # Convert old string tasks to new dictionary format
-                        tasks = [{'text': t, 'done': False,
-                                'deadline': '', 'subtasks': ''} for t in tasks]
-                    self.lists[name] = {'path': p, 'tasks': tasks}
-                    names.append(name)
-            except Exception as e:
-                print(f"Error loading {p}: {e}")  # For debugging
-                continue
-        if not names:
-            # create default list
-            self.create_list_file('default')
-            self.load_lists()
+    def update_list_label(self):
+        """Bring the counts shown for the current list up to date."""
+        name = self.current_list
+        if name not in self.lists:
             return
-        self.list_selector['values'] = names
-
+        label = self.list_label(name)
+        i = bisect_left(self.list_names, name)
+        if i < len(self.list_names) and self.list_names[i] == name and self.list_labels[i] != label:
+            self.list_labels[i] = label
+            self.list_selector['values'] = self.list_labels
+        if self.list_var.get() != label:
+            self.list_selector.set(label)
+
+    @perf.timed
     def select_list(self, name):
         if name not in self.lists:
             return
+        try:
+            self.store.load(name)
+        except Exception as e:
+            messagebox.showerror('Error', f'Could not load list "{name}": {e}')
+            return
         self.current_list = name
-        self.refresh_task_view()
+        self.refresh_task_view(reset=True)
 
-    def refresh_task_view(self):
+    @perf.timed
+    def refresh_task_view(self, reset=False):
         if not self.current_list:
             return
         
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        tasks = self.lists[self.current_list]['tasks']
-            
-        # Sort tasks: incomplete first
-        tasks.sort(key=lambda x: x['done'])
-            
-        # Add tasks to tree
-        for task in tasks:
-            self.tree.insert("", tk.END, values=(
-                "✓" if task['done'] else "",
-                task['text'],
-                task['deadline'],
-                task['subtasks']
-            ))
+        # The order is kept sorted as tasks change; the stored list stays
+        # in manual order.  The view only renders the rows around the viewport.
+        self.view.set_rows(self.store.ordered(self.current_list), reset=reset)
+        self.frames.request(self.update_list_label)
+
+    def sort_by(self, column):
+        """Sort the task view by `column`; a second click reverses it."""
+        store = self.store
+        store.sort_by(column, not store.sort_descending if column == store.sort_column else False)
+        for heading, (text, key) in self.headings.items():
+            arrow = (" ▼" if store.sort_descending else " ▲") if key == column else ""
+            self.tree.heading(heading, text=text + arrow)
+        self.refresh_task_view()
 
+    @staticmethod
+    def format_row(row):
+        if type(row) is SubtaskRow:
+            subtask = row.subtask
+            return (
+                "✓" if subtask.done else "",
+                "   " * row.depth + subtask.text,
+                "",
+                subtask.deadline,
+                progress_label(subtask.children)
+            )
+        return (
+            "✓" if row['done'] else "",
+            row['text'],
+            row.get('priority') or "",
+            row['deadline'],
+            progress_label(row.get('subtasks', NO_SUBTASKS))
+        )
+
+    @staticmethod
+    def row_key(row):
+        # Subtask rows are "<task id>.<subtask id>", which no task id can be
+        if type(row) is SubtaskRow:
+            return f"{row.task['id']}.{row.subtask.id}"
+        return row['id']
+
+    @staticmethod
+    def row_subtasks(row):
+        return row.subtask.children if type(row) is SubtaskRow else row.get('subtasks', NO_SUBTASKS)
+
+    def subtask_rows(self, row):
+        """Rows for the subtasks of `row`, made when it is expanded."""
+        task, depth = (row.task, row.depth + 1) if type(row) is SubtaskRow else (row, 1)
+        return [SubtaskRow(task, subtask, row, depth) for subtask in self.row_subtasks(row)]
+
+    def locate_task(self, iid):
+        """Return the position of task row `iid` in the current order, or None."""
+        if '.' in iid or self.current_list not in self.lists:
+            return None
+        entry = self.lists[self.current_list]
+        task = entry['index'].get(int(iid))
+        return entry['order'].index(task) if task is not None else None
+
+    @perf.timed
     def filter_tasks(self):
-        self.refresh_task_view()
+        """Show the tasks of every list that match the search box."""
+        query = self.search_var.get().strip()
+        if not query:
+            self.show_results(None)
+            return
+        try:
+            matches = self.store.search(query)
+        except Exception:
+            log.exception("Error searching")
+            matches = []
+        self.show_results([(name, task_id, f"{'✓ ' if done else ''}{text}  —  {name}")
+                           for name, task_id, text, done in matches], 'No matching tasks')
+
+    def show_results(self, results, empty=''):
+        """Fill the results box with ``(list, task id, label)`` rows; None hides it."""
+        self.results_box.delete(0, tk.END)
+        if results is None:
+            self.search_results = []
+            self.results_frame.pack_forget()
+            return
+        self.search_results = [(name, task_id) for name, task_id, _ in results]
+        for _, _, label in results:
+            self.results_box.insert(tk.END, label)
+        if not results:
+            self.results_box.insert(tk.END, empty)
+        if not self.results_frame.winfo_ismapped():
+            self.results_frame.pack(fill=tk.X, padx=8, before=self.middle_shadow)
+
+    def show_due_soon(self):
+        """List overdue and upcoming tasks from every list (Ctrl+U)."""
+        try:
+            due = self.store.due_soon()
+        except Exception:
+            log.exception("Error listing due tasks")
+            due = []
+        self.show_results([(name, task_id,
+                            f"{'⚠ overdue  ' if is_overdue(when) else ''}{deadline}  {text}  —  {name}")
+                           for when, name, task_id, text, deadline in due], 'Nothing is due')
+        self.results_box.focus_set()
+
+    def focus_search_results(self):
+        if self.search_results:
+            self.results_box.focus_set()
+            self.results_box.selection_clear(0, tk.END)
+            self.results_box.selection_set(0)
+            self.results_box.activate(0)
+
+    def open_search_result(self, position=None):
+        """Switch to the list of a search result and select its task."""
+        if position is None:
+            selection = self.results_box.curselection()
+            position = selection[0] if selection else None
+        if position is None or position >= len(self.search_results):
+            return
+        name, task_id = self.search_results[position]
+        if name != self.current_list:
+            self.show_list_label(name)
+            self.select_list(name)
+        task = self.store.task(name, task_id) if self.current_list == name else None
+        if task is not None:
+            position = self.view.index(str(task_id))
+            if position is not None:
+                self.view.select(position)
+            self.tree.focus_set()
 
     def add_task(self):
         text = self.entry.get().strip()
@@ -374,106 +618,250 @@ class TodoApp:
             return
 
         # Create new task with all properties
-        task = {
-            'text': text,
-            'done': False,
-            'deadline': self.deadline_var.get().strip(),
-            'subtasks': self.subtasks_var.get().strip()
-        }
-        
-        self.lists[self.current_list]['tasks'].append(task)
+        self.store.add_task(self.current_list, text,
+                            deadline=self.deadline_var.get().strip(),
+                            subtasks=self.subtasks_var.get().strip(),
+                            priority=self.priority_var.get())
         self.refresh_task_view()
         
         # Clear all input fields
         self.entry.delete(0, tk.END)
         self.deadline_var.set("")
         self.subtasks_var.set("")
-        self.save_current_list()
+        self.priority_var.set("")
+
+    @perf.timed
+    def selected_tasks(self):
+        """Return the selected tasks, resolved through the id index."""
+        if not self.current_list:
+            return []
+        index = self.lists[self.current_list]['index']
+        tasks = (index.get(int(iid)) for iid in self.view.selection() if '.' not in iid)
+        return [task for task in tasks if task is not None]
+
+    def selected_subtasks(self):
+        """Return ``(task, subtask id)`` for each selected subtask row that still exists."""
+        if not self.current_list:
+            return []
+        index = self.lists[self.current_list]['index']
+        targets = []
+        for iid in self.view.selection():
+            if '.' not in iid:
+                continue
+            task_id, subtask_id = map(int, iid.split('.'))
+            task = index.get(task_id)
+            if task is not None and task.get('subtasks', NO_SUBTASKS).find(subtask_id) is not None:
+                targets.append((task, subtask_id))
+        return targets
+
+    def select_all_tasks(self):
+        if self.current_list:
+            self.view.select_rows(self.view.roots)
 
     def remove_task(self):
-        selection = self.tree.selection()
-        if not selection:
+        targets = self.selected_subtasks()
+        selected = self.selected_tasks()
+        if not selected and not targets:
             return
         
-        # Get the index in the original task list
-        task_text = self.tree.item(selection[0])['values'][1]  # Get task text
-        tasks = self.lists[self.current_list]['tasks']
-        for i, task in enumerate(tasks):
-            if task['text'] == task_text:
-                del tasks[i]
-                break
-                
+        # Any selection of tasks and subtasks is one change, one save and one redraw
+        if targets:
+            self.store.remove_items(self.current_list, selected, targets)
+        elif len(selected) == 1:
+            self.store.remove_task(self.current_list, selected[0])
+        else:
+            self.store.remove_tasks(self.current_list, selected)
         self.refresh_task_view()
-        self.save_current_list()
 
     def toggle_task_done(self):
-        selection = self.tree.selection()
-        if not selection:
+        targets = self.selected_subtasks()
+        selected = self.selected_tasks()
+        if not selected and not targets:
             return
             
-        # Get the task text and find it in the original list
-        task_text = self.tree.item(selection[0])['values'][1]
-        tasks = self.lists[self.current_list]['tasks']
-        for task in tasks:
-            if task['text'] == task_text:
-                task['done'] = not task['done']
-                break
-                
+        if targets:
+            self.store.toggle_items(self.current_list, selected, targets)
+        elif len(selected) == 1:
+            self.store.toggle_task(self.current_list, selected[0])
+        else:
+            self.store.toggle_tasks(self.current_list, selected)
         self.refresh_task_view()
-        self.save_current_list()
 
     def edit_task(self, event=None):
-        selection = self.tree.selection()
-        if not selection:
+        selected = self.selected_tasks()
+        if not selected:
+            targets = self.selected_subtasks()
+            if targets:
+                self.edit_subtask(*targets[0])
+            return
+        if len(selected) > 1:
+            self.edit_tasks(selected)
             return
         
-        item = selection[0]
-        values = self.tree.item(item)['values']
+        task = selected[0]
+        name = self.current_list
         
         # Create a dialog for editing
         dialog = tk.Toplevel(self.root)
         dialog.title("Edit Task")
-        dialog.geometry("400x250")
+        dialog.geometry("400x310")
         dialog.transient(self.root)
         dialog.grab_set()
         
         # Task text
         ttk.Label(dialog, text="Task:", style='Cotton.TLabel').pack(pady=4)
-        text_var = tk.StringVar(value=values[1])
+        text_var = tk.StringVar(value=task['text'])
         text_entry = ttk.Entry(dialog, textvariable=text_var, style='Cotton.TEntry')
         text_entry.pack(fill=tk.X, padx=8, pady=4)
         
         # Deadline
         ttk.Label(dialog, text="Deadline:", style='Cotton.TLabel').pack(pady=4)
-        deadline_var = tk.StringVar(value=values[2])
+        deadline_var = tk.StringVar(value=task['deadline'])
         deadline_entry = ttk.Entry(dialog, textvariable=deadline_var, style='Cotton.TEntry')
         deadline_entry.pack(fill=tk.X, padx=8, pady=4)
         
-        # Subtasks
-        ttk.Label(dialog, text="Subtasks:", style='Cotton.TLabel').pack(pady=4)
-        subtasks_var = tk.StringVar(value=values[3])
+        # Priority
+        ttk.Label(dialog, text="Priority:", style='Cotton.TLabel').pack(pady=4)
+        priority_var = tk.StringVar(value=task.get('priority') or '')
+        ttk.Combobox(dialog, textvariable=priority_var, values=PRIORITIES, state='readonly',
+                     style='Cotton.TCombobox').pack(fill=tk.X, padx=8, pady=4)
+        
+        # Subtasks are edited in their own rows; this only adds more
+        ttk.Label(dialog, text="Add subtasks (comma separated):", style='Cotton.TLabel').pack(pady=4)
+        subtasks_var = tk.StringVar()
         subtasks_entry = ttk.Entry(dialog, textvariable=subtasks_var, style='Cotton.TEntry')
         subtasks_entry.pack(fill=tk.X, padx=8, pady=4)
         
         def save_changes():
-            # Find and update the task
-            task_text = values[1]
-            tasks = self.lists[self.current_list]['tasks']
-            for task in tasks:
-                if task['text'] == task_text:
-                    task.update({
-                        'text': text_var.get().strip(),
-                        'deadline': deadline_var.get().strip(),
-                        'subtasks': subtasks_var.get().strip()
-                    })
-                    break
+            # The task was resolved by id when the dialog opened
+            fields = dict(text=text_var.get().strip(),
+                          priority=priority_var.get(),
+                          deadline=deadline_var.get().strip())
+            added = subtasks_var.get().strip()
+            if added:
+                # New subtasks get ids after the task's own
+                fields['subtasks'] = to_subtasks([*task.get('subtasks', NO_SUBTASKS), *to_subtasks(added)])
+            self.store.edit_task(name, task, **fields)
             self.refresh_task_view()
-            self.save_current_list()
             dialog.destroy()
         
         ttk.Button(dialog, text="Save", command=save_changes,
                   style='Cotton.TButton').pack(pady=16)
 
+    def edit_subtask(self, task, subtask_id):
+        """Edit the text and deadline of one subtask."""
+        name = self.current_list
+        subtask = task['subtasks'].find(subtask_id)
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Edit Subtask")
+        dialog.geometry("400x200")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        ttk.Label(dialog, text="Subtask:", style='Cotton.TLabel').pack(pady=4)
+        text_var = tk.StringVar(value=subtask.text)
+        ttk.Entry(dialog, textvariable=text_var, style='Cotton.TEntry').pack(fill=tk.X, padx=8, pady=4)
+
+        ttk.Label(dialog, text="Deadline:", style='Cotton.TLabel').pack(pady=4)
+        deadline_var = tk.StringVar(value=subtask.deadline)
+        ttk.Entry(dialog, textvariable=deadline_var, style='Cotton.TEntry').pack(fill=tk.X, padx=8, pady=4)
+
+        def save_changes():
+            text = text_var.get().strip()
+            if text:
+                self.store.edit_subtask(name, task, subtask_id, text=text,
+                                        deadline=deadline_var.get().strip())
+                self.refresh_task_view()
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Save", command=save_changes,
+                   style='Cotton.TButton').pack(pady=16)
+
+    def add_subtask(self):
+        """Add a subtask under the selected task or subtask, and show it."""
+        selected = self.selected_tasks()
+        targets = self.selected_subtasks()
+        if selected:
+            task, parent_id = selected[0], None
+        elif targets:
+            task, parent_id = targets[0]
+        else:
+            return
+        name = self.current_list
+        text = simpledialog.askstring("Add Subtask", f"Subtask of '{task['text']}':", parent=self.root)
+        if not text or not text.strip():
+            return
+        subtask = self.store.add_subtask(name, task, text.strip(), parent_id=parent_id)
+        parent = str(task['id']) if parent_id is None else f"{task['id']}.{parent_id}"
+        self.refresh_task_view()
+        self.view.expand(parent)
+        position = self.view.index(f"{task['id']}.{subtask.id}")
+        if position is not None:
+            self.view.select(position)
+
+    def undo(self):
+        self.show_step(self.store.undo)
+
+    def redo(self):
+        self.show_step(self.store.redo)
+
+    def show_step(self, replay):
+        """Undo or redo one change, then show the list and tasks it touched."""
+        try:
+            step = replay()
+        except Exception as e:
+            messagebox.showerror('Error', f'Could not undo or redo the change: {e}')
+            step = None
+        if step is None:
+            return
+        name, tasks = step
+        self.update_list_selector()
+        if name not in self.lists:
+            if self.current_list not in self.lists:
+                self.show_first_list()
+            return
+        if name != self.current_list:
+            self.show_list_label(name)
+            self.select_list(name)
+        else:
+            # Only the rows that changed are redrawn
+            self.refresh_task_view()
+        entry = self.lists[name]
+        shown = [task for task in tasks if entry['index'].get(task['id']) is task]
+        if shown:
+            self.view.select_rows(shown)
+
+    def edit_tasks(self, tasks):
+        """Set the priority or deadline of several tasks at once."""
+        name = self.current_list
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Edit {len(tasks)} Tasks")
+        dialog.geometry("400x200")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        # Fields left at KEEP stay as they are on each task
+        ttk.Label(dialog, text="Priority:", style='Cotton.TLabel').pack(pady=4)
+        priority_var = tk.StringVar(value=KEEP)
+        ttk.Combobox(dialog, textvariable=priority_var, values=(KEEP,) + PRIORITIES, state='readonly',
+                     style='Cotton.TCombobox').pack(fill=tk.X, padx=8, pady=4)
+
+        ttk.Label(dialog, text="Deadline:", style='Cotton.TLabel').pack(pady=4)
+        deadline_var = tk.StringVar(value=KEEP)
+        ttk.Entry(dialog, textvariable=deadline_var, style='Cotton.TEntry').pack(fill=tk.X, padx=8, pady=4)
+
+        def save_changes():
+            fields = {'priority': priority_var.get(), 'deadline': deadline_var.get().strip()}
+            fields = {key: value for key, value in fields.items() if value != KEEP}
+            if fields:
+                self.store.edit_tasks(name, tasks, **fields)
+                self.refresh_task_view()
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Save", command=save_changes,
+                  style='Cotton.TButton').pack(pady=16)
+
     def new_list(self):
         name = simpledialog.askstring('New list', 'Enter name for the new list:')
         if not name:
@@ -482,9 +870,9 @@ class TodoApp:
         if name in self.lists:
             messagebox.showinfo('Exists', 'A list with that name already exists.')
             return
-        self.create_list_file(name)
-        self.load_lists()
-        self.list_selector.set(name)
+        self.store.create_list(name)
+        self.update_list_selector()
+        self.show_list_label(name)
         self.select_list(name)
         messagebox.showinfo('Created', f'List "{name}" created and saved.')
 
@@ -502,18 +890,13 @@ class TodoApp:
         if new in self.lists:
             messagebox.showinfo('Exists', 'A list with that name already exists.')
             return
-        # create new file and remove old file
-        old_path = self.lists[old]['path']
-        new_path = LISTS_DIR / f"{new}.json"
-        data = {"name": new, "tasks": self.lists[old]['tasks']}
-        with open(new_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
         try:
-            old_path.unlink()
-        except Exception:
-            pass
-        self.load_lists()
-        self.list_selector.set(new)
+            self.store.rename_list(old, new)
+        except Exception as e:
+            messagebox.showerror('Error', f'Could not rename list "{old}": {e}')
+            return
+        self.update_list_selector()
+        self.show_list_label(new)
         self.select_list(new)
         messagebox.showinfo('Renamed', f'List renamed to "{new}"')
 
@@ -524,21 +907,50 @@ class TodoApp:
         name = self.current_list
         if not messagebox.askyesno('Delete', f'Delete list "{name}"? This will remove the file from disk.'):
             return
-        path = self.lists[name]['path']
-        try:
-            path.unlink()
-        except Exception:
-            pass
-        # reload and pick another
-        self.load_lists()
-        if self.list_selector['values']:
-            self.list_selector.current(0)
-            self.select_list(self.list_selector.get())
-        else:
-            self.current_list = None
-            self.tasks_box.delete(0, tk.END)
+        self.store.delete_list(name)
+        # pick another
+        self.update_list_selector()
+        self.show_first_list()
         messagebox.showinfo('Deleted', f'List "{name}" deleted.')
 
+    def show_overview(self):
+        """Show the counts of every list; double-click one to open it.
+
+        The counts are kept with each list, so no list is loaded for this.
+        """
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Lists Overview")
+        dialog.geometry("640x400")
+        dialog.transient(self.root)
+
+        columns = ('open', 'done', 'high', 'medium', 'low', 'overdue')
+        table = ttk.Treeview(dialog, columns=columns, style='Cotton.Treeview')
+        table.heading('#0', text='List')
+        table.column('#0', width=200)
+        for column in columns:
+            table.heading(column, text=column.capitalize())
+            table.column(column, width=65, anchor=tk.E)
+        table.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+
+        rows = self.store.overview()
+        for name, counts, overdue in rows:
+            table.insert('', tk.END, iid=name, text=name, values=(
+                counts.open, counts.done, counts.open_with_priority('High'),
+                counts.open_with_priority('Medium'), counts.open_with_priority('Low'), overdue))
+        ttk.Label(dialog, style='Cotton.TLabel',
+                  text=f"{len(rows)} lists, {sum(c.open for _, c, _ in rows)} open tasks, "
+                       f"{sum(o for _, _, o in rows)} overdue").pack(pady=(0, 8))
+
+        def open_list(event=None):
+            name = table.focus()
+            if name in self.lists:
+                dialog.destroy()
+                self.show_list_label(name)
+                self.select_list(name)
+
+        table.bind('<Double-Button-1>', open_list)
+        table.bind('<Return>', open_list)
+
     def setup_style(self):
         """Configure cotton candy theme with pastels."""
         self.colors = {
@@ -595,15 +1007,6 @@ class TodoApp:
                        padding=6,
                        relief='raised',
                        borderwidth=2)
-        style.map('Cotton.TButton',
-                 background=[('active', self.colors['button_hover']),
-                           ('pressed', self.colors['accent'])],
-                 relief=[('pressed', 'sunken'),
-                        ('active', 'ridge')],
-                 borderwidth=[('pressed', 1),
-                            ('active', 3)],
-                 foreground=[('pressed', 'white'),
-                           ('active', self.colors['text'])])
 
         # Accent button (New List) with enhanced hover effects
         style.configure('Accent.TButton',
@@ -613,15 +1016,6 @@ class TodoApp:
                        padding=6,
                        relief='raised',
                        borderwidth=2)
-        style.map('Accent.TButton',
-                 background=[('pressed', '#FF5AA8'),
-                           ('active', '#FF7AB8')],
-                 relief=[('pressed', 'sunken'),
-                        ('active', 'ridge')],
-                 borderwidth=[('pressed', 1),
-                            ('active', 3)],
-                 foreground=[('pressed', 'white'),
-                           ('active', 'white')])
 
         # Entry styling
         style.configure('Cotton.TEntry',
@@ -648,41 +1042,50 @@ class TodoApp:
                        background=self.colors['bg_mid'],
                        foreground=self.colors['text'],
                        relief='flat')
-        
+
+        # Configure root background
+        self.root.configure(bg=self.colors['bg_light'])
+
+    def setup_style_maps(self):
+        """Configure hover, pressed and selected looks, which the first frame never shows."""
+        style = ttk.Style()
+        style.map('Cotton.TButton',
+                 background=[('active', self.colors['button_hover']),
+                           ('pressed', self.colors['accent'])],
+                 relief=[('pressed', 'sunken'),
+                        ('active', 'ridge')],
+                 borderwidth=[('pressed', 1),
+                            ('active', 3)],
+                 foreground=[('pressed', 'white'),
+                           ('active', self.colors['text'])])
+
+        style.map('Accent.TButton',
+                 background=[('pressed', '#FF5AA8'),
+                           ('active', '#FF7AB8')],
+                 relief=[('pressed', 'sunken'),
+                        ('active', 'ridge')],
+                 borderwidth=[('pressed', 1),
+                            ('active', 3)],
+                 foreground=[('pressed', 'white'),
+                           ('active', 'white')])
+
         style.map("Cotton.Treeview",
                  background=[('selected', self.colors['accent'])],
                  foreground=[('selected', 'white')])
 
-        # Configure root background
-        self.root.configure(bg=self.colors['bg_light'])
-        
-        # Load the application logo
+    def load_icon(self):
+        """Set the window icon.  assets/logo.ico is kept base64-encoded."""
+        if sys.platform != 'win32':
+            return      # Tk only reads .ico files on Windows
         try:
-            icon_path = APP_DIR / 'assets' / 'app_icon.ico'
-            if icon_path.exists():
-                print(f"Loading icon from: {icon_path}")
-                self.root.iconbitmap(default=str(icon_path))
-                # Also try setting it as a window icon
-                self.root.tk.call('wm', 'iconphoto', self.root._w, PhotoImage(file=str(icon_path)))
+            data = base64.b64decode((APP_DIR / 'assets' / 'logo.ico').read_bytes())
+            # iconbitmap needs a file, so the decoded icon is cached in the temp directory
+            icon_path = Path(tempfile.gettempdir()) / 'todo-list-logo.ico'
+            if not icon_path.exists() or icon_path.read_bytes() != data:
+                icon_path.write_bytes(data)
+            self.root.iconbitmap(default=str(icon_path))
         except Exception as e:
-            print(f"Error loading icon: {e}")
-
-    def create_list_file(self, name):
-        p = LISTS_DIR / f"{name}.json"
-        data = {
-            "name": name,
-            "tasks": []
-        }
-        with open(p, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-
-    def save_current_list(self):
-        if not self.current_list:
-            return
-        p = self.lists[self.current_list]['path']
-        data = {"name": self.current_list, "tasks": self.lists[self.current_list]['tasks']}
-        with open(p, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+            log.warning("Error loading icon: %s", e)
 
     # Keyboard shortcut methods
     def focus_add_task(self, event=None):
@@ -692,85 +1095,39 @@ class TodoApp:
             self.entry.delete(0, tk.END)
 
     def move_task_up(self, event=None):
-        """Move selected task up (Ctrl+Up)"""
-        selection = self.tree.selection()
-        if not selection:
-            return
-        
-        item = selection[0]
-        idx = self.tree.index(item)
-        if idx > 0:
-            # Move task in the data
-            tasks = self.lists[self.current_list]['tasks']
-            tasks.insert(idx - 1, tasks.pop(idx))
-            # Refresh view and reselect item
-            self.refresh_task_view()
-            items = self.tree.get_children()
-            self.tree.selection_set(items[idx - 1])
-            self.tree.see(items[idx - 1])
-            self.save_current_list()
+        """Move selected tasks up (Ctrl+Up)"""
+        self.move_tasks(-1)
 
     def move_task_down(self, event=None):
-        """Move selected task down (Ctrl+Down)"""
-        selection = self.tree.selection()
-        if not selection:
-            return
-        
-        item = selection[0]
-        idx = self.tree.index(item)
-        last_idx = len(self.tree.get_children()) - 1
-        if idx < last_idx:
-            # Move task in the data
-            tasks = self.lists[self.current_list]['tasks']
-            tasks.insert(idx + 1, tasks.pop(idx))
-            # Refresh view and reselect item
+        """Move selected tasks down (Ctrl+Down)"""
+        self.move_tasks(1)
+
+    def move_tasks(self, offset):
+        """Move the selected tasks one row as a block, keeping them selected."""
+        selected = self.selected_tasks()
+        if selected and self.store.move_tasks(self.current_list, selected, offset):
             self.refresh_task_view()
-            items = self.tree.get_children()
-            self.tree.selection_set(items[idx + 1])
-            self.tree.see(items[idx + 1])
-            self.save_current_list()
+            self.view.select_rows(selected)
 
     def select_first_task(self, event=None):
         """Select the first task (Ctrl+Home)"""
-        items = self.tree.get_children()
-        if items:
-            self.tree.selection_set(items[0])
-            self.tree.see(items[0])
+        if len(self.view):
+            self.view.select(0)
 
     def select_last_task(self, event=None):
         """Select the last task (Ctrl+End)"""
-        items = self.tree.get_children()
-        if items:
-            self.tree.selection_set(items[-1])
-            self.tree.see(items[-1])
+        if len(self.view):
+            self.view.select(len(self.view) - 1)
 
     def select_previous_task(self, event=None):
         """Select the previous task (Up arrow)"""
-        selection = self.tree.selection()
-        if not selection:
-            self.select_last_task()
-            return
-            
-        item = selection[0]
-        idx = self.tree.index(item)
-        if idx > 0:
-            items = self.tree.get_children()
-            self.tree.selection_set(items[idx - 1])
-            self.tree.see(items[idx - 1])
+        if self.current_list and len(self.view):
+            self.view.step(-1)
 
     def select_next_task(self, event=None):
         """Select the next task (Down arrow)"""
-        selection = self.tree.selection()
-        if not selection:
-            self.select_first_task()
-            return
-            
-        item = selection[0]
-        idx = self.tree.index(item)
-        items = self.tree.get_children()
-        if idx < len(items) - 1:
-            self.tree.selection_set(items[idx + 1])
-            self.tree.see(items[idx + 1])
+        if self.current_list and len(self.view):
+            self.view.step(1)
 
     def show_shortcuts(self):
         """Show the keyboard shortcuts help dialog"""
@@ -781,18 +1138,25 @@ List Management:
 • Ctrl+N - Create new list
 • Ctrl+R - Rename current list
 • Ctrl+D - Delete current list
+• Ctrl+L - Overview of every list's open, done and overdue tasks
 
 Task Management:
 • Ctrl+A - Focus add task field
 • Enter - Add task (when in entry field)
-• Delete - Remove selected task
-• Ctrl+E - Edit selected task
-• Space - Toggle task done/undone
+• Ctrl+K - Add a subtask to the selected task or subtask
+• Delete - Remove selected tasks
+• Ctrl+E - Edit selected task (priority and deadline of several)
+• Space - Toggle selected tasks done/undone
+• Ctrl+U - Show overdue and upcoming tasks from all lists
+• Ctrl+Z - Undo the last change
+• Ctrl+Y - Redo the last undone change
 
 Navigation:
 • ↑ / ↓ - Select previous/next task
-• Ctrl+↑ - Move task up
-• Ctrl+↓ - Move task down
+• → / ← - Show/hide the subtasks of the selected task
+• Shift/Ctrl+click - Select several tasks
+• Ctrl+↑ - Move selected tasks up
+• Ctrl+↓ - Move selected tasks down
 • Ctrl+Home - Select first task
 • Ctrl+End - Select last task
 
@@ -801,8 +1165,80 @@ Other:
 """
         messagebox.showinfo('Keyboard Shortcuts', shortcuts)
 
+    def show_performance(self):
+        """Show live timings and counters of the instrumented paths."""
+        if not perf.ENABLED:
+            messagebox.showinfo('Performance', 'Performance stats are off.\n\n'
+                                'Start the app with TODO_PERF=1 set to collect them.')
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Performance")
+        dialog.geometry("760x420")
+        dialog.transient(self.root)
+
+        columns = ('calls', 'p50', 'p95', 'p99', 'max', 'total')
+        table = ttk.Treeview(dialog, columns=columns, style='Cotton.Treeview')
+        table.heading('#0', text='Function')
+        table.column('#0', width=260)
+        for column in columns:
+            table.heading(column, text=column if column == 'calls' else f'{column} ms')
+            table.column(column, width=75, anchor=tk.E)
+        table.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+        counters = ttk.Label(dialog, style='Cotton.TLabel', justify=tk.LEFT)
+        counters.pack(fill=tk.X, padx=8)
+
+        def update():
+            if not dialog.winfo_exists():
+                return
+            stats = perf.STATS.snapshot()
+            table.delete(*table.get_children())
+            for name, row in stats['timers'].items():
+                table.insert('', tk.END, iid=name, text=name, values=(
+                    row['calls'], f"{row['p50_ms']:.2f}", f"{row['p95_ms']:.2f}",
+                    f"{row['p99_ms']:.2f}", f"{row['max_ms']:.2f}", f"{row['total_ms']:.0f}"))
+            counters.configure(text='\n'.join(f'{name}: {value:,}'
+                                              for name, value in stats['counters'].items()))
+            dialog.after(PERF_REFRESH_MS, update)
+
+        def export():
+            path = filedialog.asksaveasfilename(parent=dialog, defaultextension='.json',
+                                                filetypes=[('JSON', '*.json')])
+            if not path:
+                return
+            try:
+                perf.STATS.export(path)
+            except Exception as e:
+                messagebox.showerror('Error', f'Could not export stats: {e}', parent=dialog)
+
+        def reset():
+            perf.STATS.reset()
+            table.delete(*table.get_children())
+            counters.configure(text='')
+
+        buttons = ttk.Frame(dialog, style='Main.TFrame')
+        buttons.pack(pady=8)
+        ttk.Button(buttons, text="Reset", command=reset,
+                   style='Cotton.TButton').pack(side=tk.LEFT, padx=4)
+        ttk.Button(buttons, text="Export JSON…", command=export,
+                   style='Cotton.TButton').pack(side=tk.LEFT, padx=4)
+        update()
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Task lists in a window.')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print how long each startup phase takes, then exit')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(levelname)s %(name)s: %(message)s')
+    timer = StartupTimer() if args.profile_startup else None
+    if timer is not None:
+        timer.mark('imports')
     root = tk.Tk()
-    app = TodoApp(root)
-    root.mainloop()
+    if timer is not None:
+        timer.mark('window')
+    app = TodoApp(root, timer=timer)
+    try:
+        root.mainloop()
+    finally:
+        # Also covers quitting through root.quit() directly
+        app.store.close()
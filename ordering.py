@@ -0,0 +1,195 @@
+"""Display order of a list, maintained incrementally.
+
+A TaskOrder holds a list's tasks sorted by the chosen column, with each
+task's sort key computed once and kept next to it.  Adding, removing or
+changing one task is a bisect removal and insertion, so only choosing a
+different column costs a full sort.
+
+The user's manual order is its own key: every task has a rank, taken
+from its position in the saved list, and the rank breaks ties in every
+column.  Moving a task up or down swaps its rank with a neighbour's.
+"""
+from bisect import bisect_left
+from functools import total_ordering
+
+import perf
+
+SORT_COLUMNS = ('done', 'priority', 'deadline', 'text')
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+NO_PRIORITY = len(PRIORITY_RANK)
+# Batches at least this big rebuild the rows in one pass rather than
+# shifting them once per task
+BATCH_MIN = 200
+
+
+@total_ordering
+class Descending:
+    """Wrap a sort key component so that it sorts in reverse."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def column_key(task, column):
+    """Return the primary sort key of `task` for `column`."""
+    if column == 'done':
+        return bool(task['done'])
+    if column == 'priority':
+        return PRIORITY_RANK.get(str(task.get('priority') or '').lower(), NO_PRIORITY)
+    if column == 'deadline':
+        due = task.get('due')
+        return (due is None, due or 0.0, task.get('deadline', '').casefold())
+    if column == 'text':
+        return task['text'].casefold()
+    raise ValueError(f"unknown sort column {column!r}")
+
+
+class TaskOrder:
+    def __init__(self, tasks, column='done', descending=False):
+        self.rank = {t['id']: i for i, t in enumerate(tasks)}
+        self.next_rank = len(tasks)
+        self.column = column
+        self.descending = descending
+        self.keys = []      # sort keys, parallel to rows
+        self.rows = []      # tasks in display order
+        self._key_of = {}   # task id -> its current key
+        self._sort(tasks)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def key(self, task):
+        primary = column_key(task, self.column)
+        if self.descending:
+            primary = Descending(primary)
+        return (primary, self.rank[task['id']])
+
+    def _sort(self, tasks):
+        decorated = sorted((self.key(t), t) for t in tasks)  # keys are unique
+        self.keys = [k for k, _ in decorated]
+        self.rows = [t for _, t in decorated]
+        self._key_of = {t['id']: k for k, t in decorated}
+
+    def sort_by(self, column, descending=False):
+        """Re-sort by another column; the only operation that sorts everything."""
+        if (column, descending) != (self.column, self.descending):
+            self.column, self.descending = column, descending
+            self._sort(self.rows)
+
+    @perf.timed
+    def index(self, task):
+        """Return the display position of `task`."""
+        return bisect_left(self.keys, self._key_of[task['id']])
+
+    def insert(self, task):
+        """Add a new task at the end of the manual order; return its position."""
+        if task['id'] not in self.rank:
+            self.rank[task['id']] = self.next_rank
+            self.next_rank += 1
+        key = self._key_of[task['id']] = self.key(task)
+        i = bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, task)
+        return i
+
+    def remove(self, task):
+        i = self.index(task)
+        del self.keys[i]
+        del self.rows[i]
+        del self._key_of[task['id']]
+        return i
+
+    def update(self, task):
+        """Reposition `task` after its fields changed; return its new position."""
+        self.remove(task)
+        return self.insert(task)
+
+    def forget(self, task):
+        """Remove `task` for good, rank included."""
+        self.remove(task)
+        del self.rank[task['id']]
+
+    def remove_all(self, tasks):
+        """Remove several tasks; their ranks stay, as with remove()."""
+        if len(tasks) < BATCH_MIN:
+            for task in tasks:
+                self.remove(task)
+            return
+        positions = sorted(self.index(task) for task in tasks)
+        for task in tasks:
+            del self._key_of[task['id']]
+        keys, rows, start = [], [], 0
+        for i in positions:
+            keys += self.keys[start:i]
+            rows += self.rows[start:i]
+            start = i + 1
+        self.keys = keys + self.keys[start:]
+        self.rows = rows + self.rows[start:]
+
+    def insert_all(self, tasks):
+        """Add several tasks, as insert() does for one."""
+        if len(tasks) < BATCH_MIN:
+            for task in tasks:
+                self.insert(task)
+            return
+        added = []
+        for task in tasks:
+            if task['id'] not in self.rank:
+                self.rank[task['id']] = self.next_rank
+                self.next_rank += 1
+            key = self._key_of[task['id']] = self.key(task)
+            added.append((key, task))
+        added.sort()    # keys are unique
+        keys, rows, start = [], [], 0
+        for key, task in added:
+            i = bisect_left(self.keys, key)
+            keys += self.keys[start:i]
+            rows += self.rows[start:i]
+            keys.append(key)
+            rows.append(task)
+            start = i
+        self.keys = keys + self.keys[start:]
+        self.rows = rows + self.rows[start:]
+
+    def update_all(self, tasks):
+        """Reposition several tasks after their fields changed."""
+        self.remove_all(tasks)
+        self.insert_all(tasks)
+
+    def same_group(self, a, b):
+        """True if `a` and `b` differ only in manual order."""
+        return self._key_of[a['id']][0] == self._key_of[b['id']][0]
+
+    def swap(self, a, b):
+        """Exchange the manual ranks of `a` and `b`."""
+        self.remove(a)
+        self.remove(b)
+        self.rank[a['id']], self.rank[b['id']] = self.rank[b['id']], self.rank[a['id']]
+        self.insert(a)
+        self.insert(b)
+
+    def manual_index(self, tasks, task):
+        """Return the position of `task` in `tasks`, the list in manual order.
+
+        Ranks grow along the saved list, so this is a bisect on them; a
+        list that is somehow out of rank order is searched from the start.
+        """
+        rank, wanted = self.rank, self.rank[task['id']]
+        lo, hi = 0, len(tasks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rank[tasks[mid]['id']] < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(tasks) and tasks[lo] is task:
+            return lo
+        return tasks.index(task)
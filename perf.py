@@ -0,0 +1,107 @@
+"""Timers and counters on the paths that get slow on big lists.
+
+Set ``TODO_PERF=1`` to turn them on, or ``TODO_PERF=<file>.json`` to also
+have the app write them to that file when it exits.  Help → Performance
+shows them while the app runs and exports them as JSON.
+
+When they are off, timed() returns the function it decorates unchanged
+and count() returns at once, so instrumented code runs as it would
+without them.  When they are on, each timed call costs two clock reads
+and a locked append.  Latency percentiles are taken over the last
+SAMPLES calls of each function; call counts and totals cover every call.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+SETTING = os.environ.get('TODO_PERF', '')
+ENABLED = SETTING not in ('', '0')
+EXPORT_PATH = SETTING if SETTING.endswith('.json') else None
+SAMPLES = 4096      # latencies kept per timer for the percentiles
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered, p):
+    """Return the `p`th percentile of the sorted list `ordered` (nearest rank)."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))  # ceiling without floats
+    return ordered[rank - 1]
+
+
+class Stats:
+    """Call timings and counters, safe to update from any thread."""
+
+    def __init__(self, samples=SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.timers = {}    # name -> [calls, total seconds, recent latencies]
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = [0, 0.0, deque(maxlen=self.samples)]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2].append(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """Return the stats as plain data, times in milliseconds."""
+        with self.lock:
+            timers = [(name, calls, total, sorted(recent))
+                      for name, (calls, total, recent) in self.timers.items()]
+            counters = dict(self.counters)
+        report = {}
+        for name, calls, total, ordered in sorted(timers):
+            row = {'calls': calls, 'total_ms': total * 1000}
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = percentile(ordered, p) * 1000
+            row['max_ms'] = ordered[-1] * 1000
+            report[name] = row
+        return {'timers': report, 'counters': dict(sorted(counters.items()))}
+
+    def export(self, path):
+        """Write snapshot() to `path` as JSON, with when it was taken."""
+        data = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **self.snapshot()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+
+STATS = Stats()
+
+
+def timed(func):
+    """Record the latency of every call of `func` under its qualified name."""
+    if not ENABLED:
+        return func
+    name = func.__qualname__
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            STATS.add_time(name, clock() - start)
+    return wrapper
+
+
+def count(name, n=1):
+    """Add `n` to counter `name`."""
+    if ENABLED:
+        STATS.count(name, n)
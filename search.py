@@ -0,0 +1,224 @@
+"""Persistent full-text index over the tasks of every list.
+
+The index is a separate SQLite file holding a copy of each task's text
+and a postings table mapping every word of ``text`` and ``subtasks`` to
+the tasks that contain it.  BackgroundWriter applies the same journal
+records to it as to the storage, so it is kept current incrementally and
+searching never opens a list.
+
+A query matches tasks that contain all of its words; the last word is
+matched as a prefix so results narrow while the user is still typing.
+Open tasks are also indexed by due date, for the due soon view of lists
+that have not been loaded.
+"""
+import re
+
+import perf
+from sqlite_storage import SqliteDatabase
+from tasks import subtask_words
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    total INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS docs (
+    list_id INTEGER NOT NULL,
+    task_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    subtasks TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    deadline TEXT NOT NULL,
+    due REAL,
+    PRIMARY KEY (list_id, task_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    list_id INTEGER NOT NULL,
+    task_id INTEGER NOT NULL,
+    PRIMARY KEY (token, list_id, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_task ON postings(list_id, task_id);
+CREATE INDEX IF NOT EXISTS docs_by_due ON docs(done, due);
+"""
+
+MAX_RESULTS = 100
+TOKEN_RE = re.compile(r'\w+')
+PREFIX_END = '\U0010ffff'   # sorts after every character a token can contain
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def task_tokens(task):
+    return set(tokenize(f"{task.get('text', '')} {subtask_words(task.get('subtasks', ''))}"))
+
+
+class SearchIndex(SqliteDatabase):
+    """Word -> task postings for all lists, updated from journal records.
+
+    `search` and `stale_lists` run on the UI thread; the write methods
+    mirror the Storage interface and are called by BackgroundWriter.
+    """
+
+    schema = SCHEMA
+    version = 2
+
+    def upgrade(self, db, old_version):
+        # The index only holds derived data; stale_lists() rebuilds it
+        db.executescript("DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS docs;"
+                         " DROP TABLE IF EXISTS lists;")
+
+    @perf.timed
+    def search(self, query, limit=MAX_RESULTS):
+        """Return up to `limit` matches as (list name, task id, text, done)."""
+        words = tokenize(query)
+        if not words:
+            return []
+        # While the last word is still being typed it matches as a prefix
+        prefix = words.pop() if TOKEN_RE.fullmatch(query[-1]) else None
+        terms, args = [], []
+        for word in sorted(set(words)):
+            terms.append("SELECT list_id, task_id FROM postings WHERE token = ?")
+            args.append(word)
+        if prefix is not None:
+            terms.append("SELECT list_id, task_id FROM postings WHERE token >= ? AND token < ?")
+            args += [prefix, prefix + PREFIX_END]
+        rows = self._db().execute(
+            "SELECT l.name, d.task_id, d.text, d.done FROM docs d"
+            " JOIN lists l ON l.id = d.list_id"
+            f" WHERE (d.list_id, d.task_id) IN ({' INTERSECT '.join(terms)})"
+            " ORDER BY d.done, l.name, d.task_id LIMIT ?", (*args, limit))
+        return [(name, task_id, text, bool(done)) for name, task_id, text, done in rows]
+
+    def due_soon(self, exclude=()):
+        """Yield ``(due, list name, task id, text, deadline)`` for open tasks, soonest first.
+
+        Rows come straight off the (done, due) index, so taking the first
+        k costs O(k log n).  Lists named in `exclude` are skipped.
+        """
+        exclude = set(exclude)
+        rows = self._db().execute(
+            "SELECT d.due, l.name, d.task_id, d.text, d.deadline FROM docs d"
+            " JOIN lists l ON l.id = d.list_id"
+            " WHERE d.done = 0 AND d.due IS NOT NULL ORDER BY d.due")
+        for row in rows:
+            if row[1] not in exclude:
+                yield row
+
+    def stale_lists(self, entries, changed=()):
+        """Return the names whose index needs rebuilding, given storage `entries`.
+
+        A list is stale when its files `changed` since the storage last saw
+        them, when it is missing from the index or when its task count
+        differs; names that are no longer stored are stale as well.
+        """
+        indexed = dict(self._db().execute("SELECT name, total FROM lists"))
+        stale = [name for name, counts in entries.items()
+                 if name in changed or indexed.get(name) != counts['total']]
+        return stale + [name for name in indexed if name not in entries]
+
+    # Writes (writer thread)
+
+    def _list_id(self, db, name):
+        row = db.execute("SELECT id FROM lists WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        return db.execute("INSERT INTO lists (name) VALUES (?)", (name,)).lastrowid
+
+    def _insert(self, db, list_id, task):
+        db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                   (list_id, task['id'], task.get('text', ''), subtask_words(task.get('subtasks', '')),
+                    int(bool(task.get('done'))), task.get('deadline', ''), task.get('due')))
+        db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?)",
+                       ((token, list_id, task['id']) for token in task_tokens(task)))
+
+    def _remove(self, db, list_id, task_id):
+        row = db.execute("SELECT text, subtasks FROM docs WHERE list_id = ? AND task_id = ?",
+                         (list_id, task_id)).fetchone()
+        if row is None:
+            return None
+        old = {'text': row[0], 'subtasks': row[1]}
+        db.executemany("DELETE FROM postings WHERE token = ? AND list_id = ? AND task_id = ?",
+                       ((token, list_id, task_id) for token in task_tokens(old)))
+        db.execute("DELETE FROM docs WHERE list_id = ? AND task_id = ?", (list_id, task_id))
+        return old
+
+    def create(self, name):
+        self._list_id(self._db(), name)
+
+    @perf.timed
+    def write_records(self, name, records):
+        db = self._db()
+        list_id = self._list_id(db, name)
+        added = 0
+        for record in records:
+            op = record['op']
+            if op == 'add':
+                task = record['task']
+                if self._remove(db, list_id, task['id']) is None:
+                    added += 1
+                self._insert(db, list_id, task)
+            elif op == 'remove':
+                if self._remove(db, list_id, record['id']) is not None:
+                    added -= 1
+            elif op == 'set':
+                self._update(db, list_id, record['id'], record['fields'])
+        if added:
+            db.execute("UPDATE lists SET total = total + ? WHERE id = ?", (added, list_id))
+
+    def _update(self, db, list_id, task_id, fields):
+        columns = {k: fields[k] for k in ('done', 'deadline', 'due') if k in fields}
+        if 'done' in columns:
+            columns['done'] = int(bool(columns['done']))
+        if columns:
+            assignments = ', '.join(f"{column} = ?" for column in columns)
+            db.execute(f"UPDATE docs SET {assignments} WHERE list_id = ? AND task_id = ?",
+                       (*columns.values(), list_id, task_id))
+        if 'text' not in fields and 'subtasks' not in fields:
+            return
+        row = db.execute("SELECT text, subtasks FROM docs WHERE list_id = ? AND task_id = ?",
+                         (list_id, task_id)).fetchone()
+        if row is None:
+            return
+        old = {'text': row[0], 'subtasks': row[1]}
+        new = dict(old)
+        new.update((k, fields[k]) for k in ('text', 'subtasks') if k in fields)
+        new['subtasks'] = subtask_words(new['subtasks'])
+        old_tokens, new_tokens = task_tokens(old), task_tokens(new)
+        db.executemany("DELETE FROM postings WHERE token = ? AND list_id = ? AND task_id = ?",
+                       ((token, list_id, task_id) for token in old_tokens - new_tokens))
+        db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?)",
+                       ((token, list_id, task_id) for token in new_tokens - old_tokens))
+        db.execute("UPDATE docs SET text = ?, subtasks = ? WHERE list_id = ? AND task_id = ?",
+                   (new['text'], new['subtasks'], list_id, task_id))
+
+    @perf.timed
+    def write_snapshot(self, name, tasks):
+        db = self._db()
+        list_id = self._list_id(db, name)
+        self._clear(db, list_id)
+        for task in tasks:
+            self._insert(db, list_id, task)
+        db.execute("UPDATE lists SET total = ? WHERE id = ?", (len(tasks), list_id))
+
+    def _clear(self, db, list_id):
+        db.execute("DELETE FROM postings WHERE list_id = ?", (list_id,))
+        db.execute("DELETE FROM docs WHERE list_id = ?", (list_id,))
+
+    def rename(self, old, new, tasks):
+        db = self._db()
+        if db.execute("UPDATE lists SET name = ? WHERE name = ?", (new, old)).rowcount == 0:
+            self.write_snapshot(new, tasks)
+
+    def delete(self, name):
+        db = self._db()
+        row = db.execute("SELECT id FROM lists WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            self._clear(db, row[0])
+            db.execute("DELETE FROM lists WHERE id = ?", (row[0],))
+
+    def commit(self, names):
+        self._db().commit()
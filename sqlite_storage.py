@@ -0,0 +1,339 @@
+"""SQLite storage backend.
+
+All lists live in one database file.  Tasks are rows keyed by
+``(list_id, id)`` with a REAL ``position`` for the manual order, so each
+journal record becomes a single-row INSERT, UPDATE or DELETE.  Indexes on
+list, done state, priority and due date let `query` filter a list without
+loading it into memory.  Each list row keeps the list's ListCounts as
+JSON, written in the same transaction as its tasks, so listing the lists
+reads no task rows.
+"""
+import json
+import sqlite3
+import threading
+
+import perf
+from storage import Storage
+from tasks import Task, ListCounts, dump_subtasks, index_tasks, parse_deadline
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    counts TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    list_id INTEGER NOT NULL REFERENCES lists(id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    position REAL NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    done INTEGER NOT NULL DEFAULT 0,
+    priority TEXT,
+    deadline TEXT NOT NULL DEFAULT '',
+    subtasks TEXT NOT NULL DEFAULT '',
+    extra TEXT,
+    due REAL,
+    PRIMARY KEY (list_id, id)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_position ON tasks(list_id, position);
+CREATE INDEX IF NOT EXISTS tasks_by_done ON tasks(list_id, done);
+CREATE INDEX IF NOT EXISTS tasks_by_priority ON tasks(list_id, priority);
+CREATE INDEX IF NOT EXISTS tasks_by_deadline ON tasks(list_id, deadline);
+CREATE INDEX IF NOT EXISTS tasks_by_due ON tasks(list_id, due);
+"""
+
+COLUMNS = ('text', 'done', 'priority', 'deadline', 'subtasks', 'due')
+SELECT_TASK = "SELECT id, text, done, priority, deadline, subtasks, extra, due FROM tasks"
+INSERT_TASK = "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def task_row(list_id, position, task):
+    extra = {k: v for k, v in task.items() if k != 'id' and k not in COLUMNS}
+    return (list_id, task['id'], position, task.get('text', ''), int(bool(task.get('done'))),
+            task.get('priority'), task.get('deadline', ''), dump_subtasks(task.get('subtasks', '')),
+            json.dumps(extra) if extra else None, task.get('due'))
+
+
+def row_task(row):
+    task_id, text, done, priority, deadline, subtasks, extra, due = row
+    task = Task(id=task_id, text=text, done=bool(done), deadline=deadline, due=due, subtasks=subtasks)
+    if priority is not None:
+        task['priority'] = priority
+    if extra:
+        task.update(json.loads(extra))
+    return task
+
+
+class SqliteDatabase:
+    """A database file with one connection per thread.
+
+    `version` is stored in ``PRAGMA user_version``; opening a file written
+    by an older version calls `upgrade` before the schema is applied.
+    """
+
+    schema = ''
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        db = self._db()
+        current = db.execute('PRAGMA user_version').fetchone()[0]
+        if not current and db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone():
+            current = 1     # written before versions were recorded
+        if current and current != self.version:
+            self.upgrade(db, current)
+        db.executescript(self.schema)
+        db.execute(f'PRAGMA user_version = {int(self.version)}')
+        db.commit()
+
+    def upgrade(self, db, old_version):
+        """Bring a database written by `old_version` up to this schema."""
+
+    def _db(self):
+        """Return this thread's connection; the UI and the writer each get one."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
+
+
+class SqliteStorage(SqliteDatabase, Storage):
+    """Every list in one SQLite database, one row per task."""
+
+    schema = SCHEMA
+    version = 3
+
+    def __init__(self, path):
+        self._counts = {}       # list name -> counts to write with the next commit
+        self._counts_lock = threading.Lock()
+        super().__init__(path)
+
+    def upgrade(self, db, old_version):
+        if old_version < 2:
+            # Parse the deadlines of existing tasks into the new due column
+            db.execute("ALTER TABLE tasks ADD COLUMN due REAL")
+            rows = db.execute("SELECT list_id, id, deadline FROM tasks WHERE deadline != ''").fetchall()
+            db.executemany("UPDATE tasks SET due = ? WHERE list_id = ? AND id = ?",
+                           ((parse_deadline(deadline), list_id, task_id)
+                            for list_id, task_id, deadline in rows))
+        if old_version < 3:
+            # Count the existing lists once; from now on the counts are kept current
+            db.execute("ALTER TABLE lists ADD COLUMN counts TEXT")
+            db.executemany("UPDATE lists SET counts = ? WHERE id = ?",
+                           ((json.dumps(counts), list_id)
+                            for list_id, counts in self._aggregate_counts(db).items()))
+
+    def _list_id(self, db, name, create=False):
+        row = db.execute("SELECT id FROM lists WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            raise KeyError(name)
+        return db.execute("INSERT INTO lists (name) VALUES (?)", (name,)).lastrowid
+
+    def list_entries(self):
+        return {name: json.loads(counts) if counts else ListCounts().to_dict()
+                for name, counts in self._db().execute("SELECT name, counts FROM lists ORDER BY name")}
+
+    @staticmethod
+    def _aggregate_counts(db):
+        """Return ``{list id: counts}`` computed from the task rows.
+
+        Counted by the indexes on (list_id, done), (list_id, priority) and
+        (list_id, due); no task rows are read into Python.
+        """
+        rows = db.execute(
+            "SELECT l.id, COUNT(t.id), COALESCE(SUM(t.done), 0)"
+            " FROM lists l LEFT JOIN tasks t ON t.list_id = l.id GROUP BY l.id")
+        entries = {list_id: {'total': total, 'done': done, 'priorities': {}, 'dues': []}
+                   for list_id, total, done in rows}
+        for list_id, priority, count in db.execute(
+                "SELECT list_id, COALESCE(priority, ''), COUNT(*) FROM tasks"
+                " WHERE done = 0 GROUP BY list_id, COALESCE(priority, '')"):
+            entries[list_id]['priorities'][priority] = count
+        for list_id, due, count in db.execute(
+                "SELECT list_id, due, COUNT(*) FROM tasks"
+                " WHERE done = 0 AND due IS NOT NULL GROUP BY list_id, due ORDER BY list_id, due"):
+            entries[list_id]['dues'].append((due, count))
+        return entries
+
+    def update_counts(self, name, counts):
+        with self._counts_lock:
+            self._counts[name] = counts
+
+    @perf.timed
+    def load(self, name):
+        db = self._db()
+        list_id = self._list_id(db, name)
+        rows = db.execute(SELECT_TASK + " WHERE list_id = ? ORDER BY position", (list_id,))
+        tasks = [row_task(row) for row in rows]
+        return tasks, index_tasks(tasks)
+
+    def query(self, name, done=None, priority=None):
+        db = self._db()
+        sql, args = SELECT_TASK + " WHERE list_id = ?", [self._list_id(db, name)]
+        if done is not None:
+            sql += " AND done = ?"
+            args.append(int(done))
+        if priority is not None:
+            sql += " AND priority = ?"
+            args.append(priority)
+        for row in db.execute(sql + " ORDER BY position", args):
+            yield row_task(row)
+
+    # Writes (writer thread)
+
+    def create(self, name):
+        self._list_id(self._db(), name, create=True)
+        self._set_counts_default(name, ListCounts())
+
+    @perf.timed
+    def write_records(self, name, records):
+        db = self._db()
+        list_id = self._list_id(db, name, create=True)
+        for record in records:
+            op = record['op']
+            if op == 'add':
+                position = self._place(db, list_id, record, record.get('at'))
+                db.execute(INSERT_TASK, task_row(list_id, position, record['task']))
+            elif op == 'remove':
+                db.execute("DELETE FROM tasks WHERE list_id = ? AND id = ?", (list_id, record['id']))
+            elif op == 'set':
+                self._update(db, list_id, record['id'], record['fields'])
+            elif op == 'move':
+                position = self._place(db, list_id, record, record['to'], exclude=record['id'])
+                db.execute("UPDATE tasks SET position = ? WHERE list_id = ? AND id = ?",
+                           (position, list_id, record['id']))
+
+    def _update(self, db, list_id, task_id, fields):
+        known = {k: v for k, v in fields.items() if k in COLUMNS}
+        if 'done' in known:
+            known['done'] = int(bool(known['done']))
+        if 'subtasks' in known:
+            known['subtasks'] = dump_subtasks(known['subtasks'])
+        if known:
+            assignments = ', '.join(f"{column} = ?" for column in known)
+            db.execute(f"UPDATE tasks SET {assignments} WHERE list_id = ? AND id = ?",
+                       (*known.values(), list_id, task_id))
+        other = {k: v for k, v in fields.items() if k not in COLUMNS and k != 'id'}
+        if other:
+            row = db.execute("SELECT extra FROM tasks WHERE list_id = ? AND id = ?",
+                             (list_id, task_id)).fetchone()
+            if row is not None:
+                extra = json.loads(row[0]) if row[0] else {}
+                extra.update(other)
+                db.execute("UPDATE tasks SET extra = ? WHERE list_id = ? AND id = ?",
+                           (json.dumps(extra), list_id, task_id))
+
+    def _place(self, db, list_id, record, index, exclude=-1):
+        """Return a position for the row of `record`, next to its ``after`` neighbour if given."""
+        if 'after' in record:
+            position = self._position_after(db, list_id, record['after'], exclude)
+            if position is not None:
+                return position
+        return self._position_at(db, list_id, index, exclude)
+
+    def _position_after(self, db, list_id, after, exclude=-1):
+        """Return a position right after row `after` (None: before every row), or None if it is gone.
+
+        Both neighbours are found through the primary key and the position
+        index, so this costs the same on any list length.
+        """
+        if after is None:
+            row = db.execute("SELECT MIN(position) FROM tasks WHERE list_id = ? AND id != ?",
+                             (list_id, exclude)).fetchone()
+            return row[0] - 1.0 if row[0] is not None else 0.0
+        row = db.execute("SELECT position FROM tasks WHERE list_id = ? AND id = ?",
+                         (list_id, after)).fetchone()
+        if row is None:
+            return None
+        low = row[0]
+        row = db.execute("SELECT position FROM tasks WHERE list_id = ? AND position > ? AND id != ?"
+                         " ORDER BY position LIMIT 1", (list_id, low, exclude)).fetchone()
+        if row is None:
+            return low + 1.0
+        middle = (low + row[0]) / 2
+        if low < middle < row[0]:
+            return middle
+        # Out of float precision between neighbours: spread the list out
+        self._renumber(db, list_id)
+        return self._position_after(db, list_id, after, exclude)
+
+    def _position_at(self, db, list_id, index, exclude=-1):
+        """Return a position that puts a row at `index` in the manual order."""
+        ordered = "SELECT position FROM tasks WHERE list_id = ? AND id != ? ORDER BY position"
+        if index is not None and index <= 0:
+            row = db.execute(ordered + " LIMIT 1", (list_id, exclude)).fetchone()
+            return row[0] - 1.0 if row else 0.0
+        if index is not None:
+            around = [r[0] for r in db.execute(ordered + " LIMIT 2 OFFSET ?",
+                                               (list_id, exclude, index - 1))]
+            if len(around) == 2:
+                low, high = around
+                middle = (low + high) / 2
+                if low < middle < high:
+                    return middle
+                # Out of float precision between neighbours: spread the list out
+                self._renumber(db, list_id)
+                return self._position_at(db, list_id, index, exclude)
+        row = db.execute(ordered + " DESC LIMIT 1", (list_id, exclude)).fetchone()
+        return row[0] + 1.0 if row else 0.0
+
+    def _renumber(self, db, list_id):
+        ids = [r[0] for r in db.execute("SELECT id FROM tasks WHERE list_id = ? ORDER BY position",
+                                        (list_id,))]
+        db.executemany("UPDATE tasks SET position = ? WHERE list_id = ? AND id = ?",
+                       ((float(i), list_id, task_id) for i, task_id in enumerate(ids)))
+
+    @perf.timed
+    def write_snapshot(self, name, tasks):
+        db = self._db()
+        list_id = self._list_id(db, name, create=True)
+        db.execute("DELETE FROM tasks WHERE list_id = ?", (list_id,))
+        db.executemany(INSERT_TASK,
+                       (task_row(list_id, float(i), task) for i, task in enumerate(tasks)))
+        self._set_counts_default(name, ListCounts(tasks))
+
+    def _set_counts_default(self, name, counts):
+        """Count a list written without update_counts(), as a migration does."""
+        with self._counts_lock:
+            self._counts.setdefault(name, counts.to_dict())
+
+    def rename(self, old, new, tasks):
+        db = self._db()
+        with self._counts_lock:
+            if old in self._counts:
+                self._counts.setdefault(new, self._counts.pop(old))
+        if db.execute("UPDATE lists SET name = ? WHERE name = ?", (new, old)).rowcount == 0:
+            self.write_snapshot(new, tasks)
+
+    def delete(self, name):
+        db = self._db()
+        with self._counts_lock:
+            self._counts.pop(name, None)
+        row = db.execute("SELECT id FROM lists WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM tasks WHERE list_id = ?", (row[0],))
+            db.execute("DELETE FROM lists WHERE id = ?", (row[0],))
+
+    def commit(self, names):
+        db = self._db()
+        with self._counts_lock:
+            counts, self._counts = self._counts, {}
+        db.executemany("UPDATE lists SET counts = ? WHERE name = ?",
+                       ((json.dumps(value), name) for name, value in counts.items()))
+        db.commit()
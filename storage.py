@@ -0,0 +1,870 @@
+"""Storage backends for task lists.
+
+A backend implements the Storage interface.  JsonStorage is the
+``lists/`` directory layout; SqliteStorage (in sqlite_storage.py) keeps
+everything in one indexed database.  Use open_storage() to pick a backend
+from a path, and migrate() to copy every list from one backend to another.
+
+In the directory layout each list is stored as a snapshot,
+``lists/<name>.json``, plus an append-only journal,
+``lists/<name>.journal``, with one JSON record per line.  Actions append a
+small record describing the change instead of rewriting the snapshot.
+Loading a list reads the snapshot and replays the journal on top of it.
+Each snapshot carries a random generation token, repeated in the header
+of its journal, so a journal is only replayed on the snapshot it was
+started for, however the files are copied or restored.
+Once the journal grows large relative to the snapshot it is compacted into
+a fresh snapshot.  Snapshots are parsed and written a chunk at a time
+(see jsonstream.py), so a huge list never exists as one JSON document in
+memory.
+
+The app hands all writes to a BackgroundWriter so the Tk thread never
+waits on the disk.  The writer collects a burst of changes over a short
+debounce window and writes each dirty list once.
+
+A Manifest in ``lists/.manifest`` caches each list's name, file
+signatures and counts (see ListCounts).  The app keeps the counts
+current as tasks change, so they are never recomputed from the files.  If the directory has not changed since the
+manifest was saved, startup trusts it and parses no list at all.
+Otherwise only new or changed files are parsed.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import perf
+from binformat import MAGIC, is_binary, read_binary_list, write_binary_list
+from jsonstream import read_list_file, write_list_file
+from tasks import Task, ListCounts, COUNT_FIELDS, normalize_task, index_tasks, fill_due, encode_task
+
+log = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = '.journal'
+MANIFEST_NAME = '.manifest'
+MANIFEST_VERSION = 2
+COMPACT_MIN_RECORDS = 200   # never compact a journal shorter than this
+COMPACT_RATIO = 0.5         # compact once the journal is this large vs. the snapshot
+SAVE_DELAY = 0.25           # seconds the writer waits to coalesce a burst of changes
+LIST_FORMATS = ('json', 'binary', 'zlib')   # snapshot encodings; see binformat.py
+
+
+@perf.timed
+def write_list_atomic(path, name, tasks, list_format='json', generation=None):
+    """Write a list snapshot in `list_format` through a temp file and rename."""
+    tmp = path.with_name(path.name + '.tmp')
+    if list_format == 'json':
+        with open(tmp, 'w', encoding='utf-8') as f:
+            write_list_file(f, name, tasks, default=encode_task, generation=generation)
+    else:
+        with open(tmp, 'wb') as f:
+            write_binary_list(f, name, tasks, compress=list_format == 'zlib', generation=generation)
+    if perf.ENABLED:
+        perf.count('bytes written', tmp.stat().st_size)
+    os.replace(tmp, path)
+
+
+def read_list_snapshot(path):
+    """Return ``(name, tasks, list_format, generation)``, telling the format by its first bytes."""
+    with open(path, 'rb') as f:
+        if is_binary(f.read(len(MAGIC))):
+            f.seek(0)
+            name, tasks, compressed, generation = read_binary_list(f)
+            return name, tasks, 'zlib' if compressed else 'binary', generation
+        f.seek(0)
+        tasks = []
+        with io.TextIOWrapper(f, encoding='utf-8') as text:
+            # Streamed, so only one chunk of the file is in memory at a time
+            members = read_list_file(text, lambda task: tasks.append(normalize_task(task)))
+    return members.get('name', path.stem), tasks, 'json', members.get('generation')
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def optional_signature(path):
+    try:
+        return file_signature(path)
+    except FileNotFoundError:
+        return None
+
+
+def freeze_records(records):
+    """Deep-copy records so later in-memory changes cannot leak into them."""
+    return json.loads(json.dumps(records, default=encode_task))
+
+
+def encode_records(records):
+    return b''.join(json.dumps(r, separators=(',', ':'), default=encode_task).encode('utf-8') + b'\n'
+                    for r in records)
+
+
+def apply_record(tasks, index, record):
+    """Apply one journal record to a list's tasks and id index."""
+    op = record['op']
+    if op == 'add':
+        task = Task(record['task'])
+        tasks.insert(record.get('at', len(tasks)), task)
+        index[task['id']] = task
+        return
+    task = index.get(record.get('id'))
+    if task is None:
+        return
+    if op == 'remove':
+        del index[task['id']]
+        tasks.remove(task)
+    elif op == 'set':
+        task.update(record['fields'])
+    elif op == 'move':
+        tasks.remove(task)
+        tasks.insert(record['to'], task)
+
+
+@perf.timed
+def parse_list_file(path):
+    """Read one list from its files; returns ``(journal, name, tasks, index)``.
+
+    Touches no shared state, so it can run on a worker thread or, since
+    the result pickles, in another process.
+    """
+    journal = ListJournal(path)
+    name, tasks, index = journal.load()
+    return journal, name, tasks, index
+
+
+class ListJournal:
+    """Snapshot plus append-only journal for a single list file."""
+
+    def __init__(self, path, list_format='json'):
+        self.path = path
+        self.journal_path = path.with_suffix(JOURNAL_SUFFIX)
+        self.format = list_format   # of the snapshot; loading detects it
+        self.lock = threading.Lock()
+        self.started = False        # journal exists and matches the snapshot
+        self.records = 0            # records appended since the last compaction
+        self.journal_size = 0
+        self.snapshot_size = 0
+        self.generation = None      # token of the snapshot, shared with its journal
+        self.signatures = None      # of both files when this object last read or wrote them
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def signatures_on_disk(self):
+        return [optional_signature(self.path), optional_signature(self.journal_path)]
+
+    def changed_on_disk(self):
+        """True if another program changed the files since this object used them."""
+        with self.lock:     # waits for a write in progress
+            return self.signatures_on_disk() != self.signatures
+
+    @perf.timed
+    def load(self):
+        """Read the snapshot, replay the journal and return (name, tasks, index)."""
+        # Taken first: a change made while reading must still look new
+        signatures = self.signatures_on_disk()
+        name, tasks, self.format, self.generation = read_list_snapshot(self.path)
+        index = index_tasks(tasks)
+        self.snapshot_size = self.path.stat().st_size
+        self._replay(tasks, index)
+        fill_due(tasks)
+        self.signatures = signatures
+        return name, tasks, index
+
+    def _replay(self, tasks, index):
+        self.started = False
+        self.records = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                lines = f.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return
+        if not lines:
+            return
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return
+        if header.get('op') != 'base' or not self._matches(header):
+            return  # the journal belongs to a different snapshot
+        size = len(lines[0])
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn write at the tail; everything after is unusable
+            apply_record(tasks, index, record)
+            size += len(line)
+            self.records += 1
+        self.journal_size = size
+        self.started = True
+
+    def _matches(self, header):
+        """True if the journal with `header` was started for the loaded snapshot."""
+        if self.generation is not None:
+            return header.get('generation') == self.generation
+        # Files from before generations: the journal recorded the snapshot's signature
+        return 'snapshot' in header and header['snapshot'] == file_signature(self.path)
+
+    def write_snapshot(self, name, tasks):
+        """Rewrite the snapshot and start an empty journal for it."""
+        with self.lock:
+            generation = uuid.uuid4().hex
+            write_list_atomic(self.path, name, tasks, self.format, generation)
+            self.generation = generation
+            self._reset_journal(file_signature(self.path), b'')
+
+    def _reset_journal(self, signature, tail):
+        header = encode_records([{'op': 'base', 'generation': self.generation}])
+        tmp = self.journal_path.with_name(self.journal_path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(header + tail)
+        perf.count('bytes written', len(header) + len(tail))
+        os.replace(tmp, self.journal_path)
+        self.snapshot_size = signature[0]
+        self.journal_size = len(header) + len(tail)
+        self.records = tail.count(b'\n')
+        self.started = True
+        self.signatures = self.signatures_on_disk()
+
+    def append(self, records):
+        """Journal `records`, which have already been applied in memory."""
+        self.append_bytes(encode_records(records), len(records))
+
+    @perf.timed
+    def append_bytes(self, data, count):
+        with self.lock:
+            with open(self.journal_path, 'ab') as f:
+                f.write(data)
+            perf.count('bytes written', len(data))
+            self.journal_size += len(data)
+            self.records += count
+            self.signatures = self.signatures_on_disk()
+        if (self.records >= COMPACT_MIN_RECORDS
+                and self.journal_size >= self.snapshot_size * COMPACT_RATIO):
+            self.compact()
+
+    @perf.timed
+    def compact(self):
+        """Fold the journal into a fresh snapshot.
+
+        The state is rebuilt from disk, so compaction never reads the task
+        dicts the UI is mutating and can run on any thread.
+        """
+        name, tasks, _ = ListJournal(self.path, self.format).load()
+        self.write_snapshot(name, tasks)
+
+    def delete(self):
+        for p in (self.path, self.journal_path):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+        self.signatures = [None, None]
+
+
+class Manifest:
+    """Per-list metadata cached in ``lists/.manifest``.
+
+    Entries are keyed by snapshot file name and hold the list name, the
+    snapshot and journal signatures and the ListCounts fields.  The UI thread
+    updates names and counts; the writer thread stamps signatures and
+    saves, so access goes through `lock`.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = directory / MANIFEST_NAME
+        self.entries = {}
+        self.fresh = False          # the directory matched the saved manifest
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Read the manifest and bring it up to date with the directory.
+
+        Returns the snapshot paths that are new or changed since the
+        manifest was saved; only those need to be parsed.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                raise ValueError('unknown manifest version')
+            self.entries = data['lists']
+            dir_mtime = data.get('dir_mtime')
+        except (OSError, ValueError, KeyError):
+            self.entries, dir_mtime = {}, None
+        self.fresh = dir_mtime == os.stat(self.directory).st_mtime_ns
+        if self.fresh:
+            return []
+
+        stale = []
+        seen = set()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            st = entry.stat()
+            path = self.directory / entry.name
+            cached = self.entries.get(entry.name)
+            if (cached is None or cached.get('snapshot') != [st.st_size, st.st_mtime_ns]
+                    or cached.get('journal') != optional_signature(path.with_suffix(JOURNAL_SUFFIX))):
+                stale.append(path)
+        for file_name in set(self.entries) - seen:
+            del self.entries[file_name]
+        return sorted(stale)
+
+    def update(self, path, **fields):
+        with self.lock:
+            self.entries.setdefault(path.name, {}).update(fields)
+
+    def setdefault(self, path, **fields):
+        """Like `update`, but keep fields the entry already has."""
+        with self.lock:
+            entry = self.entries.setdefault(path.name, {})
+            for key, value in fields.items():
+                entry.setdefault(key, value)
+
+    def remove(self, path):
+        with self.lock:
+            self.entries.pop(path.name, None)
+
+    def stamp(self, journal):
+        """Record the current snapshot and journal signatures of `journal`."""
+        snapshot = optional_signature(journal.path)
+        with self.lock:
+            entry = self.entries.get(journal.path.name)
+            if entry is None or snapshot is None:
+                return
+            entry['snapshot'] = snapshot
+            entry['journal'] = optional_signature(journal.journal_path)
+
+    def save(self):
+        with self.lock:
+            lists = {name: dict(entry) for name, entry in self.entries.items()}
+        if not self.path.exists():
+            self.path.touch()
+        # Rewritten in place: a temp file and rename would change the very
+        # directory mtime recorded here.  A torn manifest is simply rebuilt.
+        data = {'version': MANIFEST_VERSION,
+                'dir_mtime': os.stat(self.directory).st_mtime_ns,
+                'lists': lists}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+
+class Storage:
+    """Interface shared by the storage backends.
+
+    `list_entries`, `load`, `needs_snapshot` and `update_counts` are called
+    from the UI thread.  The write methods are called by BackgroundWriter
+    on its own thread, and `commit` ends each batch of writes.
+    """
+
+    def list_entries(self):
+        """Return ``{name: counts}`` without loading tasks.
+
+        Counts are dicts as from ListCounts.to_dict().
+        """
+        raise NotImplementedError
+
+    def load(self, name):
+        """Return ``(tasks, index)`` for one list."""
+        raise NotImplementedError
+
+    def needs_snapshot(self, name):
+        """True if the next change must be saved as a full snapshot."""
+        return False
+
+    def read_tasks(self, name):
+        """Return the saved tasks of `name`; safe to call from the writer thread."""
+        return self.load(name)[0]
+
+    def update_counts(self, name, counts):
+        """Save the counts of `name` with the next batch of writes."""
+
+    def scan(self):
+        """Return ``(entries, stale)`` for opening in the background.
+
+        `entries` are the lists known without parsing anything, as from
+        list_entries().  `stale` are snapshot paths that still need
+        parsing: pass each to parse_list_file(), on any thread or in
+        another process, and the result back to adopt() on the UI thread,
+        or its exception to forget().
+        """
+        return self.list_entries(), []
+
+    def adopt(self, path, parsed):
+        """Take in a parse_list_file() result; return ``(name, counts)``."""
+        raise NotImplementedError
+
+    def forget(self, path, error):
+        """Drop a stale path that could not be parsed."""
+
+    def take_changed(self):
+        """Return the names adopted since the last call, forgetting them.
+
+        Their files changed while the app was not running, so anything
+        derived from them, such as the search index, may be out of date.
+        """
+        return set()
+
+    def refresh(self, file_names):
+        """Re-read lists whose files another program changed.
+
+        `file_names` come from a watcher (watcher.py).  Returns
+        ``{name: counts}`` for added or changed lists and ``{name: None}``
+        for removed ones; changes this storage made itself are left out.
+        """
+        return {}
+
+    def query(self, name, done=None, priority=None):
+        """Yield the tasks of `name` matching the given filters."""
+        tasks, _ = self.load(name)
+        for task in tasks:
+            if done is not None and bool(task['done']) != done:
+                continue
+            if priority is not None and task.get('priority') != priority:
+                continue
+            yield task
+
+    def create(self, name):
+        raise NotImplementedError
+
+    def write_records(self, name, records):
+        raise NotImplementedError
+
+    def write_snapshot(self, name, tasks):
+        raise NotImplementedError
+
+    def rename(self, old, new, tasks):
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def commit(self, names):
+        """Finish a batch of writes that touched the lists in `names`."""
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """One snapshot and journal per list in a directory, plus a manifest."""
+
+    def __init__(self, directory, list_format='json'):
+        self.directory = Path(directory)
+        self.directory.mkdir(exist_ok=True)
+        self.list_format = list_format     # for new lists; existing ones keep theirs
+        self.manifest = Manifest(self.directory)
+        self.journals = {}      # list name -> ListJournal
+        self._parsed = {}       # lists parsed while scanning, handed out by load()
+        self._changed = set()   # lists adopted since take_changed() was last called
+
+    def _journal(self, name):
+        journal = self.journals.get(name)
+        if journal is None:
+            # Both threads may get here; setdefault keeps a single instance
+            journal = self.journals.setdefault(
+                name, ListJournal(self.directory / f"{name}.json", self.list_format))
+        return journal
+
+    def list_entries(self):
+        entries, stale = self.scan()
+        # Only files that are new or changed since the manifest was saved get parsed
+        for path in stale:
+            try:
+                parsed = parse_list_file(path)
+            except Exception as e:
+                self.forget(path, e)
+                continue
+            self.adopt(path, parsed)
+        return self._entries()
+
+    def scan(self):
+        stale = self.manifest.load()
+        return self._entries(skip={path.name for path in stale}), stale
+
+    def _entries(self, skip=()):
+        entries = {}
+        for file_name, cached in sorted(self.manifest.entries.items()):
+            if file_name in skip:
+                continue
+            journal = self.journals.get(cached['name'])
+            if journal is None:
+                journal = self.journals[cached['name']] = ListJournal(self.directory / file_name,
+                                                                      self.list_format)
+                journal.signatures = [cached.get('snapshot'), cached.get('journal')]
+            entries[cached['name']] = {key: cached[key] for key in COUNT_FIELDS}
+        return entries
+
+    def adopt(self, path, parsed):
+        journal, name, tasks, index = parsed
+        self._changed.add(name)
+        self.journals[name] = journal
+        self._parsed[name] = (tasks, index)
+        counts = ListCounts(tasks).to_dict()
+        self.manifest.update(path, name=name, **counts)
+        self.manifest.stamp(journal)
+        return name, counts
+
+    def forget(self, path, error):
+        log.error("Error loading %s: %s", path, error)
+        self.manifest.remove(path)
+
+    def take_changed(self):
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def refresh(self, file_names):
+        changes = {}
+        by_path = {journal.path: name for name, journal in self.journals.items()}
+        paths = {(self.directory / file_name).with_suffix('.json') for file_name in file_names
+                 if file_name.endswith(('.json', JOURNAL_SUFFIX))}
+        for path in sorted(paths):
+            name = by_path.get(path)
+            if name is not None and not self.journals[name].changed_on_disk():
+                continue    # our own save
+            if name is not None and not path.exists():
+                del self.journals[name]
+                self._parsed.pop(name, None)
+                self.manifest.remove(path)
+                changes[name] = None
+                continue
+            try:
+                parsed = parse_list_file(path)
+            except FileNotFoundError:
+                continue    # a journal whose list was never here
+            except Exception as e:
+                log.error("Error loading %s: %s", path, e)     # retried on its next change
+                continue
+            if name is not None and parsed[1] != name:
+                del self.journals[name]
+                changes[name] = None
+            new_name, counts = self.adopt(path, parsed)
+            changes[new_name] = counts
+        return changes
+
+    def load(self, name):
+        if name in self._parsed:
+            return self._parsed.pop(name)
+        _, tasks, index = self._journal(name).load()
+        return tasks, index
+
+    def needs_snapshot(self, name):
+        return not self._journal(name).started
+
+    def read_tasks(self, name):
+        journal = self.journals.get(name)
+        if journal is None:
+            raise KeyError(name)
+        # A separate journal object leaves the list's write state alone
+        return ListJournal(journal.path).load()[1]
+
+    def update_counts(self, name, counts):
+        self.manifest.update(self._journal(name).path, name=name, **counts)
+
+    def create(self, name):
+        self.write_snapshot(name, [])
+
+    def write_records(self, name, records):
+        self._journal(name).append(records)
+
+    def write_snapshot(self, name, tasks):
+        journal = self._journal(name)
+        journal.write_snapshot(name, tasks)
+        # Counts from update_counts() are newer than this queued snapshot
+        self.manifest.setdefault(journal.path, name=name, **ListCounts(tasks).to_dict())
+
+    def rename(self, old, new, tasks):
+        if old in self.journals:
+            self._journal(new).format = self.journals[old].format
+        self.write_snapshot(new, tasks)
+        self.delete(old)
+
+    def convert(self, list_format):
+        """Rewrite every list in `list_format`; return the list count."""
+        names = list(self.list_entries())
+        for name in names:
+            tasks, _ = self.load(name)
+            self._journal(name).format = list_format
+            self.write_snapshot(name, tasks)
+        self.list_format = list_format
+        self.commit(names)
+        return len(names)
+
+    def delete(self, name):
+        journal = self.journals.pop(name, None)
+        if journal is not None:
+            journal.delete()
+            self.manifest.remove(journal.path)
+
+    def commit(self, names):
+        for name in names:
+            journal = self.journals.get(name)
+            if journal is not None:
+                self.manifest.stamp(journal)
+        self.manifest.save()
+
+
+def open_storage(location, list_format='json'):
+    """Return the backend for `location`: a ``.db`` file or a lists directory.
+
+    `list_format` is the file format, one of LIST_FORMATS, of new lists
+    in a directory.
+    """
+    location = Path(location)
+    if location.suffix in ('.db', '.sqlite', '.sqlite3'):
+        from sqlite_storage import SqliteStorage
+        return SqliteStorage(location)
+    return JsonStorage(location, list_format)
+
+
+def migrate(source, target):
+    """Copy every list from one backend into another; return the list count."""
+    names = list(source.list_entries())
+    for name in names:
+        tasks, _ = source.load(name)
+        target.write_snapshot(name, tasks)
+    target.commit(names)
+    return len(names)
+
+
+class BackgroundWriter:
+    """Single writer thread that applies list writes in submission order.
+
+    Changes that arrive within `delay` seconds of each other are written
+    together: all records for one list go to the backend in one call.
+    A snapshot or delete supersedes any records still queued for that list.
+    Each batch ends with a call to the backend's commit().
+
+    An optional search `index` receives the same write calls as the
+    storage, after it, so the two stay in step.
+
+    Errors do not stop the writer; they are kept for take_errors().  A
+    list whose records could not be journaled is marked as needing a
+    snapshot (see needs_snapshot()), since its journal may now lack them.
+    """
+
+    def __init__(self, storage, delay=SAVE_DELAY, index=None):
+        self.storage = storage
+        self.index = index
+        self.delay = delay
+        self._ops = []
+        self._cond = threading.Condition()
+        self._busy = False
+        self._flushing = False
+        self._closed = False
+        self._errors = []           # messages not yet taken by take_errors()
+        self._unjournaled = set()   # lists whose last records failed to save
+        self._thread = threading.Thread(target=self._run, name='list-writer', daemon=True)
+        self._thread.start()
+
+    def append(self, name, records):
+        # Copy now: the task dicts may change again before the write
+        self._submit('records', name, freeze_records(records))
+
+    def write_snapshot(self, name, tasks):
+        self._submit('snapshot', name, [dict(t) for t in tasks])
+
+    def create(self, name):
+        self._submit('create', name, None)
+
+    def rename(self, old, new, tasks):
+        self._submit('rename', old, (new, [dict(t) for t in tasks]))
+
+    def delete(self, name):
+        self._submit('delete', name, None)
+
+    def reindex(self, name):
+        """Rebuild the search index entry of `name` from the saved list."""
+        self._submit('reindex', name, None)
+
+    def commit(self):
+        """Commit with the next batch even if no list changed."""
+        self._submit('commit', None, None)
+
+    def take_errors(self):
+        """Return the messages of errors since the last call, oldest first."""
+        with self._cond:
+            errors, self._errors = self._errors, []
+            return errors
+
+    def needs_snapshot(self, name):
+        """True if saving records for `name` failed and no snapshot has replaced them since."""
+        with self._cond:
+            return name in self._unjournaled
+
+    def _error(self, message):
+        log.error(message)
+        with self._cond:
+            self._errors.append(message)
+
+    def _submit(self, kind, name, payload):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('writer is closed')
+            self._ops.append((kind, name, payload))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Write everything queued so far and wait until it is on disk."""
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            done = self._cond.wait_for(lambda: not self._ops and not self._busy, timeout)
+            self._flushing = False
+            return done
+
+    def close(self, timeout=None):
+        """Flush and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ops or self._closed)
+                if not self._ops:
+                    return
+                deadline = time.monotonic() + self.delay
+                while not (self._closed or self._flushing):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                ops, self._ops = self._ops, []
+                self._busy = True
+            try:
+                self._write(ops)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    @perf.timed
+    def _write(self, ops):
+        targets = [self.storage] if self.index is None else [self.storage, self.index]
+        pending = {}    # list name -> records to write in one call
+        touched = set()
+
+        def apply(name, call):
+            """Call `call` on each target; True if the storage took it."""
+            saved = True
+            for target in targets:
+                try:
+                    call(target)
+                except Exception as e:
+                    self._error(f"Error saving list {name!r}: {e}")
+                    saved = saved and target is not self.storage
+            return saved
+
+        def write_pending(name):
+            records = pending.pop(name, None)
+            if records and not apply(name, lambda target: target.write_records(name, records)):
+                with self._cond:
+                    self._unjournaled.add(name)
+
+        for kind, name, payload in ops:
+            if kind == 'commit':
+                continue
+            if kind == 'reindex':
+                if self.index is not None:
+                    write_pending(name)
+                    self._reindex(name)
+                continue
+            touched.add(name)
+            if kind == 'records':
+                pending.setdefault(name, []).extend(payload)
+                continue
+            if kind in ('snapshot', 'delete'):
+                pending.pop(name, None)
+            else:
+                write_pending(name)
+            if kind == 'snapshot':
+                saved = apply(name, lambda target: target.write_snapshot(name, payload))
+            elif kind == 'create':
+                saved = apply(name, lambda target: target.create(name))
+            elif kind == 'rename':
+                new, tasks = payload
+                # The list is saved in full under its new name
+                saved = apply(name, lambda target: target.rename(name, new, tasks))
+                touched.add(new)
+            elif kind == 'delete':
+                saved = apply(name, lambda target: target.delete(name))
+            if saved:
+                with self._cond:
+                    self._unjournaled.discard(name)
+        for name in list(pending):
+            write_pending(name)
+        for target in targets:
+            try:
+                target.commit(touched)
+            except Exception as e:
+                self._error(f"Error committing lists: {e}")
+
+    def _reindex(self, name):
+        try:
+            tasks = self.storage.read_tasks(name)
+        except (KeyError, FileNotFoundError):
+            tasks = None    # the list is gone
+        except Exception as e:
+            self._error(f"Error indexing list {name!r}: {e}")
+            return
+        try:
+            if tasks is None:
+                self.index.delete(name)
+            else:
+                self.index.write_snapshot(name, tasks)
+        except Exception as e:
+            self._error(f"Error indexing list {name!r}: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage task list storage.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    mig = sub.add_parser('migrate', help='copy every list from one storage location to another')
+    mig.add_argument('source', help='lists directory or .db file to read')
+    mig.add_argument('target', help='lists directory or .db file to write')
+    conv = sub.add_parser('convert', help='rewrite every list of a directory in another file format')
+    conv.add_argument('directory', help='lists directory')
+    conv.add_argument('--to', choices=LIST_FORMATS, required=True, dest='list_format',
+                      help='json (readable, diffable), binary, or zlib (compressed binary)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        storage = JsonStorage(args.directory)
+        try:
+            count = storage.convert(args.list_format)
+        finally:
+            storage.close()
+        print(f"Converted {count} list(s) in {args.directory} to {args.list_format}")
+        return
+
+    source, target = open_storage(args.source), open_storage(args.target)
+    try:
+        count = migrate(source, target)
+    finally:
+        source.close()
+        target.close()
+    print(f"Migrated {count} list(s) from {args.source} to {args.target}")
+
+
+if __name__ == '__main__':
+    main()
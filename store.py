@@ -0,0 +1,672 @@
+"""Lists, tasks, ordering and persistence, independent of any UI.
+
+TodoStore is the model behind both the Tk app (main.py) and the command
+line (cli.py).  It never imports tkinter, so scripts and batch jobs can
+use it on machines without a display.
+
+Each list is a dict entry in `lists`.  Entries start with just the
+counts from the storage (a ListCounts, kept current with every change
+and saved with the list); `load` fills in the tasks, the id index, the
+due date index and the display order the first time a list is used.
+Every change updates the entry in memory, queues journal records on
+the background writer and records how to undo it in `history`.
+"""
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import perf
+from history import History, Step, HISTORY_BUDGET, STEP_COST, task_cost
+from ordering import TaskOrder
+from search import SearchIndex
+from storage import BackgroundWriter, open_storage, parse_list_file, SAVE_DELAY
+from tasks import Task, Subtask, NO_SUBTASKS, next_task_id, parse_deadline, DueIndex, ListCounts
+
+log = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).parent
+LISTS_DIR = APP_DIR / "lists"
+# A lists directory (the default) or a .db file for the SQLite backend
+STORAGE = os.environ.get('TODO_STORAGE') or LISTS_DIR
+# File format of new lists in a lists directory: json, binary or zlib
+LIST_FORMAT = os.environ.get('TODO_LIST_FORMAT') or 'json'
+DUE_SOON_LIMIT = 50
+PROCESS_POOL_MIN_BYTES = 16 << 20   # list files parsed in another process when opening
+
+
+def old_fields(task, fields):
+    """Return the current values of the keys in `fields`, to undo setting them."""
+    return {key: task.get(key, None if key == 'due' else '') for key in fields}
+
+
+def id_before(tasks, at):
+    """Return the id of the task before position `at` of `tasks`, None at the start.
+
+    Records carry it as ``after`` so that backends can place a row next
+    to its neighbour by id rather than by counting rows.
+    """
+    return tasks[at - 1]['id'] if at else None
+
+
+def add_record(tasks, at, task):
+    """Return the record for `task`, now at position `at` of `tasks`."""
+    return {'op': 'add', 'task': task, 'at': at, 'after': id_before(tasks, at)}
+
+
+def search_index_path(location):
+    """Word index over every list, kept next to the storage it covers."""
+    return Path(f"{location}.index")
+
+
+class TodoStore:
+    def __init__(self, location=STORAGE, delay=SAVE_DELAY, list_format=LIST_FORMAT,
+                 history_budget=HISTORY_BUDGET):
+        self.storage = open_storage(location, list_format)
+        self.search_index = SearchIndex(search_index_path(location))
+        # All saving happens on this thread so callers never wait on the disk
+        self.writer = BackgroundWriter(self.storage, delay=delay, index=self.search_index)
+        self.lists = {}
+        self.history = History(history_budget)
+        self._replaying = False
+        self._threads = self._processes = None     # pools of open_in_background
+        self._opening = []
+        self._entries = {}
+        self.sort_column = 'done'
+        self.sort_descending = False
+
+    def open(self):
+        """Read list names and counts; tasks are loaded on first use."""
+        self.lists.clear()
+        try:
+            entries = self.storage.list_entries()
+        except Exception:
+            log.exception("Error loading lists")
+            entries = {}
+        for name, counts in entries.items():
+            self.lists[name] = {'tasks': None, 'counts': ListCounts.from_dict(counts)}
+        self._opened(entries)
+
+    def _opened(self, entries):
+        # Counts refreshed while scanning are saved with the next batch
+        self.writer.commit()
+        # Lists changed outside the app are reindexed in the background
+        for name in self.search_index.stale_lists(entries, self.storage.take_changed()):
+            self.writer.reindex(name)
+
+    def open_in_background(self, first=None, workers=None):
+        """Start opening the lists on a pool of worker threads.
+
+        Lists the storage knows without parsing are available at once.
+        Files that need parsing, and the tasks of `first` (by default the
+        first list by name), are read by the workers; big files go to a
+        process pool.  Call `poll_opened` from the UI thread to take in
+        the results.
+        """
+        self.lists.clear()
+        try:
+            entries, stale = self.storage.scan()
+        except Exception:
+            log.exception("Error loading lists")
+            entries, stale = {}, []
+        for name, counts in entries.items():
+            self.lists[name] = {'tasks': None, 'counts': ListCounts.from_dict(counts)}
+        self._entries = dict(entries)
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='list-loader')
+        self._opening = []
+        first = first if first in entries else min(entries, default=None)
+        if first is not None:
+            self._opening.append(('loaded', first, self._threads.submit(self.storage.load, first)))
+        for path in sorted(stale, key=lambda p: (p.stem != first, p.name)):
+            self._opening.append(('parsed', path, self._pool_for(path).submit(parse_list_file, path)))
+
+    def _pool_for(self, path):
+        try:
+            big = path.stat().st_size >= PROCESS_POOL_MIN_BYTES
+        except OSError:
+            big = False
+        if not big:
+            return self._threads
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor()
+        return self._processes
+
+    @perf.timed
+    def poll_opened(self):
+        """Take in finished background loads; return ``(names, done)``.
+
+        `names` are the lists that appeared or whose tasks are now in
+        memory; `done` is True once nothing is left to open.
+        """
+        names = []
+        pending = []
+        for kind, key, future in self._opening:
+            if not future.done():
+                pending.append((kind, key, future))
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                if kind == 'parsed':
+                    self.storage.forget(key, e)
+                else:
+                    log.error("Error loading list %r: %s", key, e)
+                continue
+            if kind == 'parsed':
+                name, counts = self.storage.adopt(key, result)
+                self._entries[name] = counts
+                entry = self.lists.setdefault(name, {'tasks': None})
+                if entry['tasks'] is None:
+                    entry['counts'] = ListCounts.from_dict(counts)
+                names.append(name)
+            elif key in self.lists and self.lists[key]['tasks'] is None:
+                self._install(key, *result)
+                names.append(key)
+        self._opening = pending
+        if pending:
+            return names, False
+        self._shutdown_pools()
+        self._opened(self._entries)
+        return names, True
+
+    def _shutdown_pools(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+        self._opening = []
+
+    def names(self):
+        return sorted(self.lists)
+
+    @perf.timed
+    def refresh_changed(self, file_names):
+        """Pick up lists that other programs changed; return the affected names.
+
+        Changed lists that were loaded are reloaded from disk, so an
+        outside edit wins over changes still waiting to be saved.
+        """
+        changes = self.storage.refresh(file_names)
+        for name, counts in changes.items():
+            self.writer.reindex(name)
+            entry = self.lists.get(name)
+            if counts is None:
+                self.lists.pop(name, None)
+            elif entry is None:
+                self.lists[name] = {'tasks': None, 'counts': ListCounts.from_dict(counts)}
+            else:
+                loaded = entry['tasks'] is not None
+                # Updated in place, since callers may hold on to the entry
+                entry.clear()
+                entry.update(tasks=None, counts=ListCounts.from_dict(counts))
+                if loaded:
+                    self.load(name)
+        if changes:
+            self.writer.commit()    # saves the manifest with the new counts
+            # Steps refer to the tasks that were just replaced
+            self.history.clear()
+        return set(changes)
+
+    def load(self, name):
+        """Return the entry of list `name`, loading its tasks if needed."""
+        entry = self.lists[name]
+        if entry['tasks'] is None:
+            self._install(name, *self.storage.load(name))
+        return entry
+
+    @perf.timed
+    def _install(self, name, tasks, index):
+        entry = self.lists[name]
+        entry.update(tasks=tasks, index=index, next_id=next_task_id(index),
+                     due_index=DueIndex(tasks),
+                     order=TaskOrder(tasks, self.sort_column, self.sort_descending),
+                     counts=ListCounts(tasks),
+                     journaled=not self.storage.needs_snapshot(name))
+
+    def ordered(self, name):
+        """Return the tasks of `name` in display order for the current sort."""
+        order = self.load(name)['order']
+        order.sort_by(self.sort_column, self.sort_descending)
+        return order.rows
+
+    def query(self, name, done=None):
+        """Return the tasks of `name` with the given done state, in display order.
+
+        A list that is not loaded is filtered by the storage, so only the
+        matching tasks are read and sorted.
+        """
+        entry = self.lists[name]
+        if entry['tasks'] is not None:
+            return [task for task in self.ordered(name) if done is None or bool(task['done']) == done]
+        tasks = list(self.storage.query(name, done=done))
+        return TaskOrder(tasks, self.sort_column, self.sort_descending).rows
+
+    def sort_by(self, column, descending=False):
+        self.sort_column, self.sort_descending = column, descending
+
+    @perf.timed
+    def task(self, name, task_id):
+        return self.load(name)['index'].get(task_id)
+
+    # Lists
+
+    def create_list(self, name):
+        if name in self.lists:
+            raise ValueError(f'A list named "{name}" already exists.')
+        self.writer.create(name)
+        entry = self.lists[name] = {'tasks': [], 'index': {}, 'next_id': 1, 'counts': ListCounts(),
+                                    'due_index': DueIndex(), 'journaled': True,
+                                    'order': TaskOrder([], self.sort_column, self.sort_descending)}
+        self._record(('delete_list', name), ('_restore_list', name, entry), (name, name))
+        return entry
+
+    def rename_list(self, old, new):
+        if new in self.lists:
+            raise ValueError(f'A list named "{new}" already exists.')
+        entry = self.load(old)
+        del self.lists[old]
+        self.writer.rename(old, new, entry['tasks'])
+        self.lists[new] = entry
+        self._record(('rename_list', new, old), ('rename_list', old, new), (old, new))
+
+    def delete_list(self, name):
+        # Loaded first, so that undoing the delete can write the tasks back
+        entry = self.load(name)
+        del self.lists[name]
+        self.writer.delete(name)
+        self._record(('_restore_list', name, entry), ('delete_list', name), (name, name),
+                     cost=STEP_COST + sum(task_cost(t) for t in entry['tasks']))
+
+    def _restore_list(self, name, entry):
+        self.lists[name] = entry
+        entry['journaled'] = False     # written back as a fresh snapshot
+        self.save(name)
+
+    # Tasks
+
+    def new_task(self, entry, text, deadline='', subtasks='', priority='', done=False):
+        task = self._append_task(entry, text, deadline, subtasks, priority, done,
+                                 parse_deadline(deadline))
+        entry['due_index'].add(task)
+        entry['order'].insert(task)
+        return task
+
+    def _append_task(self, entry, text, deadline='', subtasks='', priority='', done=False, due=None):
+        """Add a task to the list and its id index only; callers order and index it."""
+        task = Task(id=entry['next_id'], text=text, done=done, priority=priority,
+                    deadline=deadline, due=due, subtasks=subtasks)
+        entry['next_id'] += 1
+        entry['counts'].add(task)
+        entry['tasks'].append(task)
+        entry['index'][task['id']] = task
+        return task
+
+    def add_task(self, name, text, deadline='', subtasks='', priority=''):
+        entry = self.load(name)
+        task = self.new_task(entry, text, deadline, subtasks, priority)
+        placed = [(len(entry['tasks']) - 1, task)]
+        self.save(name, [add_record(entry['tasks'], *placed[0])])
+        self._record(('_take', name, placed), ('_put', name, placed), (name, name), (task,))
+        return task
+
+    @perf.timed
+    def add_tasks(self, name, items):
+        """Add many tasks, given as dicts of new_task arguments, in one batch.
+
+        The batch is ordered and indexed in one pass each, and saved with
+        one write, so bulk imports cost about the same per task at any size.
+        """
+        entry = self.load(name)
+        start = len(entry['tasks'])
+        dues = {}   # deadlines repeat, and parsing one tries every format
+        tasks = []
+        for item in items:
+            deadline = item.get('deadline', '')
+            if deadline not in dues:
+                dues[deadline] = parse_deadline(deadline)
+            tasks.append(self._append_task(entry, due=dues[deadline], **item))
+        entry['due_index'].add_all(tasks)
+        entry['order'].insert_all(tasks)
+        placed = list(enumerate(tasks, start))
+        self.save(name, [add_record(entry['tasks'], at, task) for at, task in placed])
+        self._record(('_take', name, placed), ('_put', name, placed), (name, name), tuple(tasks),
+                     cost=STEP_COST + 16 * len(placed))
+        return tasks
+
+    def remove_task(self, name, task):
+        entry = self.load(name)
+        placed = [(entry['order'].manual_index(entry['tasks'], task), task)]
+        self._take(name, placed)
+        self._record(('_put', name, placed), ('_take', name, placed), (name, name), (task,),
+                     cost=STEP_COST + task_cost(task))
+
+    def remove_tasks(self, name, tasks):
+        """Remove many tasks as one change: one pass over the list and one save."""
+        entry = self.load(name)
+        ids = {t['id'] for t in tasks}
+        placed = [(i, t) for i, t in enumerate(entry['tasks']) if t['id'] in ids]
+        if not placed:
+            return
+        self._take(name, placed)
+        self._record(('_put', name, placed), ('_take', name, placed), (name, name),
+                     tuple(t for _, t in placed),
+                     cost=STEP_COST + sum(task_cost(t) for _, t in placed))
+
+    def remove_items(self, name, tasks, targets):
+        """Remove `tasks` and the ``(task, subtask id)`` `targets` as one change and one save."""
+        entry = self.load(name)
+        ids = {t['id'] for t in tasks}
+        placed = [(i, t) for i, t in enumerate(entry['tasks']) if t['id'] in ids] if ids else []
+        # Subtasks of removed tasks go with them
+        changes = self._subtask_changes([(task, subtask_id) for task, subtask_id in targets
+                                         if task['id'] not in ids], lambda subtask: None)
+        if not placed and not changes:
+            return
+        old = [(task, old_fields(task, fields)) for task, fields in changes]
+        self._set_and_take(name, changes, placed)
+        self._record(('_put_and_set', name, placed, old), ('_set_and_take', name, changes, placed),
+                     (name, name), tuple(t for _, t in placed) + tuple(t for t, _ in changes),
+                     cost=STEP_COST + sum(task_cost(t) for _, t in placed) + 16 * len(old))
+
+    def _set_and_take(self, name, changes, placed):
+        """Apply ``(task, fields)`` `changes`, then remove the tasks of `placed`, in one save."""
+        self.save(name, self._set_many(name, changes, save=False) + self._take(name, placed, save=False))
+
+    def _put_and_set(self, name, placed, changes):
+        """Undo _set_and_take(): put the tasks back, then apply `changes`, in one save."""
+        self.save(name, self._put(name, placed, save=False) + self._set_many(name, changes, save=False))
+
+    def _take(self, name, placed, save=True):
+        """Remove the tasks of ``(position, task)`` pairs, in ascending position order.
+
+        Without `save` the records are returned for the caller to save.
+        """
+        entry = self.load(name)
+        tasks = entry['tasks']
+        if len(placed) == 1:
+            at, task = placed[0]
+            # The position is only a hint; it is right unless the list was reordered since
+            if not (at < len(tasks) and tasks[at] is task):
+                at = tasks.index(task)
+            del tasks[at]
+        else:
+            taken = {task['id'] for _, task in placed}
+            tasks[:] = [t for t in tasks if t['id'] not in taken]
+        removed = [task for _, task in placed]
+        # The manual ranks stay, so putting the tasks back restores their places
+        entry['order'].remove_all(removed)
+        for task in removed:
+            del entry['index'][task['id']]
+            entry['due_index'].remove(task)
+            entry['counts'].remove(task)
+        records = [{'op': 'remove', 'id': task['id']} for task in removed]
+        if not save:
+            return records
+        self.save(name, records)
+
+    def _put(self, name, placed, save=True):
+        """Put back tasks taken by _take(), each at its old position."""
+        entry = self.load(name)
+        tasks = entry['tasks']
+        if len(placed) == 1:
+            tasks.insert(*placed[0])
+        else:
+            merged, rest = [], iter(tasks)
+            for at, task in placed:
+                merged.extend(islice(rest, at - len(merged)))
+                merged.append(task)
+            merged.extend(rest)
+            tasks[:] = merged
+        added = [task for _, task in placed]
+        entry['order'].insert_all(added)
+        for task in added:
+            entry['index'][task['id']] = task
+            entry['due_index'].add(task)
+            entry['counts'].add(task)
+        records = [add_record(tasks, at, task) for at, task in placed]
+        if not save:
+            return records
+        self.save(name, records)
+
+    def toggle_task(self, name, task):
+        entry = self.load(name)
+        entry['due_index'].remove(task)
+        entry['counts'].remove(task)
+        task['done'] = not task['done']
+        entry['counts'].add(task)
+        entry['due_index'].add(task)
+        entry['order'].update(task)
+        self.save(name, [{'op': 'set', 'id': task['id'], 'fields': {'done': task['done']}}])
+        self._record(('toggle_task', name, task), ('toggle_task', name, task), (name, name), (task,))
+        return task['done']
+
+    def edit_task(self, name, task, **fields):
+        """Change the text, priority, deadline or subtasks of `task`."""
+        if 'deadline' in fields and fields['deadline'] != task.get('deadline', ''):
+            fields['due'] = parse_deadline(fields['deadline'])
+        old = old_fields(task, fields)
+        self._set_many(name, [(task, fields)])
+        self._record(('_set_many', name, [(task, old)]), ('_set_many', name, [(task, fields)]),
+                     (name, name), (task,), cost=STEP_COST + len(old.get('text', '')))
+
+    def edit_tasks(self, name, tasks, **fields):
+        """Give every task in `tasks` the same priority, deadline or other fields."""
+        if 'deadline' in fields:
+            fields['due'] = parse_deadline(fields['deadline'])
+        self._change(name, [(task, fields) for task in tasks])
+
+    def toggle_tasks(self, name, tasks):
+        """Mark `tasks` done, or not done if they all are; return the new state."""
+        return self.toggle_items(name, tasks, ())
+
+    def toggle_items(self, name, tasks, targets):
+        """Mark `tasks` and the ``(task, subtask id)`` `targets` done, or not done if they all are.
+
+        Tasks and subtasks change together: one step and one save.
+        Returns the new state.
+        """
+        found = [task['subtasks'].find(subtask_id) for task, subtask_id in targets]
+        states = [task['done'] for task in tasks] + [s.done for s in found if s is not None]
+        done = not all(states)
+        changes = {task['id']: (task, {'done': done}) for task in tasks if task['done'] != done}
+        for task, fields in self._subtask_changes(targets, lambda subtask: subtask.replace(done=done)):
+            changes.setdefault(task['id'], (task, {}))[1].update(fields)
+        self._change(name, list(changes.values()))
+        return done
+
+    def add_subtask(self, name, task, text, deadline='', parent_id=None):
+        """Add a subtask to `task`, under its subtask `parent_id` if given; return it."""
+        subtasks = task.get('subtasks', NO_SUBTASKS)
+        subtask = Subtask(subtasks.next_id(), text, deadline=deadline, due=parse_deadline(deadline))
+        self._change(name, [(task, {'subtasks': subtasks.add(subtask, parent_id)})])
+        return subtask
+
+    def edit_subtask(self, name, task, subtask_id, **fields):
+        """Change the text, deadline or done state of one subtask of `task`."""
+        if 'deadline' in fields:
+            fields['due'] = parse_deadline(fields['deadline'])
+        self._change_subtasks(name, [(task, subtask_id)], lambda subtask: subtask.replace(**fields))
+
+    def toggle_subtasks(self, name, targets):
+        """Mark the ``(task, subtask id)`` `targets` done, or not done if they all are."""
+        return self.toggle_items(name, (), targets)
+
+    def remove_subtasks(self, name, targets):
+        """Remove the ``(task, subtask id)`` `targets` and everything under them."""
+        self._change_subtasks(name, targets, lambda subtask: None)
+
+    def _change_subtasks(self, name, targets, change):
+        """Apply `change` to each target subtask: one step, one save, one new tree per task."""
+        self._change(name, self._subtask_changes(targets, change))
+
+    def _subtask_changes(self, targets, change):
+        """Return ``(task, fields)`` giving each task of `targets` its tree with `change` applied."""
+        trees = {}
+        for task, subtask_id in targets:
+            subtasks = trees.get(task['id'], (task, task.get('subtasks', NO_SUBTASKS)))[1]
+            trees[task['id']] = (task, subtasks.change(subtask_id, change))
+        return [(task, {'subtasks': subtasks}) for task, subtasks in trees.values()
+                if subtasks is not task.get('subtasks')]
+
+    def _change(self, name, changes):
+        if not changes:
+            return
+        old = [(task, old_fields(task, fields)) for task, fields in changes]
+        self._set_many(name, changes)
+        self._record(('_set_many', name, old), ('_set_many', name, changes), (name, name),
+                     tuple(task for task, _ in changes),
+                     cost=STEP_COST + sum(16 + len(fields.get('text', '')) for _, fields in old))
+
+    def _set_many(self, name, changes, save=True):
+        """Apply ``(task, fields)`` pairs: one reordering and one save for them all."""
+        entry = self.load(name)
+        due_index, counts = entry['due_index'], entry['counts']
+        for task, fields in changes:
+            due_index.remove(task)
+            counts.remove(task)
+            task.update(fields)
+            counts.add(task)
+            due_index.add(task)
+        entry['order'].update_all([task for task, _ in changes])
+        records = [{'op': 'set', 'id': task['id'], 'fields': fields} for task, fields in changes]
+        if not save:
+            return records
+        self.save(name, records)
+
+    def swap_tasks(self, name, task, other):
+        """Swap the manual order of two tasks; False if the sort keeps them apart."""
+        if not self.load(name)['order'].same_group(task, other):
+            return False
+        pairs = [(task, other)]
+        self._swap_pairs(name, pairs)
+        self._record(('_swap_pairs', name, pairs), ('_swap_pairs', name, pairs), (name, name), (task,))
+        return True
+
+    def move_tasks(self, name, tasks, offset):
+        """Move `tasks` as a block one row up (offset -1) or down (+1) in the display.
+
+        Each task passes its neighbour only where the sort would swap
+        them, as with swap_tasks(); returns False if none could move.
+        """
+        order = self.load(name)['order']
+        rows = order.rows
+        moving = {task['id'] for task in tasks}
+        positions = sorted((order.index(task) for task in tasks), reverse=offset > 0)
+        shown, pairs = {}, []     # rows moved so far, by display position
+        for i in positions:
+            j = i + offset
+            if not 0 <= j < len(rows):
+                continue
+            task, other = shown.get(i, rows[i]), shown.get(j, rows[j])
+            if other['id'] in moving or not order.same_group(task, other):
+                continue
+            shown[i], shown[j] = other, task
+            pairs.append((task, other))
+        if not pairs:
+            return False
+        self._swap_pairs(name, pairs)
+        self._record(('_swap_pairs', name, pairs[::-1]), ('_swap_pairs', name, pairs), (name, name),
+                     tuple(tasks))
+        return True
+
+    def _swap_pairs(self, name, pairs):
+        """Swap the manual order of each ``(task, other)`` pair, in turn."""
+        entry = self.load(name)
+        tasks, order = entry['tasks'], entry['order']
+        records = []
+        for task, other in pairs:
+            i, j = order.manual_index(tasks, task), order.manual_index(tasks, other)
+            # The saved list is the manual order, so the two trade places there
+            tasks[i], tasks[j] = other, task
+            order.swap(task, other)
+            records += [{'op': 'move', 'id': task['id'], 'to': j, 'after': id_before(tasks, j)},
+                        {'op': 'move', 'id': other['id'], 'to': i, 'after': id_before(tasks, i)}]
+        self.save(name, records)
+
+    # Undo
+
+    def _record(self, undo, redo, names, tasks=(), cost=STEP_COST):
+        if not self._replaying:
+            self.history.record(Step(undo, redo, names, tasks, cost))
+
+    def undo(self):
+        """Revert the latest change; return ``(list name, tasks)`` it touched, or None."""
+        return self._replay(self.history.undo(), 0)
+
+    def redo(self):
+        """Repeat the latest undone change; return ``(list name, tasks)``, or None."""
+        return self._replay(self.history.redo(), 1)
+
+    def _replay(self, step, which):
+        if step is None:
+            return None
+        name, *args = step.redo if which else step.undo
+        self._replaying = True
+        try:
+            getattr(self, name)(*args)
+        except Exception:
+            # The lists no longer match what the other steps expect
+            self.history.clear()
+            raise
+        finally:
+            self._replaying = False
+        return step.names[which], step.tasks
+
+    @perf.timed
+    def save(self, name, records=None):
+        """Queue `records` for list `name`, or a full snapshot."""
+        entry = self.lists[name]
+        self.storage.update_counts(name, entry['counts'].to_dict())
+        if records is None or not entry['journaled'] or self.writer.needs_snapshot(name):
+            # Lists without a usable journal start one from a fresh snapshot
+            self.writer.write_snapshot(name, entry['tasks'])
+            entry['journaled'] = True
+        else:
+            self.writer.append(name, records)
+
+    # Queries
+
+    def search(self, query):
+        """Return ``(list, task id, text, done)`` for tasks matching `query`."""
+        return self.search_index.search(query)
+
+    def due_soon(self, limit=DUE_SOON_LIMIT):
+        """Return the `limit` open tasks due soonest across all lists.
+
+        Loaded lists contribute their in-memory DueIndex, the others the
+        search index; heapq.merge reads only as far as the first `limit`.
+        """
+        loaded = [name for name, entry in self.lists.items() if entry['tasks'] is not None]
+        streams = [self._due_in(name) for name in loaded]
+        streams.append(self.search_index.due_soon(exclude=loaded))
+        return list(islice(heapq.merge(*streams), limit))
+
+    def overview(self, now=None):
+        """Return ``(name, counts, overdue)`` for every list without loading any tasks."""
+        now = time.time() if now is None else now
+        return [(name, self.lists[name]['counts'], self.lists[name]['counts'].overdue(now))
+                for name in self.names()]
+
+    def _due_in(self, name):
+        """Yield the open tasks of a loaded list in due_soon's row format."""
+        entry = self.lists[name]
+        for due, task_id in entry['due_index']:
+            task = entry['index'][task_id]
+            yield due, name, task_id, task['text'], task['deadline']
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def write_errors(self):
+        """Return the messages of saves that failed since the last call."""
+        return self.writer.take_errors()
+
+    def close(self):
+        """Write out pending changes and release the storage."""
+        self._shutdown_pools()
+        self.writer.close()
+        self.storage.close()
+        self.search_index.close()
@@ -0,0 +1,506 @@
+"""Task records as stored in the list files.
+
+Every task carries an integer ``id`` that is unique within its list and is
+persisted in the list JSON.  Lists keep an ``id -> task`` index so that
+actions resolve their target in constant time.
+
+The free-form ``deadline`` text is parsed once, when it is entered or when
+an older task is first loaded, into a ``due`` timestamp that is saved with
+the task (None if the text is not a date).  A DueIndex keeps a list's open
+tasks ordered by that timestamp.
+
+In memory each task is a Task: a mapping with the same keys as its JSON
+object, stored in slots instead of a per-task dict.
+
+A task's ``subtasks`` are Subtasks: a tuple of Subtask nodes, each with
+its own done state and deadline and subtasks of its own, saved as nested
+JSON objects.  Nodes are never changed in place, so the ``(done, total)``
+roll-up of a tuple is worked out once, when it is built.  Older files
+kept subtasks as one free-text string, which is split into subtasks when
+the task is loaded.
+"""
+import json
+import re
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from sys import intern
+
+DEADLINE_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+                    '%d.%m.%Y', '%d/%m/%y', '%d %b %Y', '%d %B %Y', '%b %d %Y', '%B %d %Y')
+RELATIVE_DAYS = {'today': 0, 'tomorrow': 1}
+FIELDS = ('id', 'text', 'done', 'priority', 'deadline', 'due', 'subtasks')
+FIELD_SET = frozenset(FIELDS)
+INTERNED = frozenset({'priority', 'deadline'})    # few distinct values, shared between tasks
+COUNT_FIELDS = ('total', 'done', 'priorities', 'dues')
+SUBTASK_FIELDS = ('id', 'text', 'done', 'deadline', 'due', 'children')
+SUBTASK_SEPARATORS = re.compile(r'[\n;,]')   # between the items of an old subtasks string
+
+
+class Task:
+    """One task, used like the dict it is saved as.
+
+    The known fields live in slots, so a task costs a fraction of a dict.
+    A slot that was never set is a missing key, and any other keys go to
+    a dict that only tasks which have them allocate, so converting to and
+    from JSON loses nothing.  Priority and deadline strings are interned.
+    Tasks compare by identity, which keeps ``list.remove`` cheap.
+    """
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, fields=(), **kwargs):
+        self._extra = None
+        self.update(fields, **kwargs)
+
+    def __getitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        self.update(((key, value),))
+
+    def __delitem__(self, key):
+        if key in FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, fields=(), **kwargs):
+        if isinstance(fields, dict):
+            pairs = fields.items()
+        elif hasattr(fields, 'keys'):
+            pairs = [(key, fields[key]) for key in fields.keys()]
+        else:
+            pairs = fields
+        # Inlined rather than calling __setitem__: this runs for every loaded task
+        for pairs in (pairs, kwargs.items()):
+            for key, value in pairs:
+                if key in FIELD_SET:
+                    if key in INTERNED and type(value) is str:
+                        value = intern(value)
+                    elif key == 'subtasks' and type(value) is not Subtasks:
+                        value = to_subtasks(value)
+                    setattr(self, key, value)
+                elif self._extra is None:
+                    self._extra = {key: value}
+                else:
+                    self._extra[key] = value
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def encode_task(obj):
+    """``default`` hook that lets json.dump write Task objects."""
+    if isinstance(obj, (Task, Subtask)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def normalize_task(task):
+    """Convert one saved task, or an old plain string task, to a Task."""
+    if isinstance(task, str):
+        return Task(text=task, done=False, deadline='', subtasks='')
+    return Task(task)
+
+
+def normalize_tasks(tasks):
+    """Convert saved tasks, including old plain strings, to Task objects."""
+    if not isinstance(tasks, list):
+        return []
+    return [normalize_task(t) for t in tasks]
+
+
+def index_tasks(tasks):
+    """Return an ``id -> task`` index, assigning ids where they are missing.
+
+    Tasks without an id, or whose id is already taken, get a fresh one.
+    """
+    index = {}
+    unassigned = []
+    for task in tasks:
+        task_id = task.get('id')
+        if type(task_id) is int and task_id not in index:
+            index[task_id] = task
+        else:
+            unassigned.append(task)
+    next_id = max(index, default=0) + 1
+    for task in unassigned:
+        task['id'] = next_id
+        index[next_id] = task
+        next_id += 1
+    return index
+
+
+def next_task_id(index):
+    return max(index, default=0) + 1
+
+
+def parse_deadline(text):
+    """Return the deadline in `text` as a timestamp, or None if it is not a date.
+
+    A date without a time is due at the end of that day.
+    """
+    text = ' '.join(text.replace(',', ' ').split())
+    if not text:
+        return None
+    days = RELATIVE_DAYS.get(text.lower())
+    if days is not None:
+        day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return (day + timedelta(days=days + 1)).timestamp() - 1
+    for fmt in DEADLINE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if '%H' not in fmt:
+            parsed += timedelta(days=1, seconds=-1)
+        return parsed.timestamp()
+    return None
+
+
+def fill_due(tasks):
+    """Parse the deadline of tasks saved before ``due`` existed."""
+    for task in tasks:
+        if 'due' not in task:
+            task['due'] = parse_deadline(task.get('deadline', ''))
+
+
+def is_overdue(due, now=None):
+    return due is not None and due < (time.time() if now is None else now)
+
+
+class DueIndex:
+    """The open tasks of one list that have a due date, soonest first.
+
+    Entries are ``(due, id)`` pairs kept sorted with bisect.  Callers
+    remove a task before changing its ``due`` or ``done`` and add it back
+    afterwards.
+    """
+
+    def __init__(self, tasks=()):
+        self.entries = sorted((t['due'], t['id']) for t in tasks
+                              if t.get('due') is not None and not t['done'])
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, task):
+        if task.get('due') is not None and not task['done']:
+            insort(self.entries, (task['due'], task['id']))
+
+    def add_all(self, tasks):
+        """Add many tasks with one merge rather than an insort each."""
+        new = sorted((t['due'], t['id']) for t in tasks if t.get('due') is not None and not t['done'])
+        # Sorting sees two sorted runs and merges them in linear time
+        self.entries += new
+        self.entries.sort()
+
+    def remove(self, task):
+        if task.get('due') is None:
+            return
+        entry = (task['due'], task['id'])
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+
+class ListCounts:
+    """Running totals of one list, cheap enough to keep for every list.
+
+    Besides the task and done counts it holds the open tasks per priority
+    ('' for none) and per due timestamp, so the number overdue can be
+    worked out at any time without the tasks.  Like a DueIndex it is kept
+    current by callers: remove a task before changing it and add it back
+    afterwards.  to_dict() gives the form the storage saves.
+    """
+
+    __slots__ = COUNT_FIELDS
+
+    def __init__(self, tasks=()):
+        self.total = self.done = 0
+        self.priorities = {}
+        self.dues = {}
+        for task in tasks:
+            self.add(task)
+
+    @property
+    def open(self):
+        return self.total - self.done
+
+    def add(self, task, n=1):
+        self.total += n
+        if task.get('done'):
+            self.done += n
+            return
+        _bump(self.priorities, task.get('priority') or '', n)
+        due = task.get('due')
+        if due is not None:
+            _bump(self.dues, due, n)
+
+    def remove(self, task):
+        self.add(task, -1)
+
+    def open_with_priority(self, priority):
+        """Return how many open tasks have `priority`, in any letter case."""
+        return sum(n for key, n in self.priorities.items() if key.lower() == priority.lower())
+
+    def overdue(self, now=None):
+        now = time.time() if now is None else now
+        return sum(n for due, n in self.dues.items() if due < now)
+
+    def to_dict(self):
+        # Timestamps cannot be JSON object keys, so dues are saved as pairs
+        return {'total': self.total, 'done': self.done, 'priorities': dict(self.priorities),
+                'dues': sorted(self.dues.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = cls()
+        counts.total, counts.done = data['total'], data['done']
+        counts.priorities = dict(data.get('priorities', {}))
+        counts.dues = {due: n for due, n in data.get('dues', ())}
+        return counts
+
+
+def _bump(counter, key, n):
+    value = counter.get(key, 0) + n
+    if value:
+        counter[key] = value
+    else:
+        del counter[key]
+
+
+class Subtask:
+    """One subtask of a task, or of another subtask.
+
+    Ids are unique within the task.  A subtask is never changed in
+    place; Subtasks.change() copies the nodes on the path to the one
+    that changes, so the old tree stays valid for the undo history and
+    for writes still queued.
+    """
+
+    __slots__ = SUBTASK_FIELDS
+
+    def __init__(self, id, text, done=False, deadline='', due=None, children=()):
+        self.id = id
+        self.text = text
+        self.done = done
+        self.deadline = intern(deadline)
+        self.due = due
+        self.children = children if type(children) is Subtasks else Subtasks(children)
+
+    def __repr__(self):
+        return f"Subtask({self.to_dict()!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Subtask):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in SUBTASK_FIELDS)
+
+    def __hash__(self):
+        return hash((self.id, self.text))
+
+    def replace(self, **fields):
+        """Return a copy with `fields` changed."""
+        values = {key: getattr(self, key) for key in SUBTASK_FIELDS}
+        values.update(fields)
+        return Subtask(**values)
+
+    def to_dict(self):
+        return {'id': self.id, 'text': self.text, 'done': self.done,
+                'deadline': self.deadline, 'due': self.due, 'subtasks': self.children}
+
+
+class Subtasks(tuple):
+    """The subtasks of a task or subtask, in order.
+
+    `progress` is the roll-up ``(done, total)`` over every subtask below,
+    at any depth.  It is summed from the roll-ups of the items when the
+    tuple is built, which is the only time it can change, so showing it
+    costs nothing however deep the tree is.
+    """
+
+    def __new__(cls, items=()):
+        self = super().__new__(cls, items)
+        done = total = 0
+        for item in self:
+            below_done, below_total = item.children.progress
+            done += item.done + below_done
+            total += 1 + below_total
+        self.progress = (done, total)
+        return self
+
+    def __repr__(self):
+        return f"Subtasks({list(self)!r})"
+
+    def find(self, subtask_id):
+        """Return the subtask with `subtask_id` at any depth, or None."""
+        for item in self:
+            if item.id == subtask_id:
+                return item
+            found = item.children.find(subtask_id)
+            if found is not None:
+                return found
+        return None
+
+    def walk(self):
+        """Yield every subtask below, parents before their children."""
+        for item in self:
+            yield item
+            yield from item.children.walk()
+
+    def change(self, subtask_id, change):
+        """Return a copy with ``change(subtask)`` in place of the subtask `subtask_id`.
+
+        `change` returns the new subtask, or None to remove it.  Only the
+        tuples on the path to it are rebuilt; if there is no such subtask
+        the same tuple is returned.
+        """
+        for i, item in enumerate(self):
+            if item.id == subtask_id:
+                new = change(item)
+                return Subtasks(self[:i] + ((new,) if new is not None else ()) + self[i + 1:])
+            children = item.children.change(subtask_id, change)
+            if children is not item.children:
+                return Subtasks(self[:i] + (item.replace(children=children),) + self[i + 1:])
+        return self
+
+    def add(self, subtask, parent_id=None):
+        """Return a copy with `subtask` added last under `parent_id`, or at the top."""
+        if parent_id is None:
+            return Subtasks(self + (subtask,))
+        return self.change(parent_id, lambda parent: parent.replace(
+            children=Subtasks(parent.children + (subtask,))))
+
+    def next_id(self):
+        return max((item.id for item in self.walk()), default=0) + 1
+
+
+NO_SUBTASKS = Subtasks()
+
+
+def to_subtasks(value):
+    """Return `value` as Subtasks.
+
+    `value` may be Subtasks, a list of subtasks as saved (dicts, or plain
+    strings for just the text), or text.  Text holding such a list as
+    JSON is read as one; any other text is the old free-form field and
+    becomes a subtask per line, comma or semicolon.  Subtasks without an
+    id, or whose id is already taken, get a fresh one.
+    """
+    if type(value) is Subtasks:
+        return value
+    if not value:
+        return NO_SUBTASKS
+    if isinstance(value, str):
+        if value.lstrip().startswith('['):
+            try:
+                return to_subtasks(json.loads(value))
+            except (ValueError, TypeError):
+                pass
+        value = [part.strip() for part in SUBTASK_SEPARATORS.split(value) if part.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise TypeError(f"subtasks must be a list or text, not {type(value).__name__}")
+    return _build_subtasks(value, set(), [_max_subtask_id(value) + 1])
+
+
+def _max_subtask_id(items):
+    highest = 0
+    for item in items:
+        if isinstance(item, dict):
+            if type(item.get('id')) is int:
+                highest = max(highest, item['id'])
+            highest = max(highest, _max_subtask_id(item.get('subtasks') or ()))
+        elif isinstance(item, Subtask):
+            highest = max(highest, item.id, _max_subtask_id(item.children))
+    return highest
+
+
+def _build_subtasks(items, seen, next_id):
+    built = []
+    for item in items:
+        if isinstance(item, Subtask):
+            item = item.to_dict()
+        elif isinstance(item, str):
+            item = {'text': item}
+        elif not isinstance(item, dict):
+            raise TypeError(f"a subtask must be an object or text, not {type(item).__name__}")
+        text, deadline = item.get('text', ''), item.get('deadline') or ''
+        if not isinstance(text, str) or not isinstance(deadline, str):
+            raise TypeError("subtask text and deadline must be text")
+        subtask_id = item.get('id')
+        if type(subtask_id) is not int or subtask_id in seen:
+            subtask_id = next_id[0]
+            next_id[0] += 1
+        seen.add(subtask_id)
+        due = item['due'] if 'due' in item else parse_deadline(deadline)
+        children = _build_subtasks(item.get('subtasks') or (), seen, next_id)
+        built.append(Subtask(subtask_id, text, bool(item.get('done')), deadline, due, children))
+    return Subtasks(built) if built else NO_SUBTASKS
+
+
+def dump_subtasks(subtasks):
+    """Return `subtasks` as the JSON text the SQLite and CSV formats keep ('' for none)."""
+    if isinstance(subtasks, str):
+        return subtasks
+    if not subtasks:
+        return ''
+    return json.dumps(subtasks, default=encode_task, ensure_ascii=False)
+
+
+def subtask_words(subtasks):
+    """Return the text of every subtask at any depth, for searching."""
+    if isinstance(subtasks, str):
+        subtasks = to_subtasks(subtasks)
+    elif type(subtasks) is not Subtasks:
+        subtasks = to_subtasks(subtasks or ())
+    return ' '.join(item.text for item in subtasks.walk())
@@ -0,0 +1,572 @@
+"""Windowed rendering of task rows into a ttk.Treeview.
+
+Only the rows around the viewport (plus an overscan buffer on each side)
+are ever inserted into the Treeview.  The scrollbar is driven from the full
+row count, so render cost depends on the viewport size, not the list length.
+
+Each row is keyed by its task identity.  Updating the rows reconciles the
+held window against the Treeview with the minimal number of insert, delete,
+move and item(values=...) calls, so a single change touches a single row.
+
+Rows can have child rows (subtasks).  Those are made only when their
+parent is expanded, and go into the flat row list right after it, so the
+window covers them like any other row; the Treeview holds them as real
+children, plus the parents of the first row when the window starts
+inside an expanded tree.  A collapsed row with children gets one
+placeholder child so that Tk draws its expander.
+
+Nothing touches the Treeview while rows change, scroll or get selected:
+the view is marked stale and brought up to date by a FrameScheduler at
+most once per frame, so a held-down key costs one redraw per frame
+rather than one per key event.
+"""
+import time
+from bisect import bisect_left
+
+import perf
+
+OVERSCAN = 20
+ROW_HEIGHT = 25  # Matches the Cotton.Treeview rowheight
+FRAME_MS = 16   # shortest time between two updates of the Treeview
+EXTEND_MASK = 0x1 | 0x4     # Shift and Control in a Tk event's state
+# With `locate`, rows are looked up one by one unless more than this
+# fraction of them is wanted, when one pass over all rows is cheaper
+LOOKUP_FRACTION = 1 / 32
+PLACEHOLDER = ':more'   # iid suffix of the child that gives a collapsed row its expander
+
+
+def stable_positions(seq):
+    """Return the indices of a longest increasing subsequence of `seq`."""
+    tails, tail_idx, prev = [], [], [None] * len(seq)
+    for i, value in enumerate(seq):
+        j = bisect_left(tails, value)
+        if j == len(tails):
+            tails.append(value)
+            tail_idx.append(i)
+        else:
+            tails[j] = value
+            tail_idx[j] = i
+        prev[i] = tail_idx[j - 1] if j else None
+    keep = set()
+    i = tail_idx[-1] if tail_idx else None
+    while i is not None:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+
+class FrameScheduler:
+    """Runs requested callbacks together, at most once per frame.
+
+    A callback requested several times before the frame runs is run
+    once, in the order it was first requested.  The first request after
+    a quiet spell runs as soon as Tk is idle; later ones wait for the
+    rest of the frame.
+    """
+
+    def __init__(self, widget, frame_ms=FRAME_MS):
+        self.widget = widget
+        self.frame = frame_ms / 1000
+        self.pending = {}       # callback -> None: an ordered set
+        self.scheduled = False
+        self.handle = None      # the after() call that will run them
+        self.last = float('-inf')
+
+    def request(self, callback):
+        perf.count('frame requests')
+        self.pending[callback] = None
+        if not self.scheduled:
+            self.scheduled = True
+            wait = self.last + self.frame - time.perf_counter()
+            if wait > 0:
+                self.handle = self.widget.after(max(1, round(wait * 1000)), self._run)
+            else:
+                self.handle = self.widget.after_idle(self._run)
+
+    def flush(self):
+        """Run what is pending now rather than at the next frame."""
+        if self.scheduled:
+            self.widget.after_cancel(self.handle)
+        self._run()
+
+    def _run(self):
+        self.scheduled = False
+        self.last = time.perf_counter()
+        # Callbacks may request more; those wait for the next frame
+        pending, self.pending = self.pending, {}
+        if pending:
+            perf.count('frames')
+        for callback in pending:
+            callback()
+
+
+class TaskView:
+    """Rows shown through a Treeview window.
+
+    For nested rows pass `children` (row -> its child rows), `has_children`
+    and `parent` (row -> its parent row, None at the top).  `locate`
+    (iid -> index in the rows given to set_rows, or None) lets index()
+    find top-level rows without scanning them.  Updates go through
+    `scheduler`, which may be shared with other per-frame work.
+    """
+
+    def __init__(self, tree, scrollbar, format_row, key=id, overscan=OVERSCAN,
+                 row_height=ROW_HEIGHT, children=None, has_children=None, parent=None,
+                 locate=None, scheduler=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.key = key
+        self.overscan = overscan
+        self.row_height = row_height
+        self.children = children
+        self.has_children = has_children
+        self.parent = parent
+        self.locate = locate
+        self.scheduler = scheduler or FrameScheduler(tree)
+
+        self.roots = []              # the rows given to set_rows
+        self.rows = []               # those and the child rows of expanded ones
+        self.top = 0                 # index of the first row in the viewport
+        self.visible = 20            # rows that fit in the viewport
+        self.start = self.end = 0    # rows currently held by the Treeview
+        self.held = []               # iids in the Treeview, in display order
+        self.selected = set()        # selected iids (may be off-window)
+        self._values = {}            # iid -> values last written to the Treeview
+        self._positions = None       # iid -> row index, built on demand
+        self._rendering = False
+        self._stale = False          # the window must be rendered again
+        self._cursor = None          # (row index or None, iid) of the row selected last
+        self._focus = None           # iid to give the Treeview focus to
+        self._shown = set()          # the selection last given to the Treeview
+        self._extending = False      # the last click or key held Shift or Control
+
+        self.expanded = {}           # iid -> row, for rows showing their children
+        self._expanded_at = []       # indexes in `roots` of the expanded top-level rows
+        self._shift = []             # child rows shown up to and including each of those
+        self._child_positions = {}   # iid -> row index, for child rows
+        self._lead = 0               # parents held above the window
+        self._parents = {}           # held iid -> parent iid ('' at the top)
+        self._open = set()           # held iids open in the Treeview
+        self._placeholders = set()   # held iids given a placeholder child
+
+        scrollbar.configure(command=self.yview)
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        tree.bind('<Configure>', self._on_configure, add='+')
+        tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        tree.bind('<ButtonPress-1>', self._on_press, add='+')
+        tree.bind('<KeyPress>', self._on_press, add='+')
+        if children is not None:
+            tree.bind('<<TreeviewOpen>>', self._on_open, add='+')
+            tree.bind('<<TreeviewClose>>', self._on_close, add='+')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def iid(self, row):
+        return str(self.key(row))
+
+    def set_rows(self, rows, reset=False):
+        """Show `rows`; keep the scroll position and expanded rows unless `reset` is set."""
+        if reset:
+            self.top = 0
+            self.selected.clear()
+            self.expanded.clear()
+        self.roots = rows
+        self.rows = self._flatten(rows)
+        self._positions = None
+        self.top = self._clamp(self.top)
+        self._invalidate()
+
+    def flush(self):
+        """Bring the Treeview up to date now rather than at the next frame."""
+        self.scheduler.flush()
+
+    def _invalidate(self, render=True):
+        """Update the Treeview at the next frame; re-render the window if `render`."""
+        self._stale = self._stale or render
+        self.scheduler.request(self._update)
+
+    def _update(self):
+        if self._stale:
+            self._stale = False
+            self._render()
+        else:
+            self._position()
+        self._show_selection()
+
+    def _show_selection(self):
+        shown = [iid for iid in self.held if iid in self.selected]
+        self._shown = set(shown)
+        if set(self.tree.selection()) != self._shown:
+            self.tree.selection_set(shown)
+        if self._focus is not None and self._focus in self._values:
+            self.tree.focus(self._focus)
+            self._focus = None
+
+    def _root_index(self, iid, row=None):
+        """Return the index in `roots` of top-level row `iid`, or None."""
+        roots = self.roots
+        if self.locate is not None:
+            i = self.locate(iid)
+            return i if i is not None and i < len(roots) and self.iid(roots[i]) == iid else None
+        try:
+            return roots.index(row) if row is not None else None
+        except ValueError:
+            return None
+
+    def _flatten(self, roots):
+        """Return `roots` with the shown child rows of each expanded row after it."""
+        self._expanded_at, self._shift, self._child_positions = [], [], {}
+        if not self.expanded:
+            return roots
+        found = []
+        for iid, row in list(self.expanded.items()):
+            if self.parent(row) is not None:
+                continue    # reached through its top-level row
+            i = self._root_index(iid, row)
+            if i is None:
+                del self.expanded[iid]
+            else:
+                found.append(i)
+        if not found:
+            return roots
+        rows, last = [], 0
+        for i in sorted(found):
+            rows += roots[last:i + 1]
+            for child in self._descendants(roots[i]):
+                self._child_positions[self.iid(child)] = len(rows)
+                rows.append(child)
+            last = i + 1
+            self._expanded_at.append(i)
+            self._shift.append(len(rows) - last)
+        rows += roots[last:]
+        return rows
+
+    def _descendants(self, row):
+        for child in self.children(row):
+            yield child
+            iid = self.iid(child)
+            if iid in self.expanded:
+                self.expanded[iid] = child
+                yield from self._descendants(child)
+
+    def _position_map(self):
+        if self._positions is None:
+            self._positions = {self.iid(row): i for i, row in enumerate(self.rows)}
+        return self._positions
+
+    def positions(self, iids):
+        """Return ``(display index, iid)`` for those of `iids` that are shown, in display order."""
+        if self.locate is None or len(iids) > len(self.rows) * LOOKUP_FRACTION:
+            positions = self._position_map()
+            found = [(positions[iid], iid) for iid in iids if iid in positions]
+        else:
+            found = [(i, iid) for i, iid in zip(map(self.index, iids), iids) if i is not None]
+        found.sort()
+        return found
+
+    def index(self, iid):
+        """Return the display index of row `iid`, or None if it is not shown."""
+        if self.locate is None:
+            return self._position_map().get(iid)
+        position = self._child_positions.get(iid)
+        if position is not None:
+            return position
+        i = self._root_index(iid)
+        if i is None:
+            return None
+        k = bisect_left(self._expanded_at, i)
+        return i + (self._shift[k - 1] if k else 0)
+
+    def expand(self, iid, expand=True):
+        """Show or hide the child rows of row `iid`."""
+        if expand == (iid in self.expanded):
+            return
+        if expand:
+            position = self.index(iid)
+            if position is None:
+                return
+            self.expanded[iid] = self.rows[position]
+        else:
+            del self.expanded[iid]
+        self.set_rows(self.roots)
+
+    # Selection and navigation
+
+    def selection(self):
+        """Return the selected iids in display order.
+
+        A selected row may since have been removed; callers resolve iids
+        against their own data.
+        """
+        if len(self.selected) < 2:
+            return list(self.selected)
+        return [iid for _, iid in self.positions(self.selected)]
+
+    def select(self, index):
+        if not 0 <= index < len(self.rows):
+            return
+        iid = self.iid(self.rows[index])
+        self.selected = {iid}
+        self._cursor = (index, iid)
+        self._focus = iid
+        self.see(index)
+        self._invalidate(render=False)
+
+    def select_rows(self, rows):
+        """Select `rows`, which may lie outside the held window, and show the first."""
+        self.selected = {self.iid(row) for row in rows}
+        shown = self.positions(self.selected)
+        if shown:
+            self._cursor = shown[0]
+            self.see(shown[0][0])
+        self._invalidate(render=False)
+
+    def cursor(self):
+        """Return the display index of the row selected last, or None.
+
+        The index is remembered, so stepping from row to row costs the
+        same on any list; it is looked up again only after the rows change.
+        """
+        if self._cursor is None or self._cursor[1] not in self.selected:
+            shown = self.positions(self.selected)
+            if not shown:
+                return None
+            self._cursor = shown[0]
+        index, iid = self._cursor
+        if index is None or index >= len(self.rows) or self.iid(self.rows[index]) != iid:
+            index = self.index(iid)
+            if index is None:
+                return None
+            self._cursor = (index, iid)
+        return index
+
+    def step(self, offset):
+        """Select the row `offset` rows from the cursor; from the first or last row if none is."""
+        index = self.cursor()
+        if index is None:
+            index = -1 if offset > 0 else len(self.rows)
+        self.select(max(0, min(index + offset, len(self.rows) - 1)))
+
+    def see(self, index):
+        """Scroll so that row `index` is inside the viewport."""
+        if index < self.top:
+            self._scroll_to(index)
+        elif index >= self.top + self.visible:
+            self._scroll_to(index - self.visible + 1)
+
+    # Scrolling
+
+    def yview(self, *args):
+        """Scrollbar command: translate moveto/scroll into a new top row."""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible
+            self._scroll_to(self.top + step)
+
+    def _clamp(self, top):
+        return max(0, min(top, len(self.rows) - self.visible))
+
+    def _scroll_to(self, top):
+        self.top = self._clamp(top)
+        self._invalidate(render=not self._covers(self.top))
+
+    def _covers(self, top):
+        """True if the held rows cover the viewport with some overscan left."""
+        margin = self.overscan // 2
+        if top < self.start or (top - self.start < margin and self.start > 0):
+            return False
+        bottom = top + self.visible
+        return bottom <= self.end and (self.end - bottom >= margin or self.end == len(self.rows))
+
+    @perf.timed
+    def _render(self):
+        """Reconcile the Treeview with the window around `self.top`."""
+        self._rendering = True
+        try:
+            self.start = max(0, self.top - self.overscan)
+            self.end = min(len(self.rows), self.top + self.visible + self.overscan)
+            window = self.rows[self.start:self.end]
+            self._lead = 0
+            if window and self.parent is not None:
+                # A window that starts inside a tree holds the parents above it
+                lead, parent = [], self.parent(window[0])
+                while parent is not None:
+                    lead.append(parent)
+                    parent = self.parent(parent)
+                window[:0] = lead[::-1]
+                self._lead = len(lead)
+            self._reconcile([self.iid(row) for row in window], window)
+        finally:
+            self._rendering = False
+        self._position()
+
+    def _reconcile(self, wanted, window):
+        tree = self.tree
+        wanted_pos = {iid: i for i, iid in enumerate(wanted)}
+        nested = self.children is not None
+        if nested:
+            parents = [self._parent_iid(row) for row in window]
+            # A row now under another parent is made again there, and
+            # deleting a row deletes everything the Treeview has under it
+            gone = set()
+            for iid in self.held:
+                i = wanted_pos.get(iid)
+                parent = self._parents[iid]
+                if i is None or parents[i] != parent or parent in gone:
+                    gone.add(iid)
+            stale = [iid for iid in self.held if iid in gone]
+            doomed = [iid for iid in stale if self._parents[iid] not in gone]
+        else:
+            parents = None
+            stale = doomed = [iid for iid in self.held if iid not in wanted_pos]
+        if stale:
+            tree.delete(*doomed)
+            for iid in stale:
+                del self._values[iid]
+            if nested:
+                for iid in stale:
+                    del self._parents[iid]
+                    self._open.discard(iid)
+                    self._placeholders.discard(iid)
+        gone = set(stale)
+        held = [iid for iid in self.held if iid not in gone]
+
+        if nested:
+            placeholders = {iid for iid, row in zip(wanted, window)
+                            if iid not in self.expanded and self.has_children(row)}
+            unneeded = [iid for iid in self._placeholders if iid not in placeholders]
+            if unneeded:
+                tree.delete(*(iid + PLACEHOLDER for iid in unneeded))
+                self._placeholders.difference_update(unneeded)
+
+        # Rows outside the longest already-ordered run are detached and
+        # reattached at their new index; everything else stays put.
+        keep = stable_positions([wanted_pos[iid] for iid in held])
+        moved = {iid for i, iid in enumerate(held) if i not in keep}
+        if moved:
+            tree.detach(*moved)
+
+        inserted = updated = 0
+        placed = {}     # parent iid -> children placed under it so far
+        for i, (iid, row) in enumerate(zip(wanted, window)):
+            values = self.format_row(row)
+            if nested:
+                parent = parents[i]
+                index = placed.get(parent, 0)
+                placed[parent] = index + 1
+            else:
+                parent, index = '', i
+            if iid in moved:
+                tree.move(iid, parent, index)
+            elif iid not in self._values:
+                tree.insert(parent, index, iid=iid, values=values)
+                self._values[iid] = values
+                if nested:
+                    self._parents[iid] = parent
+                inserted += 1
+            if self._values[iid] != values:
+                tree.item(iid, values=values)
+                self._values[iid] = values
+                updated += 1
+        if nested:
+            self._show_expanders(wanted, placeholders)
+        if perf.ENABLED:
+            perf.count('treeview rows inserted', inserted)
+            perf.count('treeview rows updated', updated)
+            perf.count('treeview rows moved', len(moved))
+            perf.count('treeview rows deleted', len(stale))
+
+        self.held = wanted
+
+    def _parent_iid(self, row):
+        parent = self.parent(row)
+        return '' if parent is None else self.iid(parent)
+
+    def _show_expanders(self, wanted, placeholders):
+        """Open the expanded rows and give collapsed rows with children a placeholder."""
+        tree = self.tree
+        for iid in wanted:
+            is_open = iid in self.expanded
+            if is_open != (iid in self._open):
+                tree.item(iid, open=is_open)
+                if is_open:
+                    self._open.add(iid)
+                else:
+                    self._open.discard(iid)
+            if iid in placeholders and iid not in self._placeholders:
+                tree.insert(iid, 'end', iid=iid + PLACEHOLDER)
+                self._placeholders.add(iid)
+
+    def _position(self):
+        """Scroll the Treeview so that `self.top` is its first visible row."""
+        held = self.end - self.start + self._lead
+        if held:
+            # The quarter-row bias keeps Tk's rounding on the intended row
+            self.tree.yview_moveto((self.top - self.start + self._lead + 0.25) / held)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / total, (self.top + self.visible) / total)
+
+    # Treeview callbacks
+
+    def _on_tree_scroll(self, first, last):
+        """The Treeview scrolled itself (mouse wheel, keyboard, see())."""
+        held = self.end - self.start + self._lead
+        if not held:
+            self._update_scrollbar()
+            return
+        top = self._clamp(self.start - self._lead + int(float(first) * held + 0.5))
+        if top == self.top:
+            self._update_scrollbar()
+            return
+        self.top = top
+        if self._covers(top):
+            self._update_scrollbar()
+        else:
+            self._invalidate()
+
+    def _on_configure(self, event):
+        visible = max(1, event.height // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self._scroll_to(self.top)
+
+    def _on_select(self, event):
+        current = set(self.tree.selection())
+        # The event for a selection this view made arrives after it; a
+        # key press since may have moved the selection on already
+        if self._rendering or current == self._shown:
+            return
+        if self._extending:
+            # Shift or Control adds to the selection: rows outside the
+            # held window keep their selection state
+            held = set(self.held)
+            self.selected = {iid for iid in self.selected if iid not in held} | current
+        else:
+            self.selected = current
+        self._shown = current
+        focus = self.tree.focus()
+        if focus in self.selected:
+            self._cursor = (None, focus)
+
+    def _on_press(self, event):
+        self._extending = bool(event.state & EXTEND_MASK)
+
+    def _on_open(self, event):
+        # Tk focuses the row it opens or closes before sending the event
+        self.expand(self.tree.focus())
+
+    def _on_close(self, event):
+        self.expand(self.tree.focus(), False)
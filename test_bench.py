@@ -0,0 +1,19 @@
+import json
+
+import bench
+
+
+def test_benchmarks_save_and_compare_a_baseline(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    args = ['--sizes', '50', '--repeat', '1', '--case', 'load', '--case', 'toggle',
+            '--data', str(tmp_path / 'data')]
+    assert bench.main(args + ['--save-baseline', str(baseline)]) == 0
+    results = json.loads(baseline.read_text(encoding='utf-8'))['results']
+    assert set(results) == {'json/load/50', 'json/toggle/50', 'sqlite/load/50', 'sqlite/toggle/50'}
+    assert all(r['seconds'] > 0 and r['peak'] > 0 for r in results.values())
+
+    # Generated lists are reused, and nothing counts as a regression against itself
+    capsys.readouterr()
+    assert bench.main(args + ['--compare', str(baseline), '--threshold', '1000']) == 0
+    out = capsys.readouterr().out
+    assert 'generated' not in out and 'REGRESSION' not in out
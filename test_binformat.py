@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+from binformat import read_binary_list, write_binary_list, is_binary
+from storage import JsonStorage, ListJournal, main as storage_main
+from tasks import Task
+
+TASKS = [Task(id=1, text='café', done=True, priority='High', deadline='2030-01-02', due=1893621599.0,
+              subtasks=''),
+         Task(id=2, text='old task without the newer keys', done=False),
+         Task(id=3, text='extras', done=False, deadline='', due=None, tags=['a'], note={'b': 1}),
+         Task(id=4, text='odd values', done=0, priority=None, due=7)]
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_round_trip_is_lossless(compress):
+    out = io.BytesIO()
+    write_binary_list(out, 'wörk', TASKS, compress=compress)
+    assert is_binary(out.getvalue())
+    name, tasks, compressed, generation = read_binary_list(io.BytesIO(out.getvalue()))
+    assert (name, compressed, generation) == ('wörk', compress, None)
+    assert [t.to_dict() for t in tasks] == [t.to_dict() for t in TASKS]
+    assert type(tasks[3]['done']) is int and type(tasks[3]['due']) is int
+
+
+def test_generation_follows_the_records():
+    out = io.BytesIO()
+    write_binary_list(out, 'work', TASKS, compress=True, generation='abc')
+    assert read_binary_list(io.BytesIO(out.getvalue()))[3] == 'abc'
+
+
+def test_convert_keeps_lists_and_journals_working(tmp_path, capsys):
+    ListJournal(tmp_path / 'work.json').write_snapshot('work', TASKS)
+    storage_main(['convert', str(tmp_path), '--to', 'zlib'])
+    assert is_binary((tmp_path / 'work.json').read_bytes())
+
+    storage = JsonStorage(tmp_path)
+    assert storage.list_entries() == {'work': {'total': 4, 'done': 1, 'priorities': {'': 3},
+                                               'dues': [[7, 1]]}}
+    storage.write_records('work', [{'op': 'set', 'id': 2, 'fields': {'done': True}}])
+    storage.commit(['work'])
+    journal = ListJournal(tmp_path / 'work.json')
+    _, tasks, _ = journal.load()
+    assert journal.format == 'zlib' and tasks[1]['done'] is True
+
+    storage_main(['convert', str(tmp_path), '--to', 'json'])
+    assert (tmp_path / 'work.json').read_text(encoding='utf-8').startswith('{\n  "name": "work"')
+    _, tasks, _ = ListJournal(tmp_path / 'work.json').load()
+    expected = [t.to_dict() for t in TASKS]
+    expected[1].update(done=True, due=None)     # loading parses the missing due date
+    assert [t.to_dict() for t in tasks] == expected
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+import cli
+from bulk import read_tasks, validate, write_tasks
+from store import TodoStore
+
+
+def test_validate_normalizes_records_to_the_task_schema():
+    assert validate({'text': ' a ', 'done': 'Yes', 'priority': 'high', 'deadline': None, 'x': 1}) == \
+        {'text': 'a', 'done': True, 'priority': 'High', 'deadline': '', 'subtasks': ()}
+    for record, message in (({'text': ' '}, 'missing text'), ({'text': 'a', 'done': 'maybe'}, 'done'),
+                            ({'text': 'a', 'priority': 'urgent'}, 'priority'),
+                            ({'text': 'a', 'subtasks': 3}, 'subtasks'), ([], 'object')):
+        with pytest.raises(ValueError, match=message):
+            validate(record)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_bad_records_are_reported_by_line_and_skipped(fmt):
+    data = {'csv': 'text,done\nok,false\n,true\n"two\nlines",1\n',
+            'ndjson': '{"text": "ok"}\n\n{"text": ""}\nnot json\n{"text": "two\\nlines", "done": 1}\n'}[fmt]
+    errors = []
+    tasks = list(read_tasks(io.StringIO(data), fmt, lambda line, message: errors.append(line)))
+    assert [(t['text'], t['done']) for t in tasks] == [('ok', False), ('two\nlines', True)]
+    assert errors == ([3] if fmt == 'csv' else [3, 4])
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_export_and_import_round_trip_in_batches(tmp_path, store, capsys, fmt):
+    storage = str(tmp_path / 'lists')
+    store.create_list('src')
+    store.add_tasks('src', [{'text': f'task, "{i}"', 'done': i % 2 == 1, 'priority': 'Low',
+                             'deadline': '2030-01-01' if i % 3 else '', 'subtasks': 'é'} for i in range(7)])
+    store.close()
+
+    path = str(tmp_path / f'out.{fmt}')
+    assert cli.main(['--storage', storage, 'export', 'src', path]) is None
+    assert cli.main(['--storage', storage, 'import', 'dst', path, '--batch-size', '3']) is None
+    assert 'Imported 7 task(s)' in capsys.readouterr().out
+
+    store = TodoStore(storage, delay=0)
+    store.open()
+    fields = ('text', 'done', 'priority', 'deadline', 'subtasks', 'due')
+    assert [[t[k] for k in fields] for t in store.load('dst')['tasks']] == \
+        [[t[k] for k in fields] for t in store.load('src')['tasks']]
+    assert store.lists['dst']['counts'].done == 3
+    store.close()
+
+
+def test_text_export_writes_one_line_per_task():
+    out = io.StringIO()
+    assert write_tasks(out, [{'text': 'a'}, {'text': 'b'}], 'text') == 2
+    assert out.getvalue() == 'a\nb\n'
@@ -0,0 +1,27 @@
+from history import History, Step
+
+
+def step(cost):
+    return Step(('undo',), ('redo',), ('list', 'list'), cost=cost)
+
+
+def test_oldest_steps_are_dropped_over_the_budget():
+    history = History(budget=250)
+    steps = [step(100) for _ in range(4)]
+    for s in steps:
+        history.record(s)
+    assert list(history.undo_steps) == steps[2:] and history.size == 200
+    big = step(1000)
+    history.record(big)     # kept on its own even though it is over the budget
+    assert list(history.undo_steps) == [big]
+
+
+def test_a_new_change_discards_the_redo_steps():
+    history = History()
+    first, second = step(10), step(10)
+    history.record(first)
+    history.record(second)
+    assert history.undo() is second and history.redo() is second
+    assert history.undo() is second
+    history.record(step(10))
+    assert not history.can_redo() and history.size == 20
@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+from jsonstream import read_list_file, write_list_file
+from tasks import Task, encode_task
+
+TASKS = [{'id': 1, 'text': 'café "quoted" \\ line\nbreak', 'done': False, 'deadline': '', 'subtasks': ''},
+         'old string task',
+         {'id': 12345, 'text': 'b', 'done': True, 'due': 1741219199.0, 'tags': ['x', {'y': []}], 'n': None}]
+
+
+@pytest.mark.parametrize('tasks', [TASKS, []])
+def test_writer_matches_json_dump_byte_for_byte(tasks):
+    out = io.StringIO()
+    write_list_file(out, 'wörk', iter(tasks), chunk_size=10)
+    assert out.getvalue() == json.dumps({'name': 'wörk', 'tasks': tasks}, indent=2)
+
+
+def test_writer_encodes_task_objects_like_json_dump():
+    tasks = [Task(id=1, text='x', done=True, priority='High', due=None), {}, Task(id=2, extra=[1])]
+    out = io.StringIO()
+    write_list_file(out, 'n', tasks, default=encode_task)
+    assert out.getvalue() == json.dumps({'name': 'n', 'tasks': tasks}, indent=2, default=encode_task)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_reader_yields_tasks_across_chunk_boundaries(chunk_size):
+    for text in (json.dumps({'name': 'work', 'tasks': TASKS}, indent=2),
+                 json.dumps({'name': 'work', 'tasks': TASKS * 3}, indent=1),   # defeats batching
+                 json.dumps({'tasks': TASKS, 'name': 'work', 'extra': 12}),
+                 '{"name": "empty", "tasks": [ ]}'):
+        seen = []
+        members = read_list_file(io.StringIO(text), seen.append, chunk_size=chunk_size)
+        expected = json.loads(text)
+        assert seen == expected.pop('tasks') and members == expected
+
+
+def test_reader_rejects_truncated_files():
+    text = json.dumps({'name': 'work', 'tasks': TASKS}, indent=2)
+    with pytest.raises(ValueError):
+        read_list_file(io.StringIO(text[:-10]), lambda task: None, chunk_size=16)
@@ -0,0 +1,79 @@
+from ordering import TaskOrder
+
+
+def make(task_id, text, done=False, priority='', due=None):
+    return {'id': task_id, 'text': text, 'done': done, 'priority': priority,
+            'deadline': '', 'due': due, 'subtasks': ''}
+
+
+def texts(order):
+    return [t['text'] for t in order.rows]
+
+
+def test_done_tasks_sort_last_and_keep_manual_order():
+    tasks = [make(1, 'a', done=True), make(2, 'b'), make(3, 'c')]
+    order = TaskOrder(tasks)
+    assert texts(order) == ['b', 'c', 'a']
+    assert [t['text'] for t in tasks] == ['a', 'b', 'c']  # the stored list is untouched
+
+    tasks[1]['done'] = True
+    assert order.update(tasks[1]) == 2
+    assert texts(order) == ['c', 'a', 'b']
+
+
+def test_columns_break_ties_by_manual_rank_and_can_reverse():
+    tasks = [make(1, 'b', priority='Low'), make(2, 'a', priority='High'),
+             make(3, 'c', priority='low'), make(4, 'd')]
+    order = TaskOrder(tasks, 'priority')
+    assert texts(order) == ['a', 'b', 'c', 'd']
+    order.sort_by('priority', descending=True)
+    assert texts(order) == ['d', 'b', 'c', 'a']
+    order.sort_by('text')
+    assert texts(order) == ['a', 'b', 'c', 'd']
+
+
+def test_insert_remove_and_swap_keep_the_order_sorted():
+    tasks = [make(1, 'x', due=20.0), make(2, 'y'), make(3, 'z', due=10.0)]
+    order = TaskOrder(tasks, 'deadline')
+    assert texts(order) == ['z', 'x', 'y']
+    new = make(4, 'w', due=15.0)
+    assert order.insert(new) == 1
+    order.forget(tasks[0])
+    assert texts(order) == ['z', 'w', 'y']
+
+    order.sort_by('done')
+    assert texts(order) == ['y', 'z', 'w']
+    assert order.same_group(tasks[1], new)
+    order.swap(tasks[1], new)
+    assert texts(order) == ['w', 'z', 'y']
+    assert order.index(tasks[1]) == 2
+
+
+def test_batches_match_one_task_at_a_time(monkeypatch):
+    tasks = [make(i, 'abcdefgh'[i % 8], done=i % 3 == 0) for i in range(1, 41)]
+    one, batch = TaskOrder(tasks, 'text'), TaskOrder(tasks, 'text')
+    picked = tasks[::3]
+    for task in picked:
+        one.remove(task)
+    monkeypatch.setattr('ordering.BATCH_MIN', 0)
+    batch.remove_all(picked)
+    assert batch.rows == one.rows and batch.keys == one.keys
+
+    for task in picked:
+        task['text'] = 'z' + task['text']
+        one.insert(task)
+    batch.insert_all(picked)
+    assert batch.rows == one.rows and batch.keys == one.keys
+    assert [batch.index(t) for t in tasks] == list(map(one.index, tasks))
+
+
+def test_manual_index_follows_swaps_in_the_saved_list():
+    tasks = [make(i, 'abcdef'[i]) for i in range(6)]
+    order = TaskOrder(tasks, 'text')
+    assert [order.manual_index(tasks, t) for t in tasks] == list(range(6))
+    a, b = tasks[1], tasks[4]
+    tasks[1], tasks[4] = b, a
+    order.swap(a, b)
+    assert order.manual_index(tasks, a) == 4 and order.manual_index(tasks, b) == 1
+    # A list out of rank order is still searched correctly
+    assert order.manual_index(tasks[::-1], tasks[0]) == 5
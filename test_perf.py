@@ -0,0 +1,41 @@
+import json
+
+import perf
+
+
+def test_stats_report_calls_percentiles_and_counters(tmp_path):
+    stats = perf.Stats()
+    for ms in range(1, 101):
+        stats.add_time('load', ms / 1000)
+    stats.count('bytes written', 10)
+    stats.count('bytes written', 5)
+
+    report = stats.snapshot()
+    load = report['timers']['load']
+    assert load['calls'] == 100
+    assert round(load['p50_ms']) == 50 and round(load['p95_ms']) == 95
+    assert round(load['p99_ms']) == 99 and round(load['max_ms']) == 100
+    assert report['counters'] == {'bytes written': 15}
+
+    path = tmp_path / 'stats.json'
+    stats.export(path)
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['timers'] == report['timers'] and saved['counters'] == report['counters']
+
+    stats.reset()
+    assert stats.snapshot() == {'timers': {}, 'counters': {}}
+
+
+def test_timed_only_wraps_when_enabled(monkeypatch):
+    def work(x):
+        return x * 2
+
+    monkeypatch.setattr(perf, 'ENABLED', False)
+    assert perf.timed(work) is work
+
+    monkeypatch.setattr(perf, 'ENABLED', True)
+    monkeypatch.setattr(perf, 'STATS', perf.Stats(samples=2))
+    wrapped = perf.timed(work)
+    assert [wrapped(n) for n in range(3)] == [0, 2, 4]
+    timer = perf.STATS.timers[work.__qualname__]
+    assert timer[0] == 3 and len(timer[2]) == 2     # every call counted, recent ones kept
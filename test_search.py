@@ -0,0 +1,70 @@
+from search import SearchIndex, tokenize
+from storage import BackgroundWriter, JsonStorage, ListJournal
+from store import TodoStore
+
+
+def task(task_id, text, subtasks=''):
+    return {'id': task_id, 'text': text, 'done': False, 'deadline': '', 'subtasks': subtasks}
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize('Buy MILK, eggs!') == ['buy', 'milk', 'eggs']
+
+
+def test_index_follows_records_and_matches_the_last_word_as_prefix(tmp_path):
+    index = SearchIndex(tmp_path / 'search.db')
+    index.write_snapshot('home', [task(1, 'Buy milk'), task(2, 'Buy bread', 'rye, wheat')])
+    index.write_records('work', [{'op': 'add', 'task': task(1, 'Buy a laptop'), 'at': 0}])
+    index.commit({'home', 'work'})
+
+    assert [(n, i) for n, i, _, _ in index.search('buy')] == [('home', 1), ('home', 2), ('work', 1)]
+    assert [(n, i) for n, i, _, _ in index.search('buy l')] == [('work', 1)]
+    assert [(n, i) for n, i, _, _ in index.search('whe')] == [('home', 2)]
+    assert index.search('buy ') == index.search('buy')
+
+    index.write_records('home', [{'op': 'set', 'id': 1, 'fields': {'text': 'Sell milk', 'done': True}},
+                                 {'op': 'remove', 'id': 2}])
+    index.rename('work', 'office', [])
+    index.commit({'home', 'office'})
+    assert index.search('buy') == [('office', 1, 'Buy a laptop', False)]
+    assert index.search('sell') == [('home', 1, 'Sell milk', True)]
+    assert index.stale_lists({'home': {'total': 1}, 'office': {'total': 1}}) == []
+    assert index.stale_lists({'home': {'total': 2}}) == ['home', 'office']
+    assert index.stale_lists({'home': {'total': 1}, 'office': {'total': 1}}, changed={'home'}) == ['home']
+    index.close()
+
+
+def test_writer_keeps_index_in_step_and_reindexes_from_storage(tmp_path):
+    storage = JsonStorage(tmp_path / 'lists')
+    index = SearchIndex(tmp_path / 'search.db')
+    writer = BackgroundWriter(storage, delay=0, index=index)
+    writer.write_snapshot('home', [task(1, 'water plants')])
+    writer.append('home', [{'op': 'add', 'task': task(2, 'water garden'), 'at': 1}])
+    storage.update_counts('home', {'total': 2, 'done': 0, 'priorities': {'': 2}, 'dues': []})
+    writer.delete('gone')
+    assert writer.flush(timeout=5)
+    assert [i for _, i, _, _ in index.search('water')] == [1, 2]
+
+    index.write_snapshot('home', [])
+    index.commit({'home'})
+    writer.reindex('home')
+    writer.reindex('gone')
+    writer.close()
+    assert [i for _, i, _, _ in index.search('water')] == [1, 2]
+    assert index.stale_lists(storage.list_entries()) == []
+    index.close()
+
+
+def test_lists_changed_while_closed_are_reindexed_even_with_the_same_total(tmp_path, store):
+    store.create_list('home')
+    store.add_task('home', 'water plants')
+    store.close()
+    # Another program rewrites the list while the app is closed
+    ListJournal(tmp_path / 'lists' / 'home.json').write_snapshot('home', [task(1, 'feed cat')])
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    store.flush()
+    assert [text for _, _, text, _ in store.search('cat')] == ['feed cat']
+    assert store.search('water') == []
+    store.close()
@@ -0,0 +1,225 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+import storage
+from storage import ListJournal, BackgroundWriter, Manifest, JsonStorage, open_storage, migrate
+
+
+def make_list(path, tasks):
+    journal = ListJournal(path)
+    journal.write_snapshot(path.stem, tasks)
+    return journal
+
+
+def test_journal_is_replayed_on_top_of_snapshot(tmp_path):
+    path = tmp_path / 'work.json'
+    journal = make_list(path, [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}])
+    name, tasks, index = ListJournal(path).load()
+    snapshot = path.read_bytes()
+
+    task = {'id': 2, 'text': 'b', 'done': False, 'deadline': '', 'subtasks': ''}
+    tasks.insert(0, task)
+    journal.append([{'op': 'add', 'task': task, 'at': 0},
+                    {'op': 'set', 'id': 1, 'fields': {'done': True}},
+                    {'op': 'move', 'id': 1, 'to': 0},
+                    {'op': 'remove', 'id': 2}])
+
+    assert path.read_bytes() == snapshot  # only the journal was written
+    name, tasks, index = ListJournal(path).load()
+    assert [(t['id'], t['done']) for t in tasks] == [(1, True)]
+    assert set(index) == {1}
+
+
+def test_journal_for_a_replaced_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'work.json'
+    journal = make_list(path, [])
+    journal.append([{'op': 'add', 'task': {'id': 1, 'text': 'a', 'done': False,
+                                           'deadline': '', 'subtasks': ''}}])
+    time.sleep(0.01)
+    path.write_text(json.dumps({'name': 'work', 'tasks': ['synced']}), encoding='utf-8')
+    _, tasks, _ = ListJournal(path).load()
+    assert [t['text'] for t in tasks] == ['synced']
+
+
+def test_journal_follows_its_snapshot_when_copied(tmp_path):
+    path = tmp_path / 'work.json'
+    journal = make_list(path, [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}])
+    journal.append([{'op': 'set', 'id': 1, 'fields': {'done': True}}])
+    copy = tmp_path / 'copy'
+    copy.mkdir()
+    time.sleep(0.01)
+    # Copied without their times, as cp -r or a sync would
+    for source in (path, journal.journal_path):
+        (copy / source.name).write_bytes(source.read_bytes())
+    _, tasks, _ = ListJournal(copy / 'work.json').load()
+    assert tasks[0]['done'] is True
+
+
+def test_journal_from_before_generations_is_still_replayed(tmp_path):
+    path = tmp_path / 'work.json'
+    path.write_text(json.dumps({'name': 'work', 'tasks': [{'id': 1, 'text': 'a'}]}), encoding='utf-8')
+    header = {'op': 'base', 'snapshot': storage.file_signature(path)}
+    record = {'op': 'set', 'id': 1, 'fields': {'text': 'b'}}
+    (tmp_path / 'work.journal').write_text(json.dumps(header) + '\n' + json.dumps(record) + '\n')
+    _, tasks, _ = ListJournal(path).load()
+    assert tasks[0]['text'] == 'b'
+
+
+def test_torn_tail_record_is_dropped(tmp_path):
+    path = tmp_path / 'work.json'
+    journal = make_list(path, [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}])
+    journal.append([{'op': 'set', 'id': 1, 'fields': {'text': 'b'}}])
+    with open(journal.journal_path, 'ab') as f:
+        f.write(b'{"op":"set","id":1,"fie')
+    _, tasks, _ = ListJournal(path).load()
+    assert tasks[0]['text'] == 'b'
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'COMPACT_MIN_RECORDS', 3)
+    path = tmp_path / 'work.json'
+    journal = make_list(path, [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}])
+    for i in range(3):
+        journal.append([{'op': 'set', 'id': 1, 'fields': {'text': f'v{i}'}}])
+    assert journal.records == 0
+    assert json.loads(path.read_text(encoding='utf-8'))['tasks'][0]['text'] == 'v2'
+    _, loaded, _ = ListJournal(path).load()
+    assert loaded[0]['text'] == 'v2'
+
+
+def test_writer_coalesces_a_burst_into_one_append(tmp_path, monkeypatch):
+    path = tmp_path / 'work.json'
+    make_list(path, [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}])
+    backend = JsonStorage(tmp_path)
+    backend.list_entries()
+    journal = backend.journals['work']
+    writes = []
+    append_bytes = journal.append_bytes
+    monkeypatch.setattr(journal, 'append_bytes', lambda data, count: (writes.append(count),
+                                                                     append_bytes(data, count)))
+    writer = BackgroundWriter(backend, delay=5)
+    for done in (True, False, True):
+        writer.append('work', [{'op': 'set', 'id': 1, 'fields': {'done': done}}])
+    writer.close()
+    assert writes == [3]
+    _, tasks, _ = ListJournal(path).load()
+    assert tasks[0]['done'] is True
+
+
+def test_writer_snapshot_supersedes_queued_records(tmp_path):
+    path = tmp_path / 'work.json'
+    make_list(path, [])
+    tasks = [{'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}]
+    writer = BackgroundWriter(JsonStorage(tmp_path), delay=5)
+    writer.append('work', [{'op': 'add', 'task': tasks[0]}])
+    writer.write_snapshot('work', tasks)
+    tasks[0]['text'] = 'changed after the snapshot was queued'
+    assert writer.flush(timeout=5)
+    _, loaded, _ = ListJournal(path).load()
+    assert [t['text'] for t in loaded] == ['a']
+    writer.close()
+
+
+@pytest.mark.parametrize('location', ['lists', 'lists.db'])
+def test_backends_apply_records_rename_and_delete(tmp_path, location):
+    backend = open_storage(tmp_path / location)
+    writer = BackgroundWriter(backend, delay=0)
+    task = {'id': 1, 'text': 'a', 'done': False, 'deadline': '', 'subtasks': ''}
+    writer.create('work')
+    writer.append('work', [{'op': 'add', 'task': task, 'at': 0},
+                           {'op': 'add', 'task': dict(task, id=2, text='b'), 'at': 0},
+                           {'op': 'add', 'task': dict(task, id=3, text='c', priority='high'), 'at': 1},
+                           {'op': 'set', 'id': 1, 'fields': {'done': True}},
+                           {'op': 'move', 'id': 1, 'to': 0}])
+    counts = {'total': 3, 'done': 1, 'priorities': {'': 1, 'high': 1}, 'dues': []}
+    backend.update_counts('work', counts)  # the UI keeps counts current
+    writer.create('old')
+    writer.rename('old', 'new', [])
+    writer.create('gone')
+    writer.delete('gone')
+    writer.close()
+    backend.close()
+
+    backend = open_storage(tmp_path / location)
+    entries = backend.list_entries()
+    assert entries == {'new': {'total': 0, 'done': 0, 'priorities': {}, 'dues': []}, 'work': counts}
+    tasks, index = backend.load('work')
+    assert [(t['text'], t['done']) for t in tasks] == [('a', True), ('b', False), ('c', False)]
+    assert tasks[2]['priority'] == 'high' and set(index) == {1, 2, 3}
+    assert [t['id'] for t in backend.query('work', done=False)] == [2, 3]
+    assert [t['id'] for t in backend.query('work', priority='high')] == [3]
+    backend.close()
+
+
+def test_migrate_copies_every_list(tmp_path):
+    (tmp_path / 'lists').mkdir()
+    make_list(tmp_path / 'lists' / 'work.json',
+              [{'id': 1, 'text': 'a', 'done': True, 'deadline': '', 'subtasks': ''}])
+    source, target = open_storage(tmp_path / 'lists'), open_storage(tmp_path / 'lists.db')
+    assert migrate(source, target) == 1
+    assert target.list_entries() == {'work': {'total': 1, 'done': 1, 'priorities': {}, 'dues': []}}
+    assert target.load('work')[0][0]['text'] == 'a'
+    source.close()
+    target.close()
+
+
+def test_manifest_skips_unchanged_directory_and_reports_changed_files(tmp_path):
+    a = tmp_path / 'a.json'
+    make_list(a, [])
+    manifest = Manifest(tmp_path)
+    assert manifest.load() == [a]
+    manifest.update(a, name='a', total=0, done=0)
+    manifest.stamp(ListJournal(a))
+    manifest.save()
+
+    reloaded = Manifest(tmp_path)
+    assert reloaded.load() == []
+    assert reloaded.fresh and reloaded.entries['a.json']['name'] == 'a'
+
+    b = tmp_path / 'b.json'
+    make_list(b, [])
+    reloaded = Manifest(tmp_path)
+    assert reloaded.load() == [b]
+    assert set(reloaded.entries) == {'a.json'}
+
+
+def test_sqlite_database_from_before_due_dates_is_upgraded(tmp_path):
+    path = tmp_path / 'lists.db'
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE lists (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE tasks (list_id INTEGER NOT NULL, id INTEGER NOT NULL, position REAL NOT NULL,
+            text TEXT NOT NULL DEFAULT '', done INTEGER NOT NULL DEFAULT 0, priority TEXT,
+            deadline TEXT NOT NULL DEFAULT '', subtasks TEXT NOT NULL DEFAULT '', extra TEXT,
+            PRIMARY KEY (list_id, id));
+        INSERT INTO lists VALUES (1, 'work');
+        INSERT INTO tasks VALUES (1, 1, 0, 'a', 0, NULL, '2025-03-05', '', NULL);
+    """)
+    db.close()
+    backend = open_storage(path)
+    tasks, _ = backend.load('work')
+    assert tasks[0]['due'] is not None
+    assert backend.list_entries()['work'] == {
+        'total': 1, 'done': 0, 'priorities': {'': 1}, 'dues': [[tasks[0]['due'], 1]]}
+    backend.close()
+
+
+def test_sqlite_list_counts_are_read_without_scanning_tasks(tmp_path):
+    backend = open_storage(tmp_path / 'lists.db')
+    writer = BackgroundWriter(backend, delay=0)
+    task = {'id': 1, 'text': 'a', 'done': True, 'deadline': '', 'subtasks': ''}
+    writer.create('work')
+    writer.append('work', [{'op': 'add', 'task': task, 'at': 0}])
+    backend.update_counts('work', {'total': 1, 'done': 1, 'priorities': {}, 'dues': []})
+    writer.close()
+    backend.close()
+
+    backend = open_storage(tmp_path / 'lists.db')
+    queries = []
+    backend._db().set_trace_callback(queries.append)
+    assert backend.list_entries() == {'work': {'total': 1, 'done': 1, 'priorities': {}, 'dues': []}}
+    assert queries and not any('tasks' in query for query in queries)
+    backend.close()
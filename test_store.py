@@ -0,0 +1,272 @@
+import os
+import subprocess
+import sys
+import time
+
+import cli
+import store as store_module
+from storage import ListJournal
+from store import TodoStore
+
+
+def test_store_changes_survive_reopening(tmp_path, store):
+    store.create_list('work')
+    a = store.add_task('work', 'write report', deadline='2030-01-01', priority='High')
+    b, c = store.add_tasks('work', [{'text': 'email team'}, {'text': 'book room'}])
+    store.toggle_task('work', a)
+    assert store.swap_tasks('work', b, c)
+    store.edit_task('work', c, text='book big room')
+    store.remove_task('work', b)
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    # The counts come from the manifest; the list itself is not read
+    [(name, counts, overdue)] = store.overview(now=0)
+    assert store.lists['work']['tasks'] is None and (name, overdue) == ('work', 0)
+    assert counts.total == 2 and counts.done == 1 and counts.priorities == {'': 1} and counts.dues == {}
+    assert [t['text'] for t in store.ordered('work')] == ['book big room', 'write report']
+    assert [t['text'] for t in store.load('work')['tasks']] == ['write report', 'book big room']
+    store.flush()
+    assert [task_id for _, task_id, _, _ in store.search('room')] == [c['id']]
+    store.close()
+
+
+def test_a_failed_append_is_reported_and_the_next_save_is_a_snapshot(tmp_path, store, monkeypatch, caplog):
+    store.create_list('work')
+    store.add_task('work', 'saved')
+    store.flush()
+
+    def full_disk(name, records):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(store.storage, 'write_records', full_disk)
+    store.add_task('work', 'lost from the journal')
+    store.flush()
+    assert store.write_errors() == ["Error saving list 'work': No space left on device"]
+    assert [r.name for r in caplog.records if r.levelname == 'ERROR'] == ['storage']
+    assert store.write_errors() == []
+    assert store.writer.needs_snapshot('work')
+
+    monkeypatch.undo()
+    snapshots = []
+    write_snapshot = store.storage.write_snapshot
+    monkeypatch.setattr(store.storage, 'write_snapshot',
+                        lambda name, tasks: (snapshots.append(name), write_snapshot(name, tasks)))
+    store.add_task('work', 'after the disk was freed')
+    store.flush()
+    assert snapshots == ['work'] and not store.writer.needs_snapshot('work')
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    assert [t['text'] for t in store.load('work')['tasks']] == [
+        'saved', 'lost from the journal', 'after the disk was freed']
+    store.close()
+
+
+def test_cli_runs_without_tkinter(tmp_path, capsys):
+    storage = str(tmp_path / 'lists.db')
+    assert cli.main(['--storage', storage, 'add', 'home', 'water plants', '--deadline', '2020-01-01']) is None
+    (tmp_path / 'more.txt').write_text('feed cat\n\nwash car\n', encoding='utf-8')
+    cli.main(['--storage', storage, 'import', 'home', str(tmp_path / 'more.txt')])
+    cli.main(['--storage', storage, 'toggle', 'home', '2'])
+    capsys.readouterr()
+
+    cli.main(['--storage', storage, 'show', 'home', '--open'])
+    assert capsys.readouterr().out.splitlines() == ['    1 [ ] water plants  (2020-01-01)',
+                                                    '    3 [ ] wash car']
+    cli.main(['--storage', storage, 'show', 'home', '--done'])
+    assert capsys.readouterr().out.splitlines() == ['    2 [x] feed cat']
+    cli.main(['--storage', storage, 'due'])
+    assert 'overdue\thome\t1\twater plants' in capsys.readouterr().out
+    assert cli.main(['--storage', storage, 'show', 'nowhere']) == 1
+
+    check = "import cli, sys; sys.exit('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', check], cwd=os.path.dirname(os.path.abspath(cli.__file__))).returncode == 0
+
+
+def test_lists_open_in_background_with_the_first_list_loaded(tmp_path, store, monkeypatch):
+    for name in ('b', 'a'):
+        store.create_list(name)
+        store.add_task(name, f'task in {name}')
+    store.close()
+    ListJournal(tmp_path / 'lists' / 'c.json').write_snapshot('c', [{'id': 1, 'text': 'new', 'done': True}])
+
+    monkeypatch.setattr(store_module, 'PROCESS_POOL_MIN_BYTES', 0)    # parse c in another process
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open_in_background()
+    assert store.names() == ['a', 'b']      # known from the manifest before anything is parsed
+    seen, done = [], False
+    while not done:
+        names, done = store.poll_opened()
+        seen += names
+        time.sleep(0.01)
+    assert sorted(seen) == ['a', 'c']
+    assert store.lists['a']['tasks'] is not None and store.lists['b']['tasks'] is None
+    assert store.lists['c']['counts'].done == 1
+    assert [t['text'] for t in store.ordered('c')] == ['new']
+    store.close()
+
+
+def test_every_change_can_be_undone_and_redone(tmp_path, store):
+    store.create_list('work')
+    a, b, c = store.add_tasks('work', [{'text': 'a'}, {'text': 'b'}, {'text': 'c'}])
+    store.toggle_task('work', a)
+    store.edit_task('work', b, text='b2', deadline='2030-01-01')
+    assert store.swap_tasks('work', b, c)
+    store.remove_task('work', b)
+    store.rename_list('work', 'home')
+    store.delete_list('home')
+    states = []
+    while True:
+        entry = store.lists.get('work') or store.lists.get('home')
+        states.append(None if entry is None else
+                      ([(t['text'], t['done']) for t in entry['tasks']], entry['counts'].done))
+        if store.undo() is None:
+            break
+    assert store.lists == {}
+    assert states[-2] == ([], 0) and states[-5] == ([('a', True), ('b2', False), ('c', False)], 1)
+
+    for expected in reversed(states[:-1]):
+        assert store.redo() is not None
+        entry = store.lists.get('work') or store.lists.get('home')
+        assert (None if entry is None else
+                ([(t['text'], t['done']) for t in entry['tasks']], entry['counts'].done)) == expected
+    assert store.redo() is None
+
+    # Undo back to the removal and check what was saved
+    store.undo()
+    store.undo()
+    store.undo()
+    store.close()
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    assert [(t['text'], t['due'] is not None) for t in store.load('work')['tasks']] == \
+        [('a', False), ('c', False), ('b2', True)]
+    store.close()
+
+
+def test_batches_are_one_change_and_one_save(tmp_path, store):
+    store.create_list('work')
+    tasks = store.add_tasks('work', [{'text': str(i)} for i in range(10)])
+    store.remove_tasks('work', tasks[2:8:2])
+    assert store.toggle_tasks('work', [tasks[0], tasks[3]]) is True
+    store.edit_tasks('work', [tasks[1], tasks[3]], priority='High', deadline='2030-01-01')
+    assert store.move_tasks('work', [tasks[8], tasks[9]], -1)
+    assert not store.move_tasks('work', [tasks[0]], -1)     # done tasks sort last
+    expected = ['1', '5', '8', '9', '7', '0', '3']
+    assert [t['text'] for t in store.ordered('work')] == expected
+    assert store.lists['work']['counts'].total == 7 and store.lists['work']['counts'].done == 2
+    steps = len(store.history.undo_steps)
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    assert [t['text'] for t in store.ordered('work')] == expected
+    assert [t.get('priority') for t in store.ordered('work')] == ['High', '', '', '', '', '', 'High']
+    store.close()
+
+    # Undoing the batches restores the list as it was after adding
+    store = TodoStore(tmp_path / 'lists2', delay=0)
+    store.open()
+    store.create_list('work')
+    tasks = store.add_tasks('work', [{'text': str(i)} for i in range(10)])
+    store.remove_tasks('work', tasks[2:8:2])
+    store.toggle_tasks('work', [tasks[0], tasks[3]])
+    store.edit_tasks('work', [tasks[1], tasks[3]], priority='High', deadline='2030-01-01')
+    store.move_tasks('work', [tasks[8], tasks[9]], -1)
+    assert len(store.history.undo_steps) == steps == 6
+    for _ in range(4):
+        store.undo()
+    entry = store.lists['work']
+    assert entry['tasks'] == tasks and entry['counts'].done == 0 and len(entry['due_index']) == 0
+    assert [t.get('priority') for t in tasks] == [''] * 10
+    store.close()
+
+
+def test_sqlite_places_rows_by_neighbour_without_counting(tmp_path, monkeypatch):
+    def counted(*args, **kwargs):
+        raise AssertionError('rows were placed by counting')
+
+    monkeypatch.setattr('sqlite_storage.SqliteStorage._position_at', counted)
+    store = TodoStore(tmp_path / 'lists.db', delay=0)
+    store.open()
+    store.create_list('work')
+    tasks = store.add_tasks('work', [{'text': str(i)} for i in range(10)])
+    store.remove_tasks('work', tasks[2:8:2])
+    assert store.move_tasks('work', [tasks[8], tasks[9]], -1)
+    assert store.move_tasks('work', [tasks[0], tasks[1]], 1)
+    store.remove_task('work', tasks[5])
+    store.undo()
+    store.undo()
+    store.add_task('work', 'last')
+    expected = [t['text'] for t in store.load('work')['tasks']]
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists.db', delay=0)
+    store.open()
+    store.sort_by('text', descending=True)
+    assert [t['text'] for t in store.query('work', done=False)] == sorted(expected, reverse=True)
+    assert store.query('work', done=True) == [] and store.lists['work']['tasks'] is None
+    assert [t['text'] for t in store.load('work')['tasks']] == expected
+    store.close()
+
+
+def test_subtasks_change_with_undo_and_are_saved_nested(tmp_path, store):
+    store.create_list('trip')
+    task = store.add_task('trip', 'pack', subtasks='clothes, books')
+    sock = store.add_subtask('trip', task, 'socks', parent_id=1)
+    store.toggle_subtasks('trip', [(task, sock.id), (task, 2)])
+    assert task['subtasks'].progress == (2, 3)
+    store.remove_subtasks('trip', [(task, 1)])
+    assert [s.text for s in task['subtasks']] == ['books'] and task['subtasks'].progress == (1, 1)
+    store.undo()
+    assert task['subtasks'].find(sock.id).done and task['subtasks'].progress == (2, 3)
+    store.edit_subtask('trip', task, sock.id, text='wool socks', deadline='2030-01-01')
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    [task] = store.load('trip')['tasks']
+    sock = task['subtasks'][0].children[0]
+    assert (sock.text, sock.done, sock.due is not None) == ('wool socks', True, True)
+    assert task['subtasks'].progress == (2, 3)
+    store.flush()
+    assert [task_id for _, task_id, _, _ in store.search('wool')] == [task['id']]
+    store.close()
+
+
+def test_a_mixed_selection_of_tasks_and_subtasks_is_one_step_and_one_save(tmp_path, store, monkeypatch):
+    store.create_list('trip')
+    pack, book, call = store.add_tasks('trip', [{'text': 'pack', 'subtasks': 'clothes, books'},
+                                                {'text': 'book hotel'}, {'text': 'call mum'}])
+    saves = []
+    save = store.save
+    monkeypatch.setattr(store, 'save', lambda name, records=None: (saves.append(records), save(name, records)))
+    steps = len(store.history.undo_steps)
+
+    assert store.toggle_items('trip', [book], [(pack, 1)]) is True
+    assert book['done'] and pack['subtasks'].progress == (1, 2)
+    assert len(saves) == 1 and len(store.history.undo_steps) == steps + 1
+
+    store.remove_items('trip', [book, call], [(pack, 2), (call, 1)])
+    assert [t['text'] for t in store.load('trip')['tasks']] == ['pack']
+    assert [s.text for s in pack['subtasks']] == ['clothes']
+    assert len(saves) == 2 and len(store.history.undo_steps) == steps + 2
+    assert [r['op'] for r in saves[-1]] == ['set', 'remove', 'remove']
+
+    store.undo()
+    assert [t['text'] for t in store.load('trip')['tasks']] == ['pack', 'book hotel', 'call mum']
+    assert [s.text for s in pack['subtasks']] == ['clothes', 'books'] and len(saves) == 3
+    store.redo()
+    store.undo()
+    store.undo()
+    assert not book['done'] and pack['subtasks'].progress == (0, 2)
+    store.close()
+
+    store = TodoStore(tmp_path / 'lists', delay=0)
+    store.open()
+    assert [(t['text'], t['done']) for t in store.load('trip')['tasks']] == [
+        ('pack', False), ('book hotel', False), ('call mum', False)]
+    store.close()
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+
+from tasks import Task, normalize_tasks, index_tasks, next_task_id, parse_deadline, DueIndex, ListCounts, \
+    Subtask, encode_task
+
+
+def test_old_string_tasks_are_converted():
+    tasks = normalize_tasks(["alpha", {"text": "beta", "done": True, "deadline": "", "subtasks": ""}])
+    assert tasks[0].to_dict() == {'text': 'alpha', 'done': False, 'deadline': '', 'subtasks': ()}
+    assert tasks[1]['done'] is True
+
+
+def test_missing_and_duplicate_ids_are_assigned():
+    tasks = [{'id': 4, 'text': 'a'}, {'text': 'b'}, {'id': 4, 'text': 'c'}, {'id': True, 'text': 'd'}]
+    index = index_tasks(tasks)
+    assert [t['id'] for t in tasks] == [4, 5, 6, 7]
+    assert all(index[t['id']] is t for t in tasks)
+    assert next_task_id(index) == 8
+
+
+def test_tasks_with_same_text_keep_distinct_ids():
+    tasks = normalize_tasks(["same", "same"])
+    index = index_tasks(tasks)
+    assert len(index) == 2
+
+
+def test_deadlines_are_parsed_to_end_of_day_timestamps():
+    end_of_day = datetime(2025, 3, 5, 23, 59, 59).timestamp()
+    assert parse_deadline('2025-03-05') == end_of_day
+    assert parse_deadline('05/03/2025') == end_of_day
+    assert parse_deadline('Mar 5, 2025') == end_of_day
+    assert parse_deadline('2025-03-05 09:30') == datetime(2025, 3, 5, 9, 30).timestamp()
+    assert parse_deadline('someday') is None
+    assert parse_deadline('') is None
+
+
+def test_due_index_keeps_open_tasks_in_due_order():
+    tasks = [{'id': 1, 'done': False, 'due': 30.0}, {'id': 2, 'done': True, 'due': 10.0},
+             {'id': 3, 'done': False, 'due': None}, {'id': 4, 'done': False, 'due': 20.0}]
+    due = DueIndex(tasks)
+    assert list(due) == [(20.0, 4), (30.0, 1)]
+    due.remove(tasks[0])
+    tasks[0]['due'] = 5.0
+    due.add(tasks[0])
+    assert list(due) == [(5.0, 1), (20.0, 4)]
+
+
+def test_list_counts_follow_changes_and_survive_saving():
+    tasks = [{'id': 1, 'done': False, 'priority': 'High', 'due': 10.0},
+             {'id': 2, 'done': True, 'priority': 'High', 'due': 5.0},
+             {'id': 3, 'done': False, 'due': 30.0}, {'id': 4, 'done': False, 'priority': 'low'}]
+    counts = ListCounts(tasks)
+    assert (counts.total, counts.done, counts.open) == (4, 1, 3)
+    assert counts.open_with_priority('high') == 1 and counts.open_with_priority('Low') == 1
+    assert counts.overdue(now=20.0) == 1
+    counts.remove(tasks[0])
+    tasks[0]['done'] = True
+    counts.add(tasks[0])
+    assert counts.overdue(now=20.0) == 0 and counts.priorities == {'': 1, 'low': 1}
+    saved = json.loads(json.dumps(counts.to_dict()))
+    assert ListCounts.from_dict(saved).to_dict() == counts.to_dict() == ListCounts(tasks).to_dict()
+
+
+def test_task_round_trips_through_json_without_loss():
+    saved = {'id': 3, 'text': 'a', 'done': False, 'priority': 'High', 'deadline': '', 'subtasks': [],
+             'colour': 'red'}
+    task = Task(saved)
+    assert 'due' not in task and task.get('due') is None and task['colour'] == 'red'
+    assert json.loads(json.dumps(task, default=encode_task)) == saved
+    task.update({'due': None}, colour='blue')
+    assert dict(task) == dict(saved, subtasks=(), due=None, colour='blue')
+    assert Task(priority='High')['priority'] is task['priority']
+
+
+def test_old_subtask_text_is_migrated_and_rolled_up():
+    task = Task(id=1, text='trip', subtasks='tickets, hotel;\npack')
+    subtasks = task['subtasks']
+    assert [(s.id, s.text) for s in subtasks] == [(1, 'tickets'), (2, 'hotel'), (3, 'pack')]
+    assert subtasks.progress == (0, 3)
+    nested = subtasks.add(Subtask(subtasks.next_id(), 'passport', done=True), parent_id=1)
+    nested = nested.change(2, lambda s: s.replace(done=True))
+    assert nested.progress == (2, 4) and nested.find(4).text == 'passport'
+    assert nested[2] is subtasks[2] and subtasks.progress == (0, 3)
+    saved = json.loads(json.dumps(Task(id=1, subtasks=nested), default=encode_task))
+    assert Task(saved)['subtasks'] == nested
+    assert nested.change(1, lambda s: None).progress == (1, 2)
@@ -0,0 +1,344 @@
+from types import SimpleNamespace
+
+from taskview import FrameScheduler, TaskView
+
+
+class FakeTreeview:
+    """The parts of ttk.Treeview that TaskView uses, with nesting."""
+
+    def __init__(self):
+        self.children = {'': []}
+        self.parents = {}
+        self.values = {}
+        self.opened = {}
+        self.detached = set()
+        self.selected = []
+        self.focused = ''
+        self.bindings = {}
+        self.options = {}
+        self.calls = {'insert': 0, 'delete': 0, 'move': 0, 'item': 0}
+        self.queue = []
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def bind(self, event, handler, add=None):
+        self.bindings.setdefault(event, []).append(handler)
+
+    def get_children(self, item=''):
+        return tuple(self.children[item])
+
+    def insert(self, parent, index, iid, values=(), open=None):
+        assert iid not in self.parents and parent not in self.detached
+        self.calls['insert'] += 1
+        siblings = self.children[parent]
+        siblings.insert(len(siblings) if index == 'end' else index, iid)
+        self.parents[iid], self.children[iid], self.values[iid] = parent, [], tuple(values)
+        if open is not None:
+            self.opened[iid] = open
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.calls['delete'] += 1
+            if iid not in self.detached:
+                self.children[self.parents[iid]].remove(iid)
+            stack = [iid]
+            while stack:
+                item = stack.pop()
+                stack += self.children.pop(item)
+                for table in (self.parents, self.values, self.opened):
+                    table.pop(item, None)
+                self.detached.discard(item)
+                if item in self.selected:
+                    self.selected.remove(item)
+
+    def detach(self, *iids):
+        for iid in iids:
+            self.children[self.parents[iid]].remove(iid)
+            self.detached.add(iid)
+
+    def move(self, iid, parent, index):
+        assert iid in self.detached, 'Tk would move an attached item, but TaskView never needs to'
+        self.calls['move'] += 1
+        self.detached.discard(iid)
+        self.children[parent].insert(index, iid)
+        self.parents[iid] = parent
+
+    def item(self, iid, values=None, open=None):
+        self.calls['item'] += 1
+        if values is not None:
+            self.values[iid] = tuple(values)
+        if open is not None:
+            self.opened[iid] = open
+
+    def selection(self):
+        return tuple(self.selected)
+
+    def selection_set(self, items):
+        self.selected = [items] if isinstance(items, str) else list(items)
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self.focused
+        self.focused = iid
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def after_idle(self, callback):
+        self.queue.append(callback)
+        return len(self.queue)
+
+    def after(self, ms, callback):
+        return self.after_idle(callback)
+
+    def after_cancel(self, handle):
+        self.queue[handle - 1] = None
+
+    def update(self):
+        """Run what is queued, as the Tk event loop would."""
+        while any(self.queue):
+            queue, self.queue = self.queue, []
+            for callback in queue:
+                if callback is not None:
+                    callback()
+
+    def shown(self, parent=''):
+        """The items as displayed: children of open items follow them."""
+        items = []
+        for iid in self.children[parent]:
+            items.append(iid)
+            if self.opened.get(iid):
+                items += self.shown(iid)
+        return items
+
+    def click(self, iids, state=0):
+        """Select `iids` as a click would; state 4 is Control held."""
+        for handler in self.bindings['<ButtonPress-1>']:
+            handler(SimpleNamespace(state=state))
+        self.selected = list(iids)
+        for handler in self.bindings['<<TreeviewSelect>>']:
+            handler(None)
+
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def make_view(rows, **options):
+    tree = FakeTreeview()
+    view = TaskView(tree, FakeScrollbar(), lambda row: (row,), key=lambda row: row, overscan=5, **options)
+    view.visible = 10
+    view.set_rows(rows)
+    tree.update()
+    return tree, view
+
+
+def test_only_the_window_is_held_and_scrolling_inside_it_renders_nothing():
+    tree, view = make_view(list(range(1000)))
+    assert tree.shown() == [str(i) for i in range(15)]
+    assert view.scrollbar.position == (0.0, 0.01)
+
+    view.yview('moveto', 0.5)
+    tree.update()
+    assert tree.shown() == [str(i) for i in range(495, 515)]
+    assert view.scrollbar.position == (0.5, 0.51)
+
+    before = dict(tree.calls)
+    view.yview('scroll', 1, 'units')
+    tree.update()
+    assert view.top == 501 and tree.calls == before
+    view.yview('scroll', 1, 'pages')
+    tree.update()
+    assert tree.shown() == [str(i) for i in range(506, 526)]
+
+
+def test_reconcile_touches_only_the_rows_that_changed():
+    rows = [(i, 'task %d' % i) for i in range(100)]
+    tree = FakeTreeview()
+    view = TaskView(tree, FakeScrollbar(), lambda row: (row[1],), key=lambda row: row[0], overscan=5)
+    view.visible = 10
+    view.set_rows(rows)
+    tree.update()
+
+    def changes(new_rows):
+        before = dict(tree.calls)
+        view.set_rows(new_rows)
+        tree.update()
+        assert tree.shown() == [str(row[0]) for row in new_rows[:15]]
+        assert [tree.values[iid][0] for iid in tree.shown()] == [row[1] for row in new_rows[:15]]
+        return {call: tree.calls[call] - before[call] for call in before if tree.calls[call] != before[call]}
+
+    rows = rows[:3] + [(100, 'new')] + rows[3:]
+    assert changes(rows) == {'insert': 1, 'delete': 1}     # the last held row drops out
+    rows[5], rows[9] = rows[9], rows[5]
+    assert changes(rows) == {'move': 2}
+    rows[2] = (rows[2][0], 'renamed')
+    assert changes(rows) == {'item': 1}
+    del rows[0]
+    assert changes(rows) == {'insert': 1, 'delete': 1}
+    assert changes(list(rows)) == {}
+
+
+def test_the_selection_survives_scrolling_away_and_back():
+    tree, view = make_view(list(range(1000)))
+    view.select(3)
+    tree.update()
+    assert tree.selected == ['3']
+
+    view.yview('moveto', 0.5)
+    tree.update()
+    assert tree.selected == [] and view.selection() == ['3']
+    view.yview('moveto', 0.0)
+    tree.update()
+    assert tree.selected == ['3']
+
+    # Stepping from a row outside the window brings it back into view
+    view.yview('moveto', 0.5)
+    tree.update()
+    assert view.cursor() == 3
+    view.step(1)
+    tree.update()
+    assert tree.selected == ['4'] and view.selection() == ['4']
+    assert tree.shown()[:15] == [str(i) for i in range(15)]
+
+    view.select_rows([2, 700, 5])
+    tree.update()
+    assert view.selection() == ['2', '5', '700'] and tree.selected == ['2', '5']
+    view.yview('moveto', 0.7)
+    tree.update()
+    assert tree.selected == ['700']
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_the_frame_scheduler_runs_many_requests_once_per_frame(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('taskview.time.perf_counter', clock)
+    tree = FakeTreeview()
+    calls = []
+    tree.after = lambda ms, callback: calls.append(('after', ms)) or tree.after_idle(callback)
+    frames = FrameScheduler(tree)
+    ran = []
+    first, second = (lambda: ran.append('first')), (lambda: ran.append('second'))
+    for callback in (first, second, first, second, first):
+        frames.request(callback)
+    assert len(tree.queue) == 1 and not calls     # one idle callback for the frame
+    tree.update()
+    assert ran == ['first', 'second']
+
+    # Within the frame the next requests wait for the rest of it
+    clock.now += 0.004
+    for callback in (second, first, second):
+        frames.request(callback)
+    assert calls == [('after', 12)] and len(tree.queue) == 1
+    tree.update()
+    assert ran == ['first', 'second', 'second', 'first']
+
+    frames.request(first)
+    frames.flush()
+    assert ran[-1] == 'first'
+    tree.update()
+    assert len(ran) == 5
+
+
+def test_steps_before_a_frame_are_drawn_once():
+    tree, view = make_view(list(range(1000)))
+    view.select(0)
+    tree.update()
+    for _ in range(50):
+        view.step(1)
+    assert len(tree.queue) == 1
+    tree.update()
+    assert tree.selected == ['50'] and '50' in tree.shown()
+
+
+def test_a_plain_click_replaces_a_selection_outside_the_window():
+    tree, view = make_view(list(range(1000)))
+    view.select_rows(view.rows)
+    tree.update()
+    tree.click(['3'])
+    assert view.selection() == ['3']
+
+    view.select(0)
+    view.yview('moveto', 0.5)
+    tree.update()
+    tree.click(['505'])
+    assert view.selection() == ['505']
+    # Control+click adds to it, off-window rows included
+    view.yview('moveto', 0.0)
+    tree.update()
+    tree.click(['2', '3'], state=4)
+    assert view.selection() == ['2', '3', '505']
+
+
+def children(row):
+    """Even top-level rows have three subtasks; the middle one has two of its own."""
+    if isinstance(row, int):
+        return ['%d.%d' % (row, j) for j in range(3)] if row % 2 == 0 else []
+    return ['%s.%d' % (row, j) for j in range(2)] if row.count('.') == 1 and row.endswith('.1') else []
+
+
+def parent(row):
+    if isinstance(row, int):
+        return None
+    above = row.rsplit('.', 1)[0]
+    return above if '.' in above else int(above)
+
+
+def make_nested_view(rows):
+    return make_view(rows, children=children, has_children=lambda row: bool(children(row)),
+                     parent=parent, locate=lambda iid: int(iid) if iid.isdigit() else None)
+
+
+def toggle(tree, iid, event):
+    """Open or close `iid` as a click on its expander would."""
+    tree.focused = iid
+    for handler in tree.bindings[event]:
+        handler(None)
+    tree.update()
+
+
+def test_child_rows_are_made_on_expand_and_removed_on_collapse():
+    tree, view = make_nested_view(list(range(100)))
+    assert tree.shown() == [str(i) for i in range(15)] and len(view) == 100
+    assert tree.get_children('0') == ('0:more',) and tree.get_children('1') == ()
+    assert not tree.opened.get('0')
+
+    toggle(tree, '0', '<<TreeviewOpen>>')
+    assert tree.get_children('0') == ('0.0', '0.1', '0.2') and tree.opened['0']
+    assert tree.get_children('0.1') == ('0.1:more',)
+    assert tree.shown()[:5] == ['0', '0.0', '0.1', '0.2', '1'] and len(view) == 103
+    assert view._expanded_at == [0] and view._shift == [3]
+    assert view._child_positions == {'0.0': 1, '0.1': 2, '0.2': 3}
+
+    view.expand('4')
+    view.expand('0.1')
+    tree.update()
+    assert tree.get_children('0.1') == ('0.1.0', '0.1.1')
+    assert view._expanded_at == [0, 4] and view._shift == [5, 8]
+    assert view._child_positions['0.1.1'] == 4 and view._child_positions['4.0'] == 10
+    assert [view.index(iid) for iid in ('0.1.0', '4', '4.2', '5', '99')] == [3, 9, 12, 13, 107]
+    assert view.index('2.0') is None and view.index('100') is None
+    assert [view.rows[i] for i in (3, 9, 12, 13)] == ['0.1.0', 4, '4.2', 5]
+
+    view.select(view.index('5'))
+    tree.update()
+    assert tree.selected == ['5'] and view.selection() == ['5'] and view.cursor() == 13
+
+    toggle(tree, '0', '<<TreeviewClose>>')
+    assert tree.get_children('0') == ('0:more',) and not tree.opened['0']
+    assert not any(iid.startswith('0.') for iid in tree.parents)
+    assert view._expanded_at == [4] and view._shift == [3] and len(view) == 103
+    assert view.index('5') == 8 and view.cursor() == 8
+    assert tree.selected == ['5'] and tree.shown()[:9] == ['0', '1', '2', '3', '4', '4.0', '4.1', '4.2', '5']
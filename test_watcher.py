@@ -0,0 +1,40 @@
+import sys
+import time
+
+import pytest
+
+from storage import ListJournal
+from watcher import PollingWatcher, InotifyWatcher
+
+WATCHERS = [PollingWatcher] + ([InotifyWatcher] if sys.platform.startswith('linux') else [])
+
+
+@pytest.mark.parametrize('watcher_class', WATCHERS)
+def test_store_reloads_only_lists_changed_by_other_programs(tmp_path, store, watcher_class):
+    lists = tmp_path / 'lists'
+    store.create_list('mine')
+    store.create_list('theirs')
+    store.add_task('mine', 'kept')
+    store.load('theirs')
+    store.flush()
+    watcher = watcher_class(lists)
+    watcher.changes()
+
+    # Our own saves are noticed by the watcher but change nothing
+    store.add_task('mine', 'also kept')
+    store.flush()
+    assert store.refresh_changed(watcher.changes()) == set()
+
+    time.sleep(0.01)    # a distinct mtime for the poller
+    ListJournal(lists / 'theirs.json').write_snapshot('theirs', [{'id': 1, 'text': 'synced', 'done': True}])
+    ListJournal(lists / 'new.json').write_snapshot('new', [])
+    (lists / 'mine.json').unlink()
+    (lists / 'mine.journal').unlink()
+    assert store.refresh_changed(watcher.changes()) == {'theirs', 'new', 'mine'}
+    assert store.names() == ['new', 'theirs']
+    assert [t['text'] for t in store.ordered('theirs')] == ['synced']
+    assert store.lists['theirs']['counts'].done == 1
+    store.flush()
+    assert [name for name, _, _, _ in store.search('synced')] == ['theirs']
+    watcher.close()
+    store.close()
@@ -0,0 +1,128 @@
+"""Notice list files that other programs add, change or remove.
+
+A watcher reports the names of changed files in one directory each time
+its `changes` method is called; the app calls it from a ``root.after``
+timer every `interval` milliseconds.  On Linux it reads inotify events,
+which costs nothing while the directory is quiet.  Elsewhere it compares
+the size and mtime of each file with the previous scan.
+
+Watchers report every change, including the app's own saves; telling
+those apart is up to the storage (see JsonStorage.refresh).
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+
+log = logging.getLogger(__name__)
+
+WATCHED_SUFFIXES = ('.json', '.journal')
+POLL_INTERVAL = 2000        # ms between directory scans
+INOTIFY_INTERVAL = 250      # ms between reads of queued inotify events
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct('iIII')   # wd, mask, cookie, length of the name that follows
+
+
+def watched(name):
+    return name.endswith(WATCHED_SUFFIXES)
+
+
+def scan(directory):
+    """Return ``{file name: (size, mtime)}`` for the watched files in `directory`."""
+    signatures = {}
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return signatures
+    with entries:
+        for entry in entries:
+            if watched(entry.name):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                signatures[entry.name] = (st.st_size, st.st_mtime_ns)
+    return signatures
+
+
+class PollingWatcher:
+    """Compares directory scans; works everywhere."""
+
+    interval = POLL_INTERVAL
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.seen = scan(directory)
+
+    def changes(self):
+        current = scan(self.directory)
+        changed = {name for name in current.keys() | self.seen.keys()
+                   if current.get(name) != self.seen.get(name)}
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Reads inotify events without blocking; Linux only."""
+
+    interval = INOTIFY_INTERVAL
+    # Finished writes only, so a file is never read while it is half written
+    mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.directory = directory
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'cannot watch {directory}')
+
+    def changes(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            pos = 0
+            while pos < len(data):
+                _, mask, _, size = EVENT.unpack_from(data, pos)
+                pos += EVENT.size
+                name = data[pos:pos + size].rstrip(b'\0').decode(sys.getfilesystemencoding(), 'replace')
+                pos += size
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped; report every file so nothing is missed
+                    changed.update(scan(self.directory))
+                elif watched(name):
+                    changed.add(name)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(directory):
+    """Return an inotify watcher for `directory` if the platform has one, else a poller."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            log.info("inotify unavailable, polling instead: %s", e)
+    return PollingWatcher(directory)